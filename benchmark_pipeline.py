@@ -0,0 +1,532 @@
+"""Benchmark ponta a ponta do pipeline com Gemini, YouTube e GCS simulados em processo.
+
+Nada sai da máquina: o Gemini é trocado por um servidor simulado com latência,
+cota RPM por chave, injeção de 429 e respostas por regra; o YouTube por um
+cliente que gera canais e vídeos sintéticos; o GCS pelo diretório local
+(GCS_DIRETORIO_LOCAL). Cada tamanho roda a coleta + `classificar_intervalo`
+com cache, checkpoints e cota zerados.
+
+    python benchmark_pipeline.py --tamanhos 50 200 1000 --latencia-ms 80 --taxa-429 0.02
+
+Com --comparar-modos cada tamanho roda nos dois modos (MODO_CLASSIFICACAO) e o
+registro do modo fundido leva a concordância das classificações com o de duas chamadas.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import google.ai.generativelanguage as glm
+import httplib2
+from google.api_core import exceptions as gexc
+from googleapiclient.errors import HttpError
+
+
+# ============================================
+# GEMINI SIMULADO
+# ============================================
+
+class ServidorGeminiSimulado:
+    """`generate_content` com latência log-normal, cota RPM por chave, 429 aleatório e respostas por regra.
+
+    Entra no lugar dos clientes gRPC (GenerativeServiceClient e CacheServiceClient):
+    o GenerativeModel, o ModeloComPrefixo e o cached content do pipeline rodam como
+    em produção. O cached content fica guardado por chave (cada chave é um projeto)
+    e só o sufixo enviado conta como tokens novos.
+
+    A latência cresce com os tokens de entrada que não estão em cache de contexto
+    (`ms_por_1k_tokens`), para que o ganho do prefixo em cache apareça no benchmark.
+    `taxa_fora_do_schema` é a fração de respostas fundidas que não vêm em JSON.
+    """
+
+    def __init__(self, ferramentas, latencia_ms=80, rpm_por_chave=600, taxa_429=0.0, seed=0, ms_por_1k_tokens=0,
+                 taxa_fora_do_schema=0.0):
+        self.ferramentas = ferramentas
+        self.latencia_ms = latencia_ms
+        self.ms_por_1k_tokens = ms_por_1k_tokens
+        self.taxa_fora_do_schema = taxa_fora_do_schema
+        self.rpm_por_chave = rpm_por_chave
+        self.taxa_429 = taxa_429
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.janelas = {}
+        self.latencias = []
+        self.chamadas = 0
+        self.erros_429 = 0
+        self.tokens_entrada = 0
+        self.tokens_em_cache = 0
+        self.tokens_saida = 0
+        self.caches = {}
+        self.caches_criados = 0
+        # Ferramentas mais longas primeiro: "NEXTJS" não deve casar como "NEXT"
+        nomes = sorted(ferramentas, key=len, reverse=True)
+        self.regex_ferramentas = re.compile(r'\b(' + '|'.join(re.escape(f) for f in nomes) + r')\b', re.IGNORECASE)
+
+    def cliente_geracao(self, client_options):
+        """Imita glm.GenerativeServiceClient(client_options={'api_key': ...})"""
+        servidor, api_key = self, client_options['api_key']
+
+        class ClienteGeracao:
+            def generate_content(self, request, **kwargs):
+                return servidor.generate_content(api_key, request)
+
+        return ClienteGeracao()
+
+    def cliente_cache(self, client_options):
+        """Imita glm.CacheServiceClient: cached content por chave"""
+        servidor, api_key = self, client_options['api_key']
+
+        class ClienteCache:
+            def create_cached_content(self, cached_content):
+                texto = ''.join(part.text for part in cached_content.system_instruction.parts)
+                with servidor.lock:
+                    servidor.caches_criados += 1
+                    nome = f"cachedContents/simulado-{servidor.caches_criados}"
+                    servidor.caches[nome] = (api_key, cached_content.model, texto)
+                return glm.CachedContent(name=nome, model=cached_content.model,
+                                         usage_metadata=glm.CachedContent.UsageMetadata(total_token_count=len(texto) // 4))
+
+            def delete_cached_content(self, name):
+                with servidor.lock:
+                    servidor.caches.pop(name, None)
+
+        return ClienteCache()
+
+    def prefixo_em_cache(self, api_key, request):
+        if not request.cached_content:
+            return ''
+        dono, modelo, texto = self.caches.get(request.cached_content, (None, None, None))
+        if dono != api_key or modelo != request.model:
+            raise gexc.NotFound(f"{request.cached_content} não existe para esta chave/modelo (simulado)")
+        return texto
+
+    def _verificar_cota(self, api_key):
+        agora = time.monotonic()
+        with self.lock:
+            self.chamadas += 1
+            janela = self.janelas.setdefault(api_key, deque())
+            while janela and agora - janela[0] > 60:
+                janela.popleft()
+            if len(janela) >= self.rpm_por_chave or self.random.random() < self.taxa_429:
+                self.erros_429 += 1
+                raise gexc.ResourceExhausted("429 Resource has been exhausted (simulado). Please retry in 2s.")
+            janela.append(agora)
+
+    def generate_content(self, api_key, request):
+        self._verificar_cota(api_key)
+        prefixo_em_cache = self.prefixo_em_cache(api_key, request)
+        prompt = ''.join(part.text for conteudo in request.contents for part in conteudo.parts)
+        em_cache, novos = len(prefixo_em_cache) // 4, len(prompt) // 4
+        with self.lock:
+            latencia = (self.random.lognormvariate(0, 0.5) * self.latencia_ms + novos / 1000 * self.ms_por_1k_tokens) / 1000
+        time.sleep(latencia)
+        # As regras olham o prompt inteiro, como o modelo veria com o prefixo em cache
+        texto = self.responder(prefixo_em_cache + prompt)
+        saida = len(texto) // 4
+        with self.lock:
+            self.latencias.append(latencia)
+            self.tokens_entrada += em_cache + novos
+            self.tokens_em_cache += em_cache
+            self.tokens_saida += saida
+        return glm.GenerateContentResponse(
+            candidates=[glm.Candidate(content=glm.Content(parts=[glm.Part(text=texto)], role='model'),
+                                      finish_reason=glm.Candidate.FinishReason.STOP)],
+            usage_metadata=glm.GenerateContentResponse.UsageMetadata(
+                prompt_token_count=em_cache + novos, cached_content_token_count=em_cache,
+                candidates_token_count=saida, total_token_count=em_cache + novos + saida),
+        )
+
+    # Regras de resposta, na ordem dos prompts do pipeline
+
+    def ferramentas_do_titulo(self, titulo):
+        vistas = []
+        for nome in self.regex_ferramentas.findall(titulo):
+            if nome.upper() not in vistas:
+                vistas.append(nome.upper())
+        return vistas
+
+    def classificar(self, titulo):
+        ferramentas = self.ferramentas_do_titulo(titulo)
+        principal = ferramentas[0] if ferramentas else 'invalido'
+        base = ferramentas[1] if len(ferramentas) > 1 else principal
+        return {
+            'ferramenta_principal': principal,
+            'tecnologia_base': base,
+            'classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes': len(ferramentas) > 1,
+            'cargo': 'back-end',
+            'tipo_video': 'aula' if ferramentas else 'invalido',
+        }
+
+    @staticmethod
+    def primeiro_topico(trecho):
+        for linha in trecho.splitlines():
+            if linha.startswith('- '):
+                return linha[2:].strip()
+        return 'invalido'
+
+    def responder(self, prompt):
+        if '"sinopse"' in prompt:
+            titulo = re.search(r'Título: (.*)', prompt).group(1)
+            with self.lock:
+                fora_do_schema = self.random.random() < self.taxa_fora_do_schema
+            if fora_do_schema:
+                return f"Sinopse: {titulo}"
+            classificacao = self.classificar(titulo)
+            sinopse = (f"O vídeo apresenta na prática {titulo}, com exemplos de código e explicação dos conceitos."
+                       if classificacao['ferramenta_principal'] != 'invalido' else 'invalido')
+            return json.dumps({'sinopse': sinopse, **classificacao}, ensure_ascii=False)
+
+        if '"topico_principal"' in prompt:
+            primeira = prompt.split('PRIMEIRA LISTA', 1)[1]
+            segunda = primeira.split('SEGUNDA LISTA', 1)[1]
+            return json.dumps({'topico_principal': self.primeiro_topico(primeira),
+                               'topico_base': self.primeiro_topico(segunda)}, ensure_ascii=False)
+
+        if 'TÓPICOS DISPONÍVEIS PARA' in prompt:
+            return self.primeiro_topico(prompt.split('TÓPICOS DISPONÍVEIS PARA', 1)[1])
+
+        if '[video_id:' in prompt:
+            itens = []
+            for video_id, titulo in re.findall(r'\[video_id: ([^\]]+)\]\n.*?\nTítulo do Vídeo: (.*)', prompt):
+                itens.append({'video_id': video_id, **self.classificar(titulo)})
+            return json.dumps(itens, ensure_ascii=False)
+
+        if 'Título do Vídeo:' in prompt:
+            titulo = re.search(r'Título do Vídeo: (.*)', prompt).group(1)
+            return '```json\n' + json.dumps(self.classificar(titulo), ensure_ascii=False) + '\n```'
+
+        titulo = re.search(r'Título: (.*)', prompt)
+        titulo = titulo.group(1) if titulo else ''
+        if not self.ferramentas_do_titulo(titulo):
+            return 'invalido'
+        return f"O vídeo apresenta na prática {titulo}, com exemplos de código e explicação dos conceitos."
+
+    def percentil(self, p):
+        if not self.latencias:
+            return 0.0
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+
+# ============================================
+# YOUTUBE SIMULADO
+# ============================================
+
+TEMAS = ['do zero', 'na prática', 'projeto completo', 'para iniciantes', 'avançado', 'dicas rápidas']
+RUIDO = ['Vlog da semana', 'Sorteio de inscritos', 'Minha rotina', 'Live de sexta', 'Q&A com a comunidade']
+
+
+class TransporteSimulado:
+    """Imita httplib2.Http: cada `request` é uma tentativa, com 429 injetado"""
+
+    def __init__(self, youtube):
+        self.youtube = youtube
+
+    def request(self, *args, **kwargs):
+        time.sleep(self.youtube.latencia_ms / 1000)
+        with self.youtube.lock:
+            self.youtube.chamadas += 1
+            falhou = self.youtube.random.random() < self.youtube.taxa_429
+            self.youtube.erros_429 += falhou
+        return 429 if falhou else 200
+
+
+class RequisicaoSimulada:
+    """Imita HttpRequest: `headers`, `http` e `execute(http, num_retries)` retentando o 429"""
+
+    def __init__(self, youtube, resposta):
+        self.resposta = resposta
+        self.headers = {}
+        self.http = TransporteSimulado(youtube)
+
+    def execute(self, http=None, num_retries=0):
+        http = http or self.http
+        for _ in range(num_retries + 1):
+            if http.request() == 200:
+                return self.resposta()
+        raise HttpError(httplib2.Response({'status': 429}), b'{"error": {"message": "rateLimitExceeded (simulado)"}}')
+
+
+class YouTubeSimulado:
+    """playlistItems/videos/channels sintéticos e determinísticos por canal"""
+
+    def __init__(self, ferramentas, videos_por_canal=50, latencia_ms=5, taxa_429=0.0, seed=0):
+        self.ferramentas = ferramentas
+        self.videos_por_canal = videos_por_canal
+        self.latencia_ms = latencia_ms
+        self.taxa_429 = taxa_429
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.chamadas = 0
+        self.erros_429 = 0
+        self.inicio = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    @staticmethod
+    def rodape(canal):
+        """Rodapé fixo do canal (links, redes, apoio), como nas descrições reais"""
+        return (f"Inscreva-se no canal! https://exemplo.com/curso\n"
+                f"📌 Instagram: @{canal.lower()} | LinkedIn: https://linkedin.com/in/{canal.lower()}\n"
+                f"☕ Apoie o canal pelo PIX: contato@{canal.lower()}.com.br\n"
+                f"🔗 Curso completo com desconto: https://exemplo.com/{canal}/cursos?cupom=CANAL10\n"
+                f"Equipamentos que uso: https://exemplo.com/{canal}/setup")
+
+    def video(self, video_id):
+        canal, n = video_id.rsplit('-', 1)
+        gerador = random.Random(video_id)
+        if gerador.random() < 0.15:
+            titulo = f"{gerador.choice(RUIDO)} #{n}"
+        else:
+            ferramenta = gerador.choice(self.ferramentas)
+            titulo = f"{ferramenta.title()} {gerador.choice(TEMAS)} #{n}"
+            if gerador.random() < 0.2:
+                titulo += f" com {gerador.choice(self.ferramentas).title()}"
+        publicado = (self.inicio - timedelta(days=int(n) * 3)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        return {
+            'id': video_id,
+            'snippet': {
+                'title': titulo,
+                'description': f"{titulo}\n\n{self.rodape(canal)}\n#programacao #tecnologia",
+                'channelId': canal,
+                'channelTitle': f"Canal {canal}",
+                'publishedAt': publicado,
+                'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hq.jpg"}},
+                'defaultAudioLanguage': 'pt-BR',
+                'tags': ['programação'],
+            },
+            'statistics': {'viewCount': str(gerador.randint(10, 10 ** 5)), 'likeCount': str(gerador.randint(0, 5000)),
+                           'commentCount': str(gerador.randint(0, 300))},
+            'contentDetails': {'duration': f"PT{gerador.randint(1, 59)}M{gerador.randint(0, 59)}S"},
+        }
+
+    def playlistItems(self):
+        youtube = self
+
+        class Recurso:
+            def list(self, part, playlistId, maxResults=50, pageToken=None):
+                canal = 'UC' + playlistId[2:]
+                inicio = int(pageToken or 0)
+                fim = min(inicio + maxResults, youtube.videos_por_canal)
+
+                def resposta():
+                    itens = [{'contentDetails': {
+                        'videoId': f"{canal}-{n}",
+                        'videoPublishedAt': (youtube.inicio - timedelta(days=n * 3)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    }} for n in range(inicio, fim)]
+                    saida = {'items': itens, 'etag': f"etag-{canal}"}
+                    if fim < youtube.videos_por_canal:
+                        saida['nextPageToken'] = str(fim)
+                    return saida
+
+                return RequisicaoSimulada(youtube, resposta)
+
+        return Recurso()
+
+    def videos(self):
+        youtube = self
+
+        class Recurso:
+            def list(self, part, id):
+                return RequisicaoSimulada(youtube, lambda: {'items': [youtube.video(v) for v in id.split(',')]})
+
+        return Recurso()
+
+    def channels(self):
+        youtube = self
+
+        class Recurso:
+            def list(self, part, id, maxResults=50):
+                return RequisicaoSimulada(youtube, lambda: {'items': [
+                    {'id': c, 'statistics': {'videoCount': str(youtube.videos_por_canal)}} for c in id.split(',')
+                ]})
+
+        return Recurso()
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def importar_pipeline(args):
+    """Importa o pipeline com limites do executor compatíveis com o servidor simulado"""
+    os.environ['GEMINI_RPM'] = str(args.rpm)
+    os.environ['GEMINI_TPM'] = str(args.tpm)
+    os.environ['GEMINI_RPD'] = str(10 ** 7)
+    os.environ['CLASSIFICACAO_LOTE'] = str(args.lote)
+    os.environ['FORMATOS_SAIDA'] = 'parquet'
+    import gemini_classification as g
+    if args.cache_contexto:
+        g.MODELO_GEMINI = 'gemini-2.0-flash-001'
+    return g
+
+
+def preparar_execucao(g, diretorio):
+    """Cache, checkpoints, cota e bucket novos em `diretorio`; executores e coletores recriados"""
+    g._cache_llm = g.CacheLLM(os.path.join(diretorio, 'llm_cache.sqlite'))
+    g._registro_cota = g.RegistroCotaYouTube(os.path.join(diretorio, 'cota_youtube.sqlite'))
+    g._rendimento_canais = g.RendimentoCanais(os.path.join(diretorio, 'rendimento_canais.sqlite'))
+    g._executores.clear()
+    g._coletores.clear()
+    g.DIRETORIO_CHECKPOINTS = os.path.join(diretorio, 'checkpoints')
+    g.GCS_DIRETORIO_LOCAL = os.path.join(diretorio, 'gcs')
+    g.DIRETORIO_METRICAS = os.path.join(diretorio, 'metricas')
+
+
+def rodar(g, tamanho, args, modo):
+    """Uma execução completa; devolve as medidas e o DataFrame final (para comparar modos)"""
+    ferramentas = sorted(g.carregar_indice_trilhas().chaves)
+    gemini = ServidorGeminiSimulado(ferramentas, args.latencia_ms, args.rpm_servidor, args.taxa_429, args.seed,
+                                    args.ms_por_1k_tokens, args.taxa_fora_do_schema)
+    g.MODO_CLASSIFICACAO = modo
+    youtube = YouTubeSimulado(ferramentas, args.videos_por_canal, args.latencia_youtube_ms, args.taxa_429, args.seed)
+    # Só os clientes gRPC são trocados: com --cache-contexto o prefixo vira cached
+    # content pelo caminho de produção e só o sufixo trafega
+    g.glm.GenerativeServiceClient = gemini.cliente_geracao
+    g.glm.CacheServiceClient = gemini.cliente_cache
+    g.ColetorYouTube.cliente = lambda self: youtube
+
+    canais = -(-tamanho // args.videos_por_canal)
+    df_canais = g.pd.DataFrame({
+        'channel_id': [f"UCbench{i:05d}" for i in range(canais)],
+        'channel_title': [f"Canal {i}" for i in range(canais)],
+    })
+    chaves = [f"chave-simulada-{i}" for i in range(args.chaves)]
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        preparar_execucao(g, diretorio)
+        saida = io.StringIO()
+        if args.memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verboso else saida):
+            df_videos = g.coletar_videos_canais(df_canais, 'chave-youtube-simulada').head(tamanho)
+            fim_coleta = time.perf_counter()
+            _, df_final = g.classificar_intervalo(df_videos, chaves, 0, len(df_videos))
+        duracao = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] if args.memoria else None
+        if args.memoria:
+            tracemalloc.stop()
+        executor = g.obter_executor(chaves)
+
+    return {
+        'tamanho': tamanho,
+        'modo': modo,
+        'videos': len(df_videos),
+        'classificados': len(df_final),
+        'segundos': round(duracao, 3),
+        'segundos_coleta': round(fim_coleta - inicio, 3),
+        'linhas_por_s': round(len(df_videos) / duracao, 2),
+        'chamadas_gemini': gemini.chamadas,
+        'chamadas_por_classificado': round(gemini.chamadas / max(1, len(df_final)), 3),
+        'erros_429_gemini': gemini.erros_429,
+        'latencia_p50_ms': round(gemini.percentil(50) * 1000, 1),
+        'latencia_p99_ms': round(gemini.percentil(99) * 1000, 1),
+        'tokens_entrada': gemini.tokens_entrada,
+        'tokens_em_cache': gemini.tokens_em_cache,
+        'tokens_novos_por_chamada': round((gemini.tokens_entrada - gemini.tokens_em_cache) / max(1, gemini.chamadas), 1),
+        'tokens_saida': gemini.tokens_saida,
+        'chamadas_youtube': youtube.chamadas,
+        'erros_429_youtube': youtube.erros_429,
+        'pico_memoria_mb': round(pico / 2 ** 20, 1) if pico is not None else None,
+        'contadores_executor': dict(executor.contadores),
+        'metricas': g.obter_metricas().registros(),
+    }, df_final
+
+
+CAMPOS_CONCORDANCIA = ['ferramenta_principal', 'tecnologia_base', 'cargo', 'tipo_video', 'topico_trilha']
+
+
+def concordancia(df_referencia, df_comparado):
+    """Vídeos mantidos por só um dos modos e fração de campos iguais nos mantidos pelos dois"""
+    referencia = df_referencia.set_index('video_id')
+    comparado = df_comparado.set_index('video_id')
+    comuns = referencia.index.intersection(comparado.index)
+    resultado = {
+        'videos_em_comum': len(comuns),
+        'so_na_referencia': len(referencia.index.difference(comparado.index)),
+        'so_no_comparado': len(comparado.index.difference(referencia.index)),
+    }
+    for campo in CAMPOS_CONCORDANCIA:
+        iguais = (referencia.loc[comuns, campo].astype(str) == comparado.loc[comuns, campo].astype(str)).sum()
+        resultado[campo] = round(float(iguais) / max(1, len(comuns)), 4)
+    return resultado
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[50, 200, 1000], help="vídeos por execução")
+    parser.add_argument('--chaves', type=int, default=3, help="chaves Gemini simuladas no pool")
+    parser.add_argument('--latencia-ms', type=float, default=80, help="latência mediana do Gemini simulado")
+    parser.add_argument('--latencia-youtube-ms', type=float, default=5)
+    parser.add_argument('--rpm', type=int, default=600, help="limite RPM configurado no executor, por chave")
+    parser.add_argument('--rpm-servidor', type=int, default=600, help="cota RPM imposta pelo servidor, por chave")
+    parser.add_argument('--tpm', type=int, default=10 ** 7)
+    parser.add_argument('--taxa-429', type=float, default=0.0, help="fração de chamadas que recebem 429 aleatório")
+    parser.add_argument('--lote', type=int, default=1, help="CLASSIFICACAO_LOTE")
+    parser.add_argument('--ms-por-1k-tokens', type=float, default=10,
+                        help="latência extra por mil tokens de entrada fora do cache de contexto")
+    parser.add_argument('--cache-contexto', action='store_true',
+                        help="simula um modelo com cached content (o padrão, Gemma, manda o prompt inteiro)")
+    parser.add_argument('--modo', choices=['duas_chamadas', 'fundido'], default='duas_chamadas',
+                        help="MODO_CLASSIFICACAO das etapas de contexto e classificação")
+    parser.add_argument('--comparar-modos', action='store_true',
+                        help="roda os dois modos em cada tamanho e mede a concordância do fundido")
+    parser.add_argument('--taxa-fora-do-schema', type=float, default=0.0,
+                        help="fração de respostas fundidas sem JSON (exercita o reenvio em duas chamadas)")
+    parser.add_argument('--videos-por-canal', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sem-memoria', dest='memoria', action='store_false', help="desliga o tracemalloc (mais rápido)")
+    parser.add_argument('--saida', default='benchmark_resultados.jsonl', help="JSONL onde cada execução é acrescentada")
+    parser.add_argument('--verboso', action='store_true', help="mostra a saída do pipeline")
+    args = parser.parse_args()
+
+    # O pipeline lê datasets/ por caminho relativo à raiz do repositório
+    args.saida = os.path.abspath(args.saida)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    g = importar_pipeline(args)
+    parametros = {k: v for k, v in vars(args).items() if k not in ('tamanhos', 'saida', 'verboso', 'modo')}
+    commit = commit_atual()
+    modos = ['duas_chamadas', 'fundido'] if args.comparar_modos else [args.modo]
+
+    print(f"{'modo':>13} {'vídeos':>7} {'classif.':>8} {'linhas/s':>9} {'chamadas/vídeo':>15} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'tokens/chamada':>15} {'429':>5} {'pico MB':>8}")
+    with open(args.saida, 'a', encoding='utf-8') as f:
+        for tamanho in args.tamanhos:
+            finais = {}
+            for modo in modos:
+                resultado, finais[modo] = rodar(g, tamanho, args, modo)
+                print(f"{modo:>13} {resultado['videos']:>7} {resultado['classificados']:>8} {resultado['linhas_por_s']:>9} "
+                      f"{resultado['chamadas_por_classificado']:>15} {resultado['latencia_p50_ms']:>7} "
+                      f"{resultado['latencia_p99_ms']:>7} {resultado['tokens_novos_por_chamada']:>15} "
+                      f"{resultado['erros_429_gemini']:>5} {str(resultado['pico_memoria_mb']):>8}")
+                if len(finais) == 2:
+                    resultado['concordancia'] = concordancia(finais['duas_chamadas'], finais['fundido'])
+                    print(f"{'':>13} concordância com duas chamadas: {resultado['concordancia']}")
+                registro = {'data': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'commit': commit,
+                            'parametros': parametros, **resultado}
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+    print(f"\n✓ Resultados acrescentados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
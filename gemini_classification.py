@@ -1,749 +1,3965 @@
-import pandas as pd
-from googleapiclient.discovery import build
-from datetime import datetime
-import time
-import json
-import re
-import google.generativeai as genai
-from google.generativeai import GenerationConfig
-from google.cloud import storage
-from google.oauth2 import service_account
-import os
-
-
-
-# ============================================
-# FUNÇÕES
-# ============================================
-
-def carregar_canais(csv_path, start=0, end=None):
-    """Carrega canais do CSV"""
-    df = pd.read_csv(csv_path, sep=';')
-    print(f"Total de canais no CSV: {len(df)}")
-    df_teste = df.iloc[start:end]
-    print(f"Usando {len(df_teste)} canais para teste")
-    return df_teste
-
-def converter_para_playlist_id(channel_id):
-    """UC... -> UU..."""
-    if channel_id.startswith('UC'):
-        return 'UU' + channel_id[2:]
-    return channel_id
-
-def buscar_video_ids_canal(channel_id, youtube_api_key):
-    """Busca todos os video IDs de um canal"""
-    youtube = build('youtube', 'v3', developerKey=youtube_api_key)
-    playlist_id = converter_para_playlist_id(channel_id)
-    
-    video_ids = []
-    next_page_token = None
-    
-    while True:
-        request = youtube.playlistItems().list(
-            part='contentDetails',
-            playlistId=playlist_id,
-            maxResults=50,
-            pageToken=next_page_token
-        )
-        response = request.execute()
-        
-        for item in response['items']:
-            video_ids.append(item['contentDetails']['videoId'])
-        
-        next_page_token = response.get('nextPageToken')
-        if not next_page_token:
-            break
-    
-    return video_ids
-
-def buscar_metadados_videos(video_ids, youtube_api_key):
-    """Busca metadados dos vídeos em batches de 50"""
-    youtube = build('youtube', 'v3', developerKey=youtube_api_key)
-    
-    videos_data = []
-    
-    for i in range(0, len(video_ids), 50):
-        batch = video_ids[i:i+50]
-        
-        request = youtube.videos().list(
-            part='snippet,statistics,contentDetails',
-            id=','.join(batch)
-        )
-        response = request.execute()
-        
-        for item in response['items']:
-            snippet = item.get('snippet', {})
-            statistics = item.get('statistics', {})
-            content_details = item.get('contentDetails', {})
-            
-            videos_data.append({
-                'video_id': item['id'],
-                'url': f"https://www.youtube.com/watch?v={item['id']}",
-                'title': snippet.get('title'),
-                'description': snippet.get('description'),
-                'channel_id': snippet.get('channelId'),
-                'channel_name': snippet.get('channelTitle'),
-                'published_at': snippet.get('publishedAt'),
-                'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url'),
-                'viewCount': int(statistics.get('viewCount', 0)),
-                'likeCount': int(statistics.get('likeCount', 0)),
-                'commentCount': int(statistics.get('commentCount', 0)),
-                'defaultAudioLanguage': snippet.get('defaultAudioLanguage'),
-                'duration': content_details.get('duration'),
-                'tags': snippet.get('tags', [])
-            })
-    
-    return videos_data
-
-def filtrar_por_data(df, data_minima='2024-06-01'):
-    """Filtra vídeos de junho/2024 para cá"""
-    df['published_at'] = pd.to_datetime(df['published_at'])
-    df_filtrado = df[df['published_at'] >= data_minima].copy()
-    print(f"Vídeos após filtro de data (>= {data_minima}): {len(df_filtrado)}")
-    return df_filtrado
-
-
-
-
-def contextualizar_videos_groq(df, groq_api_key, limite=100):
-    """Classifica vídeos com Groq (Llama 3.1) - com limite"""    
-    
-    genai.configure(api_key=groq_api_key)
-    
-    df_para_classificar = df.copy()
-    print(f"\nClassificando {len(df_para_classificar)} vídeos com Groq...")
-    
-    classificacoes = []
-    
-    for idx, row in df_para_classificar.iterrows():
-        prompt = f"""Você é um contextualizador técnico avançado de vídeos educacionais de tecnologia.
-Sua função é ler o título, descrição e nome do canal e produzir uma sinopse técnica limpa, eliminando todo ruído.
-
-======================================================
-OBJETIVO
-======================================================
-Gerar um resumo técnico confiável, eliminando completamente ruídos promocionais e elementos irrelevantes, deixando apenas os dados úteis para que modelos futuros consigam classificar corretamente qual ferramenta e operação o vídeo ensina.
-
-======================================================
-REGRAS ABSOLUTAS
-======================================================
-1. **Não invente ferramentas. Além disso, nunca expanda siglas, termos ou nomes técnicos que você não reconhece/sabe com 100% de certeza o que é**
-   MCP significa exclusivamente "Model Context Protocol".
-   Se você não tiver certeza absoluta do significado de uma sigla ou termo técnico, NÃO tente interpretar, deduzir ou completar — ignore e responda apenas: "invalido".
-   
-2. **IGNORE COMPLETAMENTE** qualquer trecho que não seja técnico:  
-    - links  
-    - redes sociais
-    - cursos
-    - eventos
-    - promoções
-    - reviews 
-    - nomes de cursos, eventos, lives, bootcamps, imersões, desafios, semanas, maratonas
-    - emojis  
-    - hashtags 
-    - agradecimentos     
-    - chamadas de ação (ex.: "comente", "garanta sua vaga", "último lote", "aproveite agora", "cupom de desconto", "seu ingresso", "inscreva-se")  
-    - textos aspiracionais ou emocionais  
-    - storytelling, personagens fictícios, metáforas ou dramatização  
-    - memes ou conteúdo humorístico  
-    - divulgação de eventos, lives, bootcamps, imersões, desafios, semanas, maratonas  
-    - promoções, Black Friday, descontos, lotes, vagas limitadas  
-    - conteúdos sobre carreira, sucesso, mentalidade ou trajetória profissional  
-    - reviews, opiniões ou comparações de cursos, plataformas ou comunidades  
-    - vlogs, rotina, bastidores ou vida pessoal         
-
-3. O nome do canal **NUNCA é prova** de qual ferramenta o vídeo usa.  
-   Use-o apenas como reforço contextual (ex.: canal dedicado a Excel → reforça, mas não prova).
-
-4. Nunca classifique trilha, não classifique ferramenta final, não gere JSON.
-
-5. **Palavras soltas não caracterizam ensino técnico.**
-   Exemplos como “API”, “JavaScript”, “Java”, “Excel”, “docker”, “código”, “backend”, “programação”, quando não acompanhados de operação, conceito, técnica ou processo claramente descrito, **NÃO são suficientes** para gerar sinopse.
-   Exemplos de termos vagos como “webhook”, “servidor”, “app”, “backend”,
-   “URL”, “Stripe”, “pagamento”, “chat”, “nuvem”, “deepseek”, “chatgpt”, “gemini”, “claude”, “deploy”, “autenticação”, “aplicação”
-   quando não acompanhados da ferramenta e de operação, conceito, técnica ou processo claramente descrito, NÃO são suficientes para gerar sinopse.
-   Nesses casos, responda obrigatoriamente: “invalido”.
-
-6. **Hashtags NUNCA podem ser usadas como base semântica.**
-   Se a ferramenta ou o conteúdo técnico aparecer **apenas em hashtags**, responda obrigatoriamente: **"invalido"**.
-
-7. Para que um vídeo seja válido, o título e a descrição devem apresentar evidência suficiente para identificar a FERRAMENTA PRINCIPAL.
-   Essa evidência só existe quando a ferramenta aparece combinada com pelo menos um segundo elemento técnico
-   (procedimento, técnica, operação, implementação, conceito aplicado ou resolução de problema).
-   Se houver apenas um elemento isolado, responda obrigatoriamente: "invalido".
-
-8. **Lives sem escopo educacional explícito são inválidas.**
-   Lives só serão consideradas válidas quando o título e a descrição apresentarem evidência suficiente para identificar a ferramenta principal sendo ensinada.
-   Essa evidência só existe quando a ferramenta aparece combinada com pelo menos um segundo elemento técnico
-   (procedimento, técnica, operação, implementação, conceito aplicado ou resolução de problema).
-   Se isso não estiver claramente indicado, responda obrigatoriamente: "invalido".
-
-9. **Cursos sem escopo educacional explícito são inválidos.**
-   Um curso só será considerado válido quando o título e a descrição apresentarem evidência suficiente para identificar a ferramenta principal sendo ensinada.
-   Essa evidência só existe quando a ferramenta aparece combinada com pelo menos um segundo elemento técnico
-   (procedimento, técnica, operação, implementação, conceito aplicado ou resolução de problema).
-   Se isso não estiver claramente indicado, responda obrigatoriamente: "invalido".
-
-10. **Se o título e a descrição NÃO indicarem claramente qual conteúdo técnico
-    será abordado no vídeo**, sendo compostos apenas por linguagem promocional,
-    aspiracional, anúncios de curso, bootcamp, evento ou venda,
-    responda obrigatoriamente: **"invalido"**.
-
-11. É PROIBIDO utilizar informações (nome, link, etc.) de curso, playlist, canal,
-    formação, bootcamp, evento ou trilha COMO EVIDÊNCIA TÉCNICA do vídeo.    
-
-12. **Vídeos que não sejam de ensino técnico são automaticamente inválidos.**
-    Se o vídeo for sobre qualquer um destes tópicos, responda IMEDIATAMENTE: **"invalido"**:
-    - Notícias (lançamentos, atualizações, banimentos, regulações)
-    - Reviews ou comparativos (X vs Y, "qual é melhor", rankings)
-    - Reacts (reagindo a conteúdo de terceiros)
-    - Entrevistas, bate-papos, podcasts ou bastidores de empresas/profissionais (ex: "Como é a infra do iFood", "Stack da empresa X", "Desafios reais de escala")
-    - Análises de ferramenta, mercado ou tendências tecnológicas
-    - Dicas de carreira, sucesso profissional ou trajetória
-    - Anúncios de cursos, eventos ou promoções
-    - Discussões, opiniões ou debates sobre ferramentas
-    - Conteúdos sobre LLMs (ChatGPT, Claude, Gemini, DeepSeek, etc.) que sejam notícias, comparativos, reviews, análises de impacto ou discussões
-    
-    Só continue se o vídeo for de **ensino técnico** (educação em tecnologia).
-    Se houver dúvida sobre ser ensino → **"invalido"**.
-
-
-======================================================
-ENTRADAS DO VÍDEO
-======================================================
-Título: {row['title']}
-Descrição: {row['description'] if row['description'] else 'Sem descrição'}
-Nome do canal: {row['channel_name']}
-
-======================================================
-SAÍDA OBRIGATÓRIA
-======================================================
-
-Produza **apenas um parágrafo de sinopse técnica**,
-contendo exclusivamente informações que sejam **explicitamente sustentadas
-pelo título ou pela descrição**, incluindo:
-
-- A ferramenta principal citada (A ferramenta principal é sempre aquela que o vídeo ensina diretamente, sendo esta a ferramenta foco do vídeo, sobre a qual são dadas instruções práticas e explicado o conceito técnico central do vídeo.)
-- Os conceitos técnicos centrais que o vídeo explica
-- Sem nenhum ruído e sem violar nenhuma REGRA ABSOLUTA
-- Use apenas informações referentes ao vídeo específico e não de elementos externos
-
-Se qualquer um desses itens **não estiver claramente indicado no título ou na descrição**,
-ele **não deve ser inferido, deduzido ou estimado**.
-
-O texto deve parecer uma descrição de conteúdo feita por um analista técnico.
-"""
-        
-        try:            
-            model = genai.GenerativeModel(model_name='gemma-3-27b-it', generation_config=GenerationConfig(temperature=0, top_k=1))
-            response = model.generate_content(prompt) 
-            classificacao = response.text                    
-            classificacoes.append(classificacao)
-            
-            if (idx + 1) % 10 == 0:
-                print(f"Classificados: {idx + 1}/{len(df_para_classificar)}")            
-            
-            
-        except Exception as e:
-            print(f"Erro ao classificar vídeo {row['video_id']}: {e}")
-            classificacoes.append("erro")
-
-        time.sleep(8)
-    
-    df_para_classificar['contexto'] = classificacoes
-    return df_para_classificar
-
-
-
-
-def classificar_videos_groq(df, groq_api_key, limite=100):
-    """Classifica vídeos com Groq (Llama 3.1) - com limite"""    
-    
-    genai.configure(api_key=groq_api_key)    
-
-    
-    df_para_classificar = df.copy()
-    print(f"\nClassificando {len(df_para_classificar)} vídeos com Groq...")
-    
-    classificacoes = []
-    
-    for idx, row in df_para_classificar.iterrows():
-        prompt = f"""Você é um especialista em classificação de conteúdo educacional de tecnologia e programação do YouTube brasileiro.
-                    Você receberá APENAS uma SINOPSE TÉCNICA PURIFICADA — um texto curto,
-                    objetivo, sem ruído, descrevendo exatamente o que o vídeo ensina.
-                    Essa sinopse já removeu promoções, links, tags irrelevantes e palavras-chave de SEO.
-
-**OBJETIVO:**
-Extrair a FERRAMENTA PRINCIPAL ensinada no vídeo da sinopse técnica fornecida,
-seguindo exclusivamente a lista de ferramentas aceitas do sistema.
-
-**REGRAS CRÍTICAS:**
-1. Use SOMENTE o que está explícito na sinopse.
-2. NÃO invente ferramentas.
-3. NUNCA invente ou presuma ferramentas não mencionadas
-
-**LISTA FERRAMENTAS ACEITAS (use EXATAMENTE estes nomes):**
-Python | Java | C | C++ | JavaScript | TypeScript | PHP | Go | Rust | Kotlin | Swift | SQL | HTML | CSS
-React | Angular | Vue | Next.js | Node.js | Spring Boot | Express | GraphQL | Flutter | Tailwind CSS | Vite | Pandas | dbt | Spark | MLflow | Laravel | React Native | Prisma | NestJS
-PyTorch | TensorFlow | Scikit-Learn | Model Context Protocol (MCP)
-MongoDB | Firebase | Supabase | Redis
-Linux | IDE
-Docker | Kubernetes | Airflow | Jenkins | GitHub Actions | Terraform 
-AWS | Azure | GCP
-Excel | Power BI | Tableau | Grafana
-RabbitMQ | Kafka
-Prometheus
-Git | Cypress | Postman | Selenium | Cypress | JUnit | Espresso | JMeter
-
----
-
-**VÍDEO A ANALISAR:**
-Sinopse Técnica: {row['contexto']}
-Título do Vídeo: {row['title']}
----
-🎯 REGRAS:
-1. Quando mais de uma ferramenta da lista for citada na sinopse, a ferramenta principal DEVE
-   ser aquela sobre a qual a técnica, implementação, configuração, ou construção
-   está sendo diretamente ensinada.
-
-   A ferramenta principal é sempre aquela que o vídeo ENSINA diretamente.
-   É o foco do vídeo. Aquela sobre a qual o vídeo está dando instruções práticas e explicando o conceito técnico central do vídeo.
-   
-2. Classifique sempre no nível da FERRAMENTA PRINCIPAL
-   (nunca comandos internos, bibliotecas de baixo nível ou conceitos).
-
-3. Se o vídeo ensinar uma funcionalidade de uma ferramenta,
-   classifique pela ferramenta responsável diretamente por essa funcionalidade.
-
-4. Evite classificar conceitos abstratos
-   (loops, algoritmos, ponteiros, estruturas conceituais).
-
-5. Se a sinopse descrever qualquer um destes conteúdos, classifique IMEDIATAMENTE como "invalido":
-   - Notícias (lançamentos, atualizações, banimentos, regulações)
-   - Reviews ou comparativos (X vs Y, "qual é melhor", rankings)
-   - Reacts (reagindo a conteúdo de terceiros)
-   - Entrevistas, bate-papos, podcasts ou bastidores de empresas/profissionais (ex: "Como é a infra do iFood", "Stack da empresa X", "Desafios reais de escala")
-   - Análises de ferramenta, mercado ou tendências tecnológicas
-   - Dicas de carreira, sucesso profissional ou trajetória
-   - Anúncios de cursos, eventos ou promoções
-   - Discussões, opiniões ou debates sobre ferramentas
-   - Conteúdos sobre LLMs (ChatGPT, Claude, Gemini, DeepSeek, etc.) que sejam notícias, comparativos, reviews, análises de impacto ou discussões
-   
-   Só classifique se a sinopse descrever claramente **ensino técnico** (educação em tecnologia).
-   Se a sinopse for ambígua ou não indicar ensino → "invalido".
-
-6. 🧠 INFERÊNCIA PERMITIDA:
-Inferência só é permitida se TODAS as 3 condições abaixo forem verdadeiras:
-1. A ferramenta DEVE estar explicitamente mencionada na sinopse
-2. A ferramenta DEVE estar na Lista de Ferramentas Aceitas
-3. DEVE haver pelo menos um elemento técnico oficial, documentado e característico da ferramenta na sinopse
-
-Se QUALQUER uma das 3 condições falhar → classifique como "invalido" IMEDIATAMENTE.
-
-Exemplos válidos:
-- BullMQ → roda em Node.js → tecnologia_base: Node.js
-- Pandas → biblioteca Python → tecnologia_base: Python
-- DAX → linguagem do Power BI → tecnologia_base: Power BI
-- nftables → comando do Linux → tecnologia_base: Linux
-- Express → framework Node.js → tecnologia_base: Node.js
-- VBA → roda em excel → tecnologia_base: Excel
-- Lodash → biblioteca JavaScript → tecnologia_base: JavaScript
-- CloudWatch → serviço de monitoramento AWS → tecnologia_base: AWS
-- docker run → comando Docker → tecnologia_base: Docker
-- NestJS (também escrito Nest.js, não confundir com Next.js são frameworks diferentes) → framework Node.js → tecnologia_base: Node.js
-
-✔ Nome da ferramenta (ex.: React, Terraform, Power BI)
-✔ Um conceito, operação ou recurso oficial e documentado da ferramenta
-
-- useState, JSX → React 
-
-- terraform apply, providers → Terraform
-
-- DataFrame, merge → Pandas
-
-- SELECT, JOIN → SQL
-
-✔ Uma técnica ou processo oficial dessa ferramenta
-
-- App Router do Next.js
-
-- Hooks do React
-
-- DAGs do Airflow
-
-- \keras Models do TensorFlow
-
-- Clusters no Kubernetes
-
-- Components, Props do Vue
-
-7. Não infira ferramentas quando a sinopse mencionar APENAS:
-    - Contexto geral sem ferramenta da lista (ex: "backend", "aplicação", "front-end", "API", "servidor", "webscraping", etc.)
-    - Tipo de projeto sem ferramenta da lista (ex: "chat", "dashboard", "IA", "e-commerce", "blog", "webscraping", etc.)
-    - Se a sinopse descrever apenas conceitos sem ferramenta da lista (ex: webhooks, DTOs, APIs, microsserviços, padrões de design, arquitetura, etc.)  
-    - Ferramentas não listadas sem ferramenta da lista (ex: Bubble, Vercel, Netlify, n8n, Zapier, Webflow, WordPress, IFTTT, Make (Integromat), etc.)
-    - Se a sinopse for genérica demais (ex: motivacional, opinião, apresentação, dicas vagas, cursos, lives, etc.)
-    Nesses casos, se NÃO houver ferramenta da LISTA DE FERRAMENTAS ACEITAS explicitamente mencionada, classifique como "invalido".
-
-**RESPONDA APENAS COM JSON (sem markdown, sem explicações):**
-
-{{
-    "ferramenta_principal": "nome_exato_da_lista_ou_invalido",
-    "tecnologia_base": "tecnologia_base_ou_invalido",
-    "classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes": true/false,
-    "cargo": "front-end | back-end | fullstack | devops | qa | analista de dados | engenheiro de dados | cientista de dados | analista de bi | android | ios | invalido",
-    "tipo_video": "projeto | aula | curso | invalido"
-}}
-
-Internamente, identifique qual é a ferramenta principal que o vídeo ensina diretamente, 
-sendo esta a ferramenta foco do vídeo, sobre a qual são dadas instruções práticas e explicado o conceito técnico central do vídeo.
-Use essa decisão para classificar; NÃO exponha nem explique esse raciocínio.
-"""
-        
-        try:
-            model = genai.GenerativeModel(model_name='gemma-3-27b-it', generation_config=GenerationConfig(temperature=0.1))
-            response = model.generate_content(prompt) 
-            classificacao = response.text          
-            classificacoes.append(classificacao)
-            
-            if (idx + 1) % 10 == 0:
-                print(f"Classificados: {idx + 1}/{len(df_para_classificar)}")            
-            
-            
-        except Exception as e:
-            print(f"Erro ao classificar vídeo {row['video_id']}: {e}")
-            classificacoes.append("erro")
-
-        time.sleep(4.5)
-    
-    df_para_classificar['classificacao_gemini'] = classificacoes
-    return df_para_classificar
-
-
-
-
-
-def carregar_trilhas(caminho_json="datasets/trilhas.json"):    
-    with open(caminho_json, "r", encoding="utf-8") as f:
-        dados = json.load(f)
-    return dados["trilhas"]
-
-
-
-def obter_trilha(classificacao_json, trilhas_data):   
-    if not classificacao_json:
-        return []
-
-    # 1. Garantir que está em dict
-    if isinstance(classificacao_json, str):
-        # Remove ```json e ``` do início/fim
-        cleaned = re.sub(r'^```(?:json)?\s*', '', classificacao_json.strip())
-        cleaned = re.sub(r'\s*```$', '', cleaned)
-        cleaned = cleaned.strip()
-        try:
-            classificacao = json.loads(cleaned)
-        except:
-            return []
-    else:
-        classificacao = classificacao_json
-
-    # 2. Extrair as duas possibilidades
-    ferramenta_principal = classificacao.get("ferramenta_principal", "")
-    tecnologia_base = classificacao.get("tecnologia_base", "")
-
-    # 3. Procurar trilha por ferramenta principal
-    for trilha in trilhas_data:
-        if trilha["ferramenta"].upper() == ferramenta_principal.upper():
-            return trilha["topicos"]
-
-    # 4. Se não encontrar → tentar tecnologia base
-    for trilha in trilhas_data:
-        if trilha["ferramenta"].upper() == tecnologia_base.upper():
-            return trilha["topicos"]
-
-    # 5. Não achou nada
-    return []
-
-def obter_tecnologia_base(classificacao_json, trilhas_data):   
-    if not classificacao_json:
-        return []
-
-    # 1. Garantir que está em dict
-    if isinstance(classificacao_json, str):
-        # Remove ```json e ``` do início/fim
-        cleaned = re.sub(r'^```(?:json)?\s*', '', classificacao_json.strip())
-        cleaned = re.sub(r'\s*```$', '', cleaned)
-        cleaned = cleaned.strip()
-        try:
-            classificacao = json.loads(cleaned)
-        except:
-            return []
-    else:
-        classificacao = classificacao_json
-
-    # 2. Extrair as duas possibilidades
-    ferramenta_principal = classificacao.get("ferramenta_principal", "")
-    tecnologia_base = classificacao.get("tecnologia_base", "")
-    empate_tecnico = classificacao.get("classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes", "")
-
-    if empate_tecnico:
-        if ferramenta_principal != tecnologia_base:
-            for trilha in trilhas_data:
-                if trilha["ferramenta"].upper() == tecnologia_base.upper():
-                    return trilha["topicos"]
-
-    return ""
-
-
-def classificar_trilhas_groq(df, groq_api_key, coluna_classificacao='classificacao_gemini',coluna='topico_trilha',funcao=obter_trilha):
-        
-    genai.configure(api_key=groq_api_key)
-    
-    # Carregar trilhas
-    trilhas_data = carregar_trilhas()
-    
-    # Selecionar vídeos para classificar
-    df_para_classificar = df.copy()
-    print(f"\nClassificando {len(df_para_classificar)} vídeos nas trilhas com Groq...")
-    
-    topicos_classificados = []
-    
-    for idx, row in df_para_classificar.iterrows():
-        print(f"→ Classificando trilha ({idx+1}/{len(df_para_classificar)}) ...")
-        
-        # Pegar a ferramenta classificada
-        classificacao_json = row[coluna_classificacao]
-        
-        # Buscar a trilha dessa ferramenta
-        trilha = funcao(classificacao_json, trilhas_data)
-        
-        # Se não encontrou trilha, marcar como "sem_trilha"
-        if not trilha:
-            print(f"  ⚠ Trilha não encontrada para: {classificacao_json}")
-            topicos_classificados.append("sem_trilha")
-            continue
-        
-        print(f"  ✓ Trilha encontrada com {len(trilha)} tópicos")
-        
-        # Montar lista de tópicos para o prompt
-        trilha_txt = "\n".join([f"- {t}" for t in trilha])
-        
-        # Montar prompt
-        prompt = f"""Você é um CLASSIFICADOR ESPECIALISTA de vídeos educacionais de tecnologia.
-
-Você receberá APENAS uma SINOPSE TÉCNICA PURIFICADA — um texto curto,
-objetivo e 100% limpo de ruído, descrevendo o conteúdo real do vídeo.
-
-==================================================
-OBJETIVO
-==================================================
-Classificar o vídeo no TÓPICO MAIS ADEQUADO da trilha fornecida.
-
-
-==================================================
-REGRAS ABSOLUTAS (SIGA À RISCA)
-==================================================
-1. Classifique somente com base na sinopse.
-2. Não invente tópicos.
-3. A sinopse já removeu tudo que é ruído — confie nela.
-4. Classificar quando a sinopse descreve exatamente o que o tópico aborda.
-5. Classificar quando há palavras-chave técnicas explícitas compatíveis.
-6. Quando a sinopse descrever uma ação, prática ou explicação que se encaixa de forma natural em um tópico (mesmo sem match literal), você DEVE classificar.
-7. Só retorne "invalido" quando NÃO houver relação técnica plausível com NENHUM dos tópicos.
-
-
-==================================================
-DADOS DO VÍDEO
-==================================================
-
-Sinopse Técnica: {row['contexto']}
-Título do Vídeo: {row['title']}
-==================================================
-TÓPICOS DISPONÍVEIS PARA "{classificacao_json}":
-{trilha_txt}
-
-==================================================
-LEMBRETE FINAL:
-- Você NÃO PODE criar novos tópicos
-- Se não houver correspondência clara, responda "invalido".
-- Se a sinopse for genérica demais (ex: motivacional, opinião,
-   apresentação, dicas vagas), classifique como "invalido".
-
-RESPONDA APENAS COM:
-- O nome EXATO de um tópico da lista acima
-- "invalido"
-
-Sem explicações. Sem JSON.
-"""
-        
-        # Chamar Groq
-        try:
-            model = genai.GenerativeModel(model_name='gemma-3-27b-it', generation_config=GenerationConfig(temperature=0.1))
-            response = model.generate_content(prompt) 
-            topico = response.text
-            topicos_classificados.append(topico)
-            print(f"  → Tópico: {topico}")
-            
-        except Exception as e:
-            print(f"  ❌ Erro: {e}")
-            topicos_classificados.append("erro")
-        
-        # Rate limit
-        time.sleep(3)
-    
-    # Adicionar coluna ao DataFrame
-    df_para_classificar[coluna] = topicos_classificados
-    
-    return df_para_classificar
-
-
-
-def upload_df_to_gcs_raw(df, bucket_name, filename):
-    
-    
-    creds_json = os.environ['STORAGE_KEY']
-
-    creds_dict = json.loads(creds_json)
-    
-    credentials = service_account.Credentials.from_service_account_info(creds_dict)
-
-    # Cria o cliente do Storage autenticado com as credenciais carregadas na memória
-    client = storage.Client(credentials=credentials, project=credentials.project_id)
-    bucket = client.bucket(bucket_name)
-
-    
-    csv_data = df.to_csv(index=False, sep=';')
-
-    
-    blob_path = f"{filename}"
-    blob = bucket.blob(blob_path)
-
-    
-    blob.upload_from_string(csv_data, content_type='text/csv')
-
-    print(f"Arquivo '{blob_path}' enviado com sucesso para o bucket '{bucket_name}'.")
-
-# ============================================
-# PIPELINE PRINCIPAL
-# ============================================
-
-def executar_teste(csv_path, youtube_api_key, gemini_api_key, start, end):
-    """Executa teste completo"""
-    
-    # print("=" * 70)
-    # print("INICIANDO TESTE")
-    # print("=" * 70)
-    
-    # 1. Carregar 60 canais
-    # df_canais = carregar_canais(csv_path, start=start, end=end)
-    
-    # 2. Buscar vídeos de todos os canais
-    # todos_videos = []
-    
-    # for idx, row in df_canais.iterrows():
-        # channel_id = row['channel_id']
-        # channel_name = row['channel_title']
-        
-        # print(f"\n[{idx+1}/60] Processando: {channel_name}")
-        
-        # try:
-            # Buscar video IDs
-            # video_ids = buscar_video_ids_canal(channel_id, youtube_api_key)
-            # print(f"  → {len(video_ids)} vídeos encontrados")
-            
-            # Buscar metadados
-            # if video_ids:
-                # videos_data = buscar_metadados_videos(video_ids, youtube_api_key)
-                # todos_videos.extend(videos_data)
-                # print(f"  → Metadados coletados: {len(videos_data)}")
-            
-        # except Exception as e:
-            # print(f"  ❌ Erro: {e}")
-            # continue
-    
-    # 3. Criar DataFrame
-    # print(f"\n{'=' * 70}")
-    # print(f"Total de vídeos coletados: {len(todos_videos)}")
-    # df_videos = pd.DataFrame(todos_videos)
-    
-    # 4. Filtrar por data (junho/2024+)
-    # df_filtrado = filtrar_por_data(df_videos, data_minima='2021-01-01')
-    
-    # 5. Salvar intermediário
-    # df_filtrado.to_csv('videos_coletados_1000.csv', index=False, sep=';')
-    # print(f"✅ Vídeos salvos: videos_coletados_terca.csv")
-    
-    df_filtrado = pd.read_csv('datasets/videos_coletados_0_15000.csv',sep=';', encoding='utf-8')
-    
-    df_filtrado = df_filtrado.iloc[start:end]
-    
-    # df_filtrado = df_filtrado[df_filtrado['likeCount'] > 25]
-    
-    # 6. Classificar 100 vídeos
-    print(f"\n{'=' * 70}")
-    print("CLASSIFICAÇÃO COM GEMINI")
-    print("=" * 70)
-
-    df_contextualizado = contextualizar_videos_groq(df_filtrado, gemini_api_key, limite=100)
-
-    df_contextualizado['contexto'] = df_contextualizado['contexto'].astype(str).str.strip().str.lower()
-
-    df_contextualizado = df_contextualizado[~df_contextualizado['contexto'].isin(['invalido','erro'])]
-    
-    df_classificado = classificar_videos_groq(df_contextualizado, gemini_api_key, limite=100)
-
-    df_classificado_trilha = classificar_trilhas_groq(df_classificado,gemini_api_key)
-
-    df_classificado_trilha['topico_trilha'] = df_classificado_trilha['topico_trilha'].astype(str).str.strip().str.lower()
-
-    df_classificado_trilha = df_classificado_trilha[~df_classificado_trilha['topico_trilha'].isin(['invalido','sem_trilha','erro'])]
-    
-    df_classificado_trilha = classificar_trilhas_groq(df_classificado_trilha,gemini_api_key,coluna='topico_duplicado',funcao=obter_tecnologia_base)
-    
-    # 7. Salvar resultado final
-    output_filename = f"classificados_{START}_{END}.csv"
-    upload_df_to_gcs_raw(df_classificado_trilha, 'video_bruto', output_filename)
-    print(f"\n✅ Resultado final salvo: videos_classificados_adonis.csv")
-    
-    # 8. Resumo
-    print(f"\n{'=' * 70}")
-    print("RESUMO")
-    print("=" * 70)
-    print(f"Canais processados: 60")
-    # print(f"Vídeos totais: {len(df_videos)}")
-    print(f"Vídeos desde jun/2024: {len(df_filtrado)}")
-    print(f"Vídeos classificados: {len(df_classificado)}")
-    
-    return df_classificado_trilha # mudar depois para df_classificado
-
-# ============================================
-# EXECUTAR
-# ============================================
-
-if __name__ == "__main__":
-    
-    # Configurações
-    CSV_PATH = 'datasets/canais_tech_BR.csv'
-    YOUTUBE_API_KEY = os.environ['API_KEY']
-    GEMINI_API_KEY = os.environ['GEMINI_API_KEY']
-
-    START = int(os.environ['START_INDEX'])
-    END   = int(os.environ['END_INDEX'])
-    
-    # GROQ_API_KEY = os.environ['GROQ_API_KEY']
-    # Executar teste
-    df_resultado = executar_teste(CSV_PATH, YOUTUBE_API_KEY, GEMINI_API_KEY, START, END)
-    
-    # Ver alguns resultados
-    print("\n" + "=" * 70)
-    print("AMOSTRA DOS RESULTADOS")
-    print("=" * 70)
-
-    print(df_resultado[['title', 'channel_name', 'published_at', 'viewCount']].head(10))
-
-
-
-
-
-
-
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from googleapiclient.discovery import build_from_document
+from googleapiclient import discovery_cache
+from googleapiclient.errors import HttpError
+import httplib2
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import time
+import json
+import re
+import google.generativeai as genai
+import google.ai.generativelanguage as glm
+from google.generativeai import GenerationConfig
+from google.cloud import storage
+from google.oauth2 import service_account
+import sys
+from google.api_core import exceptions as gexc
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import random
+import copy
+import hashlib
+import sqlite3
+import glob
+import abc
+import bisect
+import collections
+import contextlib
+import difflib
+import functools
+import itertools
+import math
+import unicodedata
+import zlib
+import os
+import posixpath
+
+
+
+# Copy-on-write (padrão a partir do pandas 3): filtros e colunas novas não copiam o DataFrame inteiro
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+# ============================================
+# FUNÇÕES
+# ============================================
+
+def carregar_canais(csv_path, start=0, end=None):
+    """Carrega canais do CSV"""
+    df = pd.read_csv(csv_path, sep=';')
+    print(f"Total de canais no CSV: {len(df)}")
+    df_teste = df.iloc[start:end]
+    print(f"Usando {len(df_teste)} canais para teste")
+    return df_teste
+
+def converter_para_playlist_id(channel_id):
+    """UC... -> UU..."""
+    if channel_id.startswith('UC'):
+        return 'UU' + channel_id[2:]
+    return channel_id
+
+def buscar_video_ids_canal(channel_id, youtube_api_key):
+    """Busca todos os video IDs de um canal"""
+    return obter_coletor(youtube_api_key).buscar_video_ids(channel_id)
+
+def buscar_metadados_videos(video_ids, youtube_api_key):
+    """Busca metadados dos vídeos em batches de 50"""
+    return obter_coletor(youtube_api_key).buscar_metadados(video_ids)
+
+def filtrar_por_data(df, data_minima='2024-06-01'):
+    """Filtra vídeos de junho/2024 para cá"""
+    df['published_at'] = pd.to_datetime(df['published_at'])
+    df_filtrado = df[df['published_at'] >= data_minima]
+    print(f"Vídeos após filtro de data (>= {data_minima}): {len(df_filtrado)}")
+    return df_filtrado
+
+
+
+# ============================================
+# COLETA NO YOUTUBE
+# ============================================
+
+YOUTUBE_WORKERS = int(os.environ.get('YOUTUBE_WORKERS', 8))
+YOUTUBE_NUM_RETRIES = 3
+
+
+@functools.lru_cache(maxsize=None)
+def documento_discovery_youtube():
+    """Discovery document do YouTube v3 (estático, lido do pacote uma única vez)"""
+    return discovery_cache.get_static_doc('youtube', 'v3')
+
+
+def extrair_metadados(item):
+    """Item de videos().list → linha do dataset de vídeos"""
+    snippet = item.get('snippet', {})
+    statistics = item.get('statistics', {})
+    content_details = item.get('contentDetails', {})
+
+    return {
+        'video_id': item['id'],
+        'url': f"https://www.youtube.com/watch?v={item['id']}",
+        'title': snippet.get('title'),
+        'description': snippet.get('description'),
+        'channel_id': snippet.get('channelId'),
+        'channel_name': snippet.get('channelTitle'),
+        'published_at': snippet.get('publishedAt'),
+        'thumbnail': snippet.get('thumbnails', {}).get('high', {}).get('url'),
+        'viewCount': int(statistics.get('viewCount', 0)),
+        'likeCount': int(statistics.get('likeCount', 0)),
+        'commentCount': int(statistics.get('commentCount', 0)),
+        'defaultAudioLanguage': snippet.get('defaultAudioLanguage'),
+        'duration': content_details.get('duration'),
+        'tags': snippet.get('tags', [])
+    }
+
+
+# Custo em unidades da YouTube Data API por tipo de chamada
+CUSTO_YOUTUBE = {
+    'playlistItems.list': 1,
+    'videos.list': 1,
+    'channels.list': 1,
+    'search.list': 100,
+}
+COTA_DIARIA_YOUTUBE = int(os.environ.get('YOUTUBE_COTA_DIARIA', 10000))
+RESERVA_COTA_YOUTUBE = 200
+CAMINHO_COTA_YOUTUBE = os.environ.get('YOUTUBE_COTA_PATH', '.cache/cota_youtube.sqlite')
+
+
+class CotaYouTubeEsgotada(Exception):
+    """A chave não tem mais unidades no dia"""
+
+
+def dia_cota_youtube():
+    """A cota do YouTube zera à meia-noite do horário do Pacífico"""
+    return datetime.now(ZoneInfo('America/Los_Angeles')).date().isoformat()
+
+
+class RegistroCotaYouTube:
+    """Livro-razão das unidades gastas por chave e por tipo de chamada, por dia"""
+
+    def __init__(self, caminho=CAMINHO_COTA_YOUTUBE, cota_diaria=COTA_DIARIA_YOUTUBE):
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.cota_diaria = cota_diaria
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS unidades (
+                dia TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                chamadas INTEGER NOT NULL,
+                unidades INTEGER NOT NULL,
+                PRIMARY KEY (dia, chave, tipo)
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def _id(api_key):
+        # Nunca grava a chave em claro
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+    def registrar(self, api_key, tipo):
+        unidades = CUSTO_YOUTUBE[tipo]
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO unidades (dia, chave, tipo, chamadas, unidades) VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (dia, chave, tipo) DO UPDATE SET
+                    chamadas = chamadas + 1, unidades = unidades + excluded.unidades
+            """, (dia_cota_youtube(), self._id(api_key), tipo, unidades))
+            self.conn.commit()
+
+    def usadas(self, api_key):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COALESCE(SUM(unidades), 0) FROM unidades WHERE dia = ? AND chave = ?",
+                (dia_cota_youtube(), self._id(api_key)),
+            ).fetchone()[0]
+
+    def restantes(self, api_key):
+        return max(0, self.cota_diaria - RESERVA_COTA_YOUTUBE - self.usadas(api_key))
+
+    def resumo(self, api_key):
+        with self.lock:
+            linhas = self.conn.execute(
+                "SELECT tipo, chamadas, unidades FROM unidades WHERE dia = ? AND chave = ? ORDER BY tipo",
+                (dia_cota_youtube(), self._id(api_key)),
+            ).fetchall()
+        return {tipo: {'chamadas': chamadas, 'unidades': unidades} for tipo, chamadas, unidades in linhas}
+
+
+_registro_cota = None
+
+def obter_registro_cota():
+    global _registro_cota
+    if _registro_cota is None:
+        _registro_cota = RegistroCotaYouTube()
+    return _registro_cota
+
+
+
+CAMINHO_MARCAS_CANAIS = os.environ.get('MARCAS_CANAIS_PATH', '.cache/marcas_canais.sqlite')
+
+
+class MarcasCanais:
+    """Marca d'água por canal: último vídeo visto (id e data) e ETag da 1ª página de uploads.
+
+    As marcas novas ficam pendentes até `confirmar()`, chamado depois que o delta
+    coletado foi salvo — assim uma execução que cai no meio não pula vídeos.
+    """
+
+    def __init__(self, caminho=CAMINHO_MARCAS_CANAIS):
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS marcas (
+                channel_id TEXT PRIMARY KEY,
+                video_id TEXT,
+                published_at TEXT,
+                etag TEXT,
+                atualizado_em REAL
+            )
+        """)
+        self.conn.commit()
+        self.pendentes = {}
+
+    def obter(self, channel_id):
+        with self.lock:
+            linha = self.conn.execute(
+                "SELECT video_id, published_at, etag FROM marcas WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+        if linha is None:
+            return None
+        return {'video_id': linha[0], 'published_at': linha[1], 'etag': linha[2]}
+
+    def registrar(self, channel_id, video_id, published_at, etag):
+        with self.lock:
+            self.pendentes[channel_id] = (video_id, published_at, etag)
+
+    def confirmar(self):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO marcas (channel_id, video_id, published_at, etag, atualizado_em) VALUES (?, ?, ?, ?, ?)",
+                [(canal, *marca, time.time()) for canal, marca in self.pendentes.items()],
+            )
+            self.conn.commit()
+            print(f"Marcas de {len(self.pendentes)} canais confirmadas")
+            self.pendentes = {}
+
+
+_marcas_canais = None
+
+def obter_marcas_canais():
+    global _marcas_canais
+    if _marcas_canais is None:
+        _marcas_canais = MarcasCanais()
+    return _marcas_canais
+
+
+
+class HttpContabilizado:
+    """Transporte que chama `ao_tentar` antes de cada tentativa HTTP e repassa ao Http real"""
+
+    def __init__(self, http, ao_tentar):
+        self.http = http
+        self.ao_tentar = ao_tentar
+
+    def request(self, *args, **kwargs):
+        self.ao_tentar()
+        return self.http.request(*args, **kwargs)
+
+
+class ColetorYouTube:
+    """Coleta vídeos de muitos canais em paralelo com um cliente por thread.
+
+    O cliente é montado uma vez por worker a partir do discovery document em memória,
+    e cada worker reaproveita sua conexão HTTP (keep-alive) entre as requisições.
+    """
+
+    def __init__(self, api_key, max_workers=YOUTUBE_WORKERS):
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.local = threading.local()
+        self.cota = obter_registro_cota()
+
+    def cliente(self):
+        # httplib2 não é thread-safe: cada thread tem seu Http e seu cliente
+        if not hasattr(self.local, 'youtube'):
+            self.local.youtube = build_from_document(
+                documento_discovery_youtube(),
+                developerKey=self.api_key,
+                http=httplib2.Http(timeout=30),
+            )
+        return self.local.youtube
+
+    def executar_requisicao(self, request, tipo):
+        """Executa a requisição contabilizando as unidades gastas no livro-razão.
+
+        Cada tentativa HTTP (as retentativas do `num_retries` também gastam cota)
+        é registrada ao passar pelo transporte.
+        """
+        if self.cota.restantes(self.api_key) < CUSTO_YOUTUBE[tipo]:
+            raise CotaYouTubeEsgotada(f"Cota diária esgotada para a chave ...{self.api_key[-4:]}")
+        http = HttpContabilizado(request.http, lambda: self.cota.registrar(self.api_key, tipo))
+        return request.execute(http=http, num_retries=YOUTUBE_NUM_RETRIES)
+
+    def buscar_video_ids(self, channel_id):
+        """Todos os video IDs da playlist de uploads do canal"""
+        youtube = self.cliente()
+        playlist_id = converter_para_playlist_id(channel_id)
+
+        video_ids = []
+        next_page_token = None
+
+        while True:
+            request = youtube.playlistItems().list(
+                part='contentDetails',
+                playlistId=playlist_id,
+                maxResults=50,
+                pageToken=next_page_token
+            )
+            response = self.executar_requisicao(request, 'playlistItems.list')
+
+            for item in response['items']:
+                video_ids.append(item['contentDetails']['videoId'])
+
+            next_page_token = response.get('nextPageToken')
+            if not next_page_token:
+                break
+
+        return video_ids
+
+    def buscar_video_ids_novos(self, channel_id, data_minima=None, marcas=None):
+        """Só os uploads posteriores à marca d'água do canal (e a `data_minima`).
+
+        A paginação para no primeiro vídeo já conhecido ou anterior ao corte, e a
+        1ª página vai com If-None-Match: canal sem uploads novos responde 304 e
+        custa só essa requisição. Retorna (video_ids, nova marca ou None); quem
+        chama registra a marca só depois de buscar os metadados.
+        """
+        youtube = self.cliente()
+        playlist_id = converter_para_playlist_id(channel_id)
+        marca = marcas.obter(channel_id) if marcas else None
+        corte = pd.Timestamp(data_minima, tz='UTC') if data_minima else None
+
+        video_ids = []
+        mais_recente = None
+        etag = None
+        next_page_token = None
+
+        while True:
+            request = youtube.playlistItems().list(
+                part='contentDetails',
+                playlistId=playlist_id,
+                maxResults=50,
+                pageToken=next_page_token
+            )
+            if next_page_token is None and marca and marca['etag']:
+                request.headers['If-None-Match'] = marca['etag']
+            try:
+                response = self.executar_requisicao(request, 'playlistItems.list')
+            except HttpError as e:
+                if e.resp.status == 304:
+                    return [], None
+                raise
+
+            if next_page_token is None:
+                etag = response.get('etag')
+
+            parar = False
+            for item in response['items']:
+                detalhes = item['contentDetails']
+                publicado = detalhes.get('videoPublishedAt')
+                if mais_recente is None:
+                    mais_recente = (detalhes['videoId'], publicado)
+
+                if marca and (detalhes['videoId'] == marca['video_id']
+                              or (publicado and marca['published_at'] and publicado <= marca['published_at'])):
+                    parar = True
+                    break
+                if corte is not None and publicado and pd.Timestamp(publicado) < corte:
+                    parar = True
+                    break
+                video_ids.append(detalhes['videoId'])
+
+            next_page_token = response.get('nextPageToken')
+            if parar or not next_page_token:
+                break
+
+        nova_marca = (mais_recente[0], mais_recente[1], etag) if mais_recente else None
+        return video_ids, nova_marca
+
+    def buscar_metadados(self, video_ids):
+        """Metadados em batches de 50 IDs por videos().list"""
+        youtube = self.cliente()
+        videos_data = []
+
+        for i in range(0, len(video_ids), 50):
+            batch = video_ids[i:i+50]
+
+            request = youtube.videos().list(
+                part='snippet,statistics,contentDetails',
+                id=','.join(batch)
+            )
+            response = self.executar_requisicao(request, 'videos.list')
+            videos_data.extend(extrair_metadados(item) for item in response['items'])
+
+        return videos_data
+
+    def coletar_canal(self, channel_id, channel_name=None, data_minima=None, marcas=None):
+        try:
+            nova_marca = None
+            if data_minima or marcas:
+                video_ids, nova_marca = self.buscar_video_ids_novos(channel_id, data_minima, marcas)
+            else:
+                video_ids = self.buscar_video_ids(channel_id)
+            videos_data = self.buscar_metadados(video_ids) if video_ids else []
+            # Marca só avança com os metadados em mãos: uma falha no videos().list
+            # não pode fazer a próxima coleta pular esses vídeos
+            if marcas and nova_marca:
+                marcas.registrar(channel_id, *nova_marca)
+            print(f"  ✓ {channel_name or channel_id}: {len(video_ids)} vídeos, {len(videos_data)} com metadados")
+            return videos_data
+        except Exception as e:
+            print(f"  ❌ Erro no canal {channel_name or channel_id}: {e}")
+            return []
+
+    def coletar_canais(self, df_canais, data_minima=None, marcas=None):
+        """Coleta todos os canais com um pool limitado; resultado na ordem dos canais"""
+        canais = list(zip(df_canais['channel_id'], df_canais['channel_title']))
+        print(f"\nColetando {len(canais)} canais com {self.max_workers} workers...")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            por_canal = list(pool.map(lambda canal: self.coletar_canal(*canal, data_minima, marcas), canais))
+
+        todos_videos = [video for videos in por_canal for video in videos]
+        print(f"Total de vídeos coletados: {len(todos_videos)}")
+        return todos_videos
+
+
+_coletores = {}
+
+def obter_coletor(youtube_api_key):
+    """Coletor compartilhado por chave (clientes e conexões reaproveitados entre chamadas)"""
+    if youtube_api_key not in _coletores:
+        _coletores[youtube_api_key] = ColetorYouTube(youtube_api_key)
+    return _coletores[youtube_api_key]
+
+
+def coletar_videos_canais(df_canais, youtube_api_key, data_minima=None, incremental=False):
+    """Coleta os vídeos de todos os canais do DataFrame e devolve um DataFrame.
+
+    Com `incremental`, só vêm os vídeos novos desde a última coleta de cada canal;
+    chame `obter_marcas_canais().confirmar()` depois de salvar o resultado.
+    """
+    marcas = obter_marcas_canais() if incremental else None
+    return pd.DataFrame(obter_coletor(youtube_api_key).coletar_canais(df_canais, data_minima, marcas))
+
+
+
+# ============================================
+# PLANEJAMENTO DA COLETA (COTA DO YOUTUBE)
+# ============================================
+
+# Peso de rendimento esperado pela categoria da busca que encontrou o canal
+# (canais de carreira/vagas quase nunca rendem vídeos de ensino técnico)
+PESOS_CATEGORIA = [
+    (re.compile(r'carreira|vagas|pleno|j[úu]nior|portf[óo]lio|not[íi]cias|dev brasil|profissional', re.IGNORECASE), 0.4),
+    (re.compile(r'curso|aula|do zero|tutorial|aprender|completo|iniciante|avan[çc]ado', re.IGNORECASE), 1.3),
+]
+
+
+def peso_categoria(query_usada):
+    for padrao, peso in PESOS_CATEGORIA:
+        if padrao.search(str(query_usada or '')):
+            return peso
+    return 1.0
+
+
+def buscar_estatisticas_canais(channel_ids, youtube_api_key):
+    """videoCount de cada canal via channels().list (1 unidade a cada 50 canais)"""
+    coletor = obter_coletor(youtube_api_key)
+    youtube = coletor.cliente()
+    contagens = {}
+    for i in range(0, len(channel_ids), 50):
+        request = youtube.channels().list(part='statistics', id=','.join(channel_ids[i:i+50]), maxResults=50)
+        response = coletor.executar_requisicao(request, 'channels.list')
+        for item in response.get('items', []):
+            contagens[item['id']] = int(item.get('statistics', {}).get('videoCount', 0))
+    return contagens
+
+
+def estimar_custo_canais(df_canais, contagens, data_minima=None, marcas=None):
+    """Unidades estimadas por canal e uploads esperados desde o corte (ou desde a última coleta)"""
+    agora = pd.Timestamp.now(tz='UTC')
+    criado = pd.to_datetime(df_canais['published_at'], utc=True, errors='coerce')
+    idade_dias = (agora - criado).dt.days.clip(lower=30).fillna(365)
+    total = df_canais['channel_id'].map(contagens).fillna(0)
+    por_dia = total / idade_dias
+
+    if data_minima:
+        janela = (agora - pd.Timestamp(data_minima, tz='UTC')).days
+        esperados = (por_dia * janela).clip(upper=total)
+    else:
+        esperados = total
+
+    if marcas is not None:
+        ultimas = df_canais['channel_id'].map(lambda c: (marcas.obter(c) or {}).get('published_at'))
+        desde = (agora - pd.to_datetime(ultimas, utc=True, errors='coerce')).dt.days
+        esperados = esperados.where(desde.isna(), (por_dia * desde).clip(upper=total))
+
+    # Páginas de playlistItems + lotes de videos().list (mínimo: 1 página, mesmo sem novidades)
+    paginas = (esperados / 50).apply(math.ceil).clip(lower=1)
+    lotes = (esperados / 50).apply(math.ceil)
+    return paginas + lotes, esperados, por_dia
+
+
+def ritmo_recente(df_canais, por_dia, marcas):
+    """Uploads por dia limitados pela atividade recente do canal.
+
+    `por_dia` é a média da vida toda (videoCount / idade); um canal cujo último
+    upload conhecido (marca d'água) foi há `d` dias não sustenta mais que 1/d
+    por dia, por maior que tenha sido o ritmo no passado.
+    """
+    agora = pd.Timestamp.now(tz='UTC')
+    ultimas = df_canais['channel_id'].map(lambda c: (marcas.obter(c) or {}).get('published_at'))
+    desde = (agora - pd.to_datetime(ultimas, utc=True, errors='coerce')).dt.total_seconds() / 86400
+    teto = 1 / desde.clip(lower=1)
+    return por_dia.where(desde.isna(), np.minimum(por_dia, teto))
+
+
+def planejar_coleta(df_canais, youtube_api_keys, data_minima=None, incremental=False):
+    """Distribui os canais entre as chaves dentro da cota restante de cada uma.
+
+    Canais são ordenados pelo rendimento esperado (ritmo de uploads limitado pelo
+    último upload conhecido × peso da categoria `query_usada` × taxa histórica de
+    aproveitamento do canal); os que
+    não cabem em nenhuma chave ficam adiados e os pulados pelo histórico nem entram.
+    Retorna o plano (canais com `chave`, `custo_estimado` e `prioridade`) e os adiados.
+    """
+    registro = obter_registro_cota()
+    marcas = obter_marcas_canais() if incremental else None
+
+    aproveitamento = pd.Series(1.0, index=df_canais['channel_id'].astype(str))
+    if RENDIMENTO_CANAIS_ATIVO:
+        decisoes = decidir_canais(df_canais['channel_id'])
+        pulados = df_canais['channel_id'].astype(str).map(decisoes['decisao']).eq('pular')
+        if pulados.any():
+            print(f"  {int(pulados.sum())} canais pulados pelo rendimento histórico")
+        df_canais = df_canais[~pulados.to_numpy()]
+        aproveitamento = decisoes['rendimento_esperado']
+
+    contagens = buscar_estatisticas_canais(df_canais['channel_id'].tolist(), youtube_api_keys[0])
+    custo, esperados, por_dia = estimar_custo_canais(df_canais, contagens, data_minima, marcas)
+
+    plano = df_canais.copy()
+    plano['custo_estimado'] = custo.astype(int)
+    plano['videos_esperados'] = esperados.round(1)
+    # As marcas só mudam o custo na coleta incremental, mas sempre informam a atividade recente
+    ritmo = ritmo_recente(df_canais, por_dia, marcas or obter_marcas_canais())
+    plano['prioridade'] = ritmo * plano['query_usada'].map(peso_categoria) if 'query_usada' in plano else ritmo
+    plano['prioridade'] *= plano['channel_id'].astype(str).map(aproveitamento).to_numpy()
+    plano = plano.sort_values('prioridade', ascending=False, kind='stable')
+
+    restantes = {chave: registro.restantes(chave) for chave in youtube_api_keys}
+    atribuicoes = []
+    for custo_canal in plano['custo_estimado']:
+        chave = max(restantes, key=restantes.get)
+        if restantes[chave] >= custo_canal:
+            restantes[chave] -= custo_canal
+            atribuicoes.append(chave)
+        else:
+            atribuicoes.append(None)
+    plano['chave'] = atribuicoes
+
+    adiados = plano[plano['chave'].isna()]
+    plano = plano[plano['chave'].notna()]
+    print(f"\nPlano de coleta: {len(plano)} canais, ~{int(plano['custo_estimado'].sum())} unidades "
+          f"em {len(youtube_api_keys)} chave(s) | {len(adiados)} canais adiados por falta de cota")
+    return plano, adiados
+
+
+def coletar_com_plano(plano, data_minima=None, incremental=False):
+    """Executa o plano: cada chave coleta seus canais; resultado na ordem de prioridade"""
+    marcas = obter_marcas_canais() if incremental else None
+    grupos = {chave: grupo for chave, grupo in plano.groupby('chave', sort=False)}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(grupos))) as pool:
+        futuros = {
+            chave: pool.submit(obter_coletor(chave).coletar_canais, grupo, data_minima, marcas)
+            for chave, grupo in grupos.items()
+        }
+        por_chave = {chave: futuro.result() for chave, futuro in futuros.items()}
+
+    registro = obter_registro_cota()
+    for chave in grupos:
+        print(f"  Cota YouTube ...{chave[-4:]}: {registro.usadas(chave)} unidades hoje {registro.resumo(chave)}")
+
+    ordem = {canal: i for i, canal in enumerate(plano['channel_id'])}
+    videos = [video for lista in por_chave.values() for video in lista]
+    videos.sort(key=lambda v: ordem.get(v.get('channel_id'), len(ordem)))
+    return pd.DataFrame(videos)
+
+
+
+# ============================================
+# RENDIMENTO POR CANAL
+# ============================================
+
+RENDIMENTO_CANAIS_ATIVO = os.environ.get('RENDIMENTO_CANAIS', '1') != '0'
+CAMINHO_RENDIMENTO_CANAIS = os.environ.get('RENDIMENTO_CANAIS_PATH', '.cache/rendimento_canais.sqlite')
+# Etapa mais avançada que cada vídeo alcançou (a posição é o nível gravado no banco)
+ETAPAS_RENDIMENTO = ('videos', 'apos_prefiltro', 'contextualizados', 'classificados', 'com_topico')
+# Abaixo disso não há histórico suficiente: o canal segue normalmente
+MIN_VIDEOS_DECISAO = 15
+# Canal pulado quando até o limite superior (95%, unilateral) do rendimento fica abaixo disso
+RENDIMENTO_MINIMO = float(os.environ.get('RENDIMENTO_MINIMO', 0.05))
+Z_CONFIANCA = 1.645
+# Canal amostrado quando até o limite superior fica abaixo desta fração do rendimento global
+# (comprovadamente pior que a média, mas sem confiança para pular)
+FATOR_AMOSTRA = 0.5
+FRACAO_AMOSTRA = 0.3
+# Peso (em vídeos) da média global na estimativa de cada canal
+FORCA_PRIORI = 10
+# Fração dos canais pulados que volta a ser amostrada a cada execução (os verificados há mais tempo)
+ORCAMENTO_EXPLORACAO = float(os.environ.get('RENDIMENTO_EXPLORACAO', 0.1))
+
+
+class RendimentoCanais:
+    """Até que etapa cada vídeo chegou, por canal, acumulado entre execuções.
+
+    Uma linha por video_id: reprocessar o mesmo intervalo ou mesclar o export de
+    outro trabalhador não conta o vídeo duas vezes.
+    """
+
+    def __init__(self, caminho=CAMINHO_RENDIMENTO_CANAIS):
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                video_id TEXT PRIMARY KEY,
+                channel_id TEXT NOT NULL,
+                etapa INTEGER NOT NULL,
+                atualizado_em REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_canal ON resultados (channel_id)")
+        self.conn.commit()
+
+    def _gravar(self, registros):
+        with self.lock:
+            self.conn.executemany("""
+                INSERT INTO resultados (video_id, channel_id, etapa, atualizado_em) VALUES (?, ?, ?, ?)
+                ON CONFLICT (video_id) DO UPDATE SET channel_id = excluded.channel_id, etapa = excluded.etapa,
+                    atualizado_em = excluded.atualizado_em
+                WHERE excluded.atualizado_em >= resultados.atualizado_em
+            """, registros)
+            self.conn.commit()
+
+    def registrar(self, video_ids, canais, etapas):
+        agora = time.time()
+        self._gravar([(str(v), str(c), int(e), agora) for v, c, e in zip(video_ids, canais, etapas)])
+
+    def estatisticas(self):
+        """Por canal: vídeos que passaram de cada etapa e a última atualização"""
+        somas = ', '.join(f"SUM(etapa >= {nivel}) AS {nome}" for nivel, nome in enumerate(ETAPAS_RENDIMENTO))
+        with self.lock:
+            return pd.read_sql_query(
+                f"SELECT channel_id, {somas}, MAX(atualizado_em) AS atualizado_em FROM resultados GROUP BY channel_id",
+                self.conn, index_col='channel_id',
+            )
+
+    def exportar(self, caminho_jsonl, desde=None):
+        """Grava os registros em JSONL; com `desde` (timestamp), só os atualizados a partir dele"""
+        with self.lock, open(caminho_jsonl, 'w', encoding='utf-8') as f:
+            linhas = self.conn.execute(
+                "SELECT video_id, channel_id, etapa, atualizado_em FROM resultados WHERE atualizado_em >= ?",
+                (desde or 0,),
+            )
+            total = 0
+            for video_id, channel_id, etapa, atualizado_em in linhas:
+                f.write(json.dumps({'video_id': video_id, 'channel_id': channel_id, 'etapa': etapa,
+                                    'atualizado_em': atualizado_em}) + '\n')
+                total += 1
+        print(f"Rendimento dos canais exportado: {total} vídeos → {caminho_jsonl}")
+
+    def importar(self, caminho_jsonl):
+        """Mescla o export de outra execução (o registro mais recente de cada vídeo prevalece)"""
+        with open(caminho_jsonl, encoding='utf-8') as f:
+            registros = [(r['video_id'], r['channel_id'], r['etapa'], r['atualizado_em'])
+                         for r in map(json.loads, filter(str.strip, f))]
+        self._gravar(registros)
+        print(f"Rendimento dos canais importado: {len(registros)} vídeos de {caminho_jsonl}")
+
+
+_rendimento_canais = None
+
+def obter_rendimento_canais():
+    """Registro único do processo; importa os JSONL apontados por RENDIMENTO_CANAIS_IMPORTAR (glob)"""
+    global _rendimento_canais
+    if _rendimento_canais is None:
+        _rendimento_canais = RendimentoCanais()
+        for caminho in sorted(glob.glob(os.environ.get('RENDIMENTO_CANAIS_IMPORTAR', ''))):
+            _rendimento_canais.importar(caminho)
+    return _rendimento_canais
+
+
+def decidir_canais(channel_ids, estatisticas=None):
+    """Rendimento esperado e decisão ('enviar', 'amostrar', 'pular', 'explorar') de cada canal.
+
+    O rendimento é a fração de vídeos que chega a ter tópico, encolhida para a
+    média global quando há poucos vídeos; ela só ordena. As decisões usam o limite
+    superior de Wilson: abaixo de FATOR_AMOSTRA × média global o canal é amostrado,
+    abaixo de RENDIMENTO_MINIMO é pulado. Uma parte dos pulados (os verificados há
+    mais tempo) volta como 'explorar' a cada execução.
+    """
+    estatisticas = obter_rendimento_canais().estatisticas() if estatisticas is None else estatisticas
+    canais = pd.Index(pd.unique(pd.Series(channel_ids, dtype=object).astype(str)), name='channel_id')
+    dados = estatisticas.reindex(canais)
+    n = dados['videos'].astype(float).fillna(0)
+    sucessos = dados['com_topico'].astype(float).fillna(0)
+
+    total = estatisticas['videos'].sum() if len(estatisticas) else 0
+    media = estatisticas['com_topico'].sum() / total if total else 0.5
+    esperado = (sucessos + FORCA_PRIORI * media) / (n + FORCA_PRIORI)
+
+    # Limite superior do intervalo de Wilson da fração observada
+    z2 = Z_CONFIANCA ** 2
+    n_seguro = n.where(n > 0, 1)
+    p = sucessos / n_seguro
+    centro = p + z2 / (2 * n_seguro)
+    margem = Z_CONFIANCA * np.sqrt(p * (1 - p) / n_seguro + z2 / (4 * n_seguro ** 2))
+    superior = ((centro + margem) / (1 + z2 / n_seguro)).where(n > 0, 1.0)
+
+    decisao = pd.Series('enviar', index=canais)
+    com_historico = n >= MIN_VIDEOS_DECISAO
+    decisao[com_historico & (superior < FATOR_AMOSTRA * media)] = 'amostrar'
+    pulados = com_historico & (superior < RENDIMENTO_MINIMO)
+    decisao[pulados] = 'pular'
+
+    # Orçamento de exploração: os pulados verificados há mais tempo são reamostrados
+    if pulados.any() and ORCAMENTO_EXPLORACAO > 0:
+        antigos = dados.loc[pulados, 'atualizado_em'].sort_values(kind='stable')
+        decisao[antigos.index[:math.ceil(len(antigos) * ORCAMENTO_EXPLORACAO)]] = 'explorar'
+
+    return pd.DataFrame({'videos': n.astype(int), 'com_topico': sucessos.astype(int), 'rendimento_esperado': esperado,
+                         'limite_superior': superior, 'decisao': decisao})
+
+
+def na_amostra(video_ids, fracao=FRACAO_AMOSTRA):
+    """Amostra determinística por video_id (a mesma em toda reexecução)"""
+    limite = int(fracao * 1000)
+    return np.fromiter((zlib.crc32(str(v).encode('utf-8')) % 1000 < limite for v in video_ids), dtype=bool, count=len(video_ids))
+
+
+def agendar_por_rendimento(df, canais):
+    """Vídeos que seguem para o LLM, do canal de maior rendimento esperado para o de menor.
+
+    Canais 'pular' ficam de fora; 'amostrar' e 'explorar' mandam só FRACAO_AMOSTRA dos vídeos.
+    """
+    canais = canais.astype(str)
+    decisoes = decidir_canais(canais)
+    decisao = canais.map(decisoes['decisao'])
+    amostrado = decisao.isin(['amostrar', 'explorar'])
+    manter = (decisao == 'enviar') | (amostrado & na_amostra(df['video_id'].tolist()))
+
+    ordem = canais.map(decisoes['rendimento_esperado'])[manter].sort_values(ascending=False, kind='stable').index
+    contagem = decisoes['decisao'].value_counts().to_dict()
+    print(f"\nRendimento por canal: {contagem}")
+    print(f"  → {int((~manter).sum())} vídeos fora desta execução "
+          f"({int((decisao == 'pular').sum())} de canais pulados, {int((amostrado & ~manter).sum())} fora da amostra)")
+    obter_metricas().registrar_funil('fora_por_rendimento', (~manter).sum())
+    return df.loc[ordem]
+
+
+def registrar_rendimento(df_filtrado, clusters, alcance):
+    """Grava a etapa alcançada por cada vídeo processado; membros de cluster herdam a do representante"""
+    por_representante = pd.Series(alcance.to_numpy(), index=df_filtrado.loc[alcance.index, 'video_id'].astype(str))
+    etapas = clusters.map(por_representante).dropna()
+    obter_rendimento_canais().registrar(df_filtrado.loc[etapas.index, 'video_id'],
+                                        df_filtrado.loc[etapas.index, 'channel_id'], etapas)
+
+
+
+# ============================================
+# MÉTRICAS POR ETAPA
+# ============================================
+
+DIRETORIO_METRICAS = os.environ.get('METRICAS_DIR', '.metricas')
+# Arquivo .prom para o textfile collector do node_exporter (vazio = não gera)
+METRICAS_PROMETHEUS = os.environ.get('METRICAS_PROMETHEUS', '')
+BUCKETS_LATENCIA = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+
+class MetricasEtapa:
+    """Contadores e histograma de latência de uma etapa de LLM"""
+
+    CONTADORES = ('chamadas', 'sucessos', 'retentativas', 'erros_cota', 'falhas_permanentes',
+                  'cache_hits', 'retomados', 'tokens_entrada', 'tokens_em_cache', 'tokens_saida', 'espera_cota_s', 'espera_backoff_s',
+                  'duracao_s')
+
+    def __init__(self):
+        self.contadores = dict.fromkeys(self.CONTADORES, 0)
+        self.buckets = [0] * (len(BUCKETS_LATENCIA) + 1)
+        self.latencias = []
+
+    def observar_latencia(self, segundos):
+        self.buckets[bisect.bisect_left(BUCKETS_LATENCIA, segundos)] += 1
+        self.latencias.append(segundos)
+
+    def percentil(self, p):
+        if not self.latencias:
+            return None
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+    def como_dict(self):
+        acumulado, histograma = 0, {}
+        for limite, quantidade in zip(BUCKETS_LATENCIA + ('+Inf',), self.buckets):
+            acumulado += quantidade
+            histograma[str(limite)] = acumulado
+        return {
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.contadores.items()},
+            'latencia_p50_s': self.percentil(50),
+            'latencia_p99_s': self.percentil(99),
+            'latencia_soma_s': round(sum(self.latencias), 3),
+            'latencia_histograma': histograma,
+        }
+
+
+class Metricas:
+    """Instrumentação de um shard: métricas por etapa de LLM e o funil de vídeos entre as etapas"""
+
+    def __init__(self, shard=''):
+        self.shard = shard
+        self.etapas = {}
+        self.funil = {}
+        self.lock = threading.Lock()
+
+    def _etapa(self, etapa):
+        if etapa not in self.etapas:
+            self.etapas[etapa] = MetricasEtapa()
+        return self.etapas[etapa]
+
+    def contar(self, etapa, nome, quantidade=1):
+        with self.lock:
+            self._etapa(etapa).contadores[nome] += quantidade
+
+    def registrar_chamada(self, etapa, segundos, response=None):
+        """Latência de uma chamada bem-sucedida e tokens do usage_metadata da resposta"""
+        uso = getattr(response, 'usage_metadata', None)
+        with self.lock:
+            dados = self._etapa(etapa)
+            dados.observar_latencia(segundos)
+            dados.contadores['sucessos'] += 1
+            if uso is not None:
+                dados.contadores['tokens_entrada'] += getattr(uso, 'prompt_token_count', 0) or 0
+                dados.contadores['tokens_saida'] += getattr(uso, 'candidates_token_count', 0) or 0
+                dados.contadores['tokens_em_cache'] += getattr(uso, 'cached_content_token_count', 0) or 0
+
+    def registrar_funil(self, passo, quantidade):
+        with self.lock:
+            self.funil[passo] = int(quantidade)
+
+    def registros(self):
+        momento = datetime.now().isoformat(timespec='seconds')
+        linhas = [{'tipo': 'etapa', 'shard': self.shard, 'momento': momento, 'etapa': etapa, **dados.como_dict()}
+                  for etapa, dados in self.etapas.items()]
+        linhas.append({'tipo': 'funil', 'shard': self.shard, 'momento': momento, **self.funil})
+        return linhas
+
+    def emitir_jsonl(self, caminho):
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'a', encoding='utf-8') as f:
+            for linha in self.registros():
+                f.write(json.dumps(linha, ensure_ascii=False) + '\n')
+
+    def exportar_prometheus(self, caminho):
+        """Formato texto do Prometheus; gravado em arquivo temporário e renomeado (leitura atômica)"""
+        linhas = []
+        rotulos = lambda **extra: '{' + ','.join(f'{k}="{v}"' for k, v in {'shard': self.shard, **extra}.items()) + '}'
+
+        linhas.append('# TYPE pipeline_llm_latencia_segundos histogram')
+        for etapa, dados in self.etapas.items():
+            acumulado = 0
+            for limite, quantidade in zip(BUCKETS_LATENCIA + ('+Inf',), dados.buckets):
+                acumulado += quantidade
+                linhas.append(f'pipeline_llm_latencia_segundos_bucket{rotulos(etapa=etapa, le=limite)} {acumulado}')
+            linhas.append(f'pipeline_llm_latencia_segundos_sum{rotulos(etapa=etapa)} {sum(dados.latencias):.3f}')
+            linhas.append(f'pipeline_llm_latencia_segundos_count{rotulos(etapa=etapa)} {len(dados.latencias)}')
+
+        for nome in MetricasEtapa.CONTADORES:
+            linhas.append(f'# TYPE pipeline_llm_{nome}_total counter')
+            for etapa, dados in self.etapas.items():
+                linhas.append(f'pipeline_llm_{nome}_total{rotulos(etapa=etapa)} {dados.contadores[nome]}')
+
+        linhas.append('# TYPE pipeline_funil_videos gauge')
+        for passo, quantidade in self.funil.items():
+            linhas.append(f'pipeline_funil_videos{rotulos(passo=passo)} {quantidade}')
+
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(linhas) + '\n')
+        os.replace(temporario, caminho)
+
+    def resumo(self):
+        for etapa, dados in self.etapas.items():
+            c = dados.contadores
+            p50, p99 = dados.percentil(50), dados.percentil(99)
+            latencia = f"p50 {p50:.2f}s / p99 {p99:.2f}s" if p50 is not None else "sem chamadas"
+            print(f"  {etapa}: {c['chamadas']} chamadas ({latencia}) | tokens {c['tokens_entrada']}→{c['tokens_saida']} | "
+                  f"em cache de contexto {c['tokens_em_cache']} | cache {c['cache_hits']} | retentativas {c['retentativas']} | espera {c['espera_cota_s'] + c['espera_backoff_s']:.1f}s")
+        print(f"  Funil: " + " → ".join(f"{passo} {quantidade}" for passo, quantidade in self.funil.items()))
+
+
+_metricas = Metricas()
+
+def obter_metricas():
+    return _metricas
+
+
+def iniciar_metricas(shard):
+    """Zera a instrumentação para um novo shard/lote"""
+    global _metricas
+    _metricas = Metricas(shard)
+    return _metricas
+
+
+def emitir_metricas():
+    """JSONL em DIRETORIO_METRICAS (e o .prom, se configurado) do shard corrente"""
+    metricas = obter_metricas()
+    metricas.resumo()
+    metricas.emitir_jsonl(os.path.join(DIRETORIO_METRICAS, f"metricas_{metricas.shard}.jsonl"))
+    if METRICAS_PROMETHEUS:
+        metricas.exportar_prometheus(METRICAS_PROMETHEUS)
+
+
+# ============================================
+# EXECUTOR DE CHAMADAS LLM
+# ============================================
+
+MODELO_GEMINI = 'gemma-3-27b-it'
+
+# Cotas por chave de API (free tier do gemma-3-27b-it: 30 RPM / 15.000 TPM / 14.400 RPD)
+# Com vários processos usando as mesmas chaves, cada um limita-se à sua parte da cota
+PROCESSOS_POR_CHAVE = max(1, int(os.environ.get('GEMINI_PROCESSOS_POR_CHAVE', 1)))
+LIMITE_RPM = max(1, int(os.environ.get('GEMINI_RPM', 30)) // PROCESSOS_POR_CHAVE)
+LIMITE_TPM = max(1, int(os.environ.get('GEMINI_TPM', 15000)) // PROCESSOS_POR_CHAVE)
+LIMITE_RPD = max(1, int(os.environ.get('GEMINI_RPD', 14400)) // PROCESSOS_POR_CHAVE)
+# Fração do limite por minuto que pode sair de uma vez (o resto é reposto aos poucos)
+FRACAO_RAJADA = 0.1
+# A rajada cresce até o maior pedido visto (um prompt passa de 10% do TPM), limitada a esta fração
+FRACAO_RAJADA_MAXIMA = 0.5
+MAX_WORKERS = int(os.environ.get('GEMINI_WORKERS', 8))
+
+# Saúde das chaves no pool
+MAX_FALHAS_SEGUIDAS_CHAVE = 5
+PAUSA_CHAVE_INSTAVEL = 60.0
+
+# Reserva de tokens de saída somada à estimativa do prompt
+TOKENS_SAIDA_ESTIMADOS = 300
+
+# Retentativas para erros transitórios (429, 5xx)
+MAX_TENTATIVAS = int(os.environ.get('GEMINI_MAX_TENTATIVAS', 6))
+BACKOFF_BASE = 2.0
+BACKOFF_MAXIMO = 120.0
+FATOR_TAXA_MINIMO = 0.1
+
+
+def estimar_tokens(texto):
+    """Estimativa conservadora de tokens (~3 caracteres por token em português)"""
+    return len(texto) // 3 + TOKENS_SAIDA_ESTIMADOS
+
+
+class TokenBucket:
+    """Balde de tokens reposto continuamente, que nunca passa de `por_minuto` em 60s.
+
+    Rajada (capacidade) e reposição somam o limite: o saldo acumulado é só
+    `fracao_rajada` dele e a reposição cobre o restante ao longo do minuto.
+    A capacidade cresce até o maior pedido já visto, então todo pedido é
+    cobrado inteiro de um saldo que o comporta, sem ultrapassar a janela.
+    """
+
+    def __init__(self, por_minuto, fracao_rajada=FRACAO_RAJADA):
+        self.limite = float(por_minuto)
+        self.fator = 1.0
+        self.capacidade = self.limite * fracao_rajada
+        self.disponivel = self.capacidade
+        self.ultimo = time.monotonic()
+        self._recalcular_taxa()
+
+    def _recalcular_taxa(self):
+        self.taxa = self.fator * (self.limite - self.capacidade) / 60.0
+
+    def repor(self):
+        agora = time.monotonic()
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self.ultimo) * self.taxa)
+        self.ultimo = agora
+
+    def garantir_capacidade(self, quantidade):
+        """Aumenta a rajada para caber `quantidade` (até FRACAO_RAJADA_MAXIMA do limite),
+        tirando a diferença da reposição para manter rajada + reposição = limite"""
+        nova = min(max(self.capacidade, float(quantidade)), self.limite * FRACAO_RAJADA_MAXIMA)
+        if nova > self.capacidade:
+            self.repor()
+            self.capacidade = nova
+            self._recalcular_taxa()
+
+    def espera_para(self, quantidade):
+        """Segundos até haver `quantidade` disponível (0 se já houver)"""
+        self.garantir_capacidade(quantidade)
+        # Só pedidos maiores que a rajada máxima esperam o balde cheio e deixam saldo negativo
+        falta = min(quantidade, self.capacidade) - self.disponivel
+        return 0.0 if falta <= 0 else falta / self.taxa
+
+    def consumir(self, quantidade):
+        self.disponivel -= quantidade
+
+    def ajustar_taxa(self, por_minuto):
+        """Muda a taxa de reposição sem perder o saldo já acumulado"""
+        self.repor()
+        self.fator = por_minuto / self.limite
+        self._recalcular_taxa()
+
+
+class LimitadorTaxa:
+    """Limita requisições por minuto (RPM) e tokens por minuto (TPM) de uma chave.
+
+    A taxa efetiva segue AIMD: cai pela metade a cada erro de cota e volta a subir
+    aos poucos a cada sucesso, até o limite configurado.
+    """
+
+    def __init__(self, rpm=LIMITE_RPM, tpm=LIMITE_TPM):
+        self.rpm_limite = rpm
+        self.tpm_limite = tpm
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.fator = 1.0
+        self.pausado_ate = 0.0
+        self.lock = threading.Lock()
+
+    def tentar(self, tokens):
+        """Consome a cota se couber agora (retorna 0); senão, retorna quanto falta esperar"""
+        with self.lock:
+            self.rpm.repor()
+            self.tpm.repor()
+            espera = max(
+                self.pausado_ate - time.monotonic(),
+                self.rpm.espera_para(1),
+                self.tpm.espera_para(tokens),
+            )
+            if espera <= 0:
+                self.rpm.consumir(1)
+                self.tpm.consumir(tokens)
+                return 0.0
+            return espera
+
+    def adquirir(self, tokens):
+        """Bloqueia até a chamada caber nas duas cotas; retorna o tempo esperado"""
+        esperado = 0.0
+        while True:
+            espera = self.tentar(tokens)
+            if espera <= 0:
+                return esperado
+            time.sleep(espera)
+            esperado += espera
+
+    def _aplicar_fator(self):
+        self.rpm.ajustar_taxa(self.rpm_limite * self.fator)
+        self.tpm.ajustar_taxa(self.tpm_limite * self.fator)
+
+    def reduzir(self, pausa=0.0):
+        """Decremento multiplicativo após 429, pausando todos os workers da chave"""
+        with self.lock:
+            self.fator = max(FATOR_TAXA_MINIMO, self.fator * 0.5)
+            self._aplicar_fator()
+            self.pausado_ate = max(self.pausado_ate, time.monotonic() + pausa)
+
+    def aumentar(self):
+        """Incremento aditivo (1 RPM equivalente) após uma chamada bem-sucedida"""
+        with self.lock:
+            if self.fator < 1.0:
+                self.fator = min(1.0, self.fator + 1.0 / self.rpm_limite)
+                self._aplicar_fator()
+
+
+def erro_de_cota(erro):
+    """True para respostas 429 / RESOURCE_EXHAUSTED"""
+    if isinstance(erro, (gexc.ResourceExhausted, gexc.TooManyRequests)):
+        return True
+    texto = str(erro).lower()
+    return '429' in texto or 'quota' in texto or 'rate limit' in texto
+
+
+def erro_transitorio(erro):
+    """Erros que valem nova tentativa: cota, indisponibilidade e timeouts do servidor"""
+    return erro_de_cota(erro) or isinstance(erro, (
+        gexc.ServiceUnavailable,
+        gexc.InternalServerError,
+        gexc.DeadlineExceeded,
+        gexc.GatewayTimeout,
+    ))
+
+
+def chave_invalida(erro):
+    """Chave recusada pela API (inválida, revogada ou sem permissão)"""
+    if isinstance(erro, (gexc.PermissionDenied, gexc.Unauthenticated)):
+        return True
+    return 'api key not valid' in str(erro).lower()
+
+
+def extrair_retry_after(erro):
+    """Lê a dica de espera do erro (RetryInfo ou "retry in Xs" na mensagem), em segundos"""
+    for detalhe in getattr(erro, 'details', None) or []:
+        retry_delay = getattr(detalhe, 'retry_delay', None)
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+
+    texto = str(erro)
+    match = (re.search(r'retry in ([\d.]+)\s*s', texto, re.IGNORECASE)
+             or re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', texto))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def calcular_backoff(tentativa, retry_after=None):
+    """Backoff exponencial com jitter total, respeitando a dica do servidor quando houver"""
+    espera = random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** tentativa))
+    if retry_after is not None:
+        espera = max(espera, retry_after)
+    return espera
+
+
+class ChaveAPI:
+    """Uma chave Gemini com cliente próprio, limitador próprio e estado de saúde"""
+
+    def __init__(self, api_key, rpm=LIMITE_RPM, tpm=LIMITE_TPM, rpd=LIMITE_RPD):
+        self.api_key = api_key
+        self.nome = f"...{api_key[-4:]}"
+        self.limitador = LimitadorTaxa(rpm, tpm)
+        self.cliente = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+        self.restantes_dia = rpd
+        self.falhas_seguidas = 0
+        self.ativa = True
+        self.modelos = {}
+
+    def modelo(self, modelo):
+        """Cópia do GenerativeModel ligada ao cliente desta chave"""
+        # Guarda o original junto: um id reaproveitado por outro modelo não devolve a cópia antiga
+        if id(modelo) not in self.modelos or self.modelos[id(modelo)][0] is not modelo:
+            if isinstance(modelo, ModeloComPrefixo):
+                copia = modelo.para_chave(self)
+            else:
+                copia = copy.copy(modelo)
+                copia._client = self.cliente
+            self.modelos[id(modelo)] = (modelo, copia)
+        return self.modelos[id(modelo)][1]
+
+    def registrar_sucesso(self):
+        self.falhas_seguidas = 0
+        self.limitador.aumentar()
+
+    def registrar_falha(self, erro):
+        if erro_de_cota(erro):
+            # Cota é tratada pelo AIMD do limitador, não conta como instabilidade
+            return
+        self.falhas_seguidas += 1
+        if chave_invalida(erro):
+            self.ativa = False
+            print(f"  ⛔ Chave {self.nome} desativada: {erro}")
+        elif self.falhas_seguidas >= MAX_FALHAS_SEGUIDAS_CHAVE:
+            # Chave instável: tira do rodízio por um tempo sem desativá-la
+            self.limitador.reduzir(PAUSA_CHAVE_INSTAVEL)
+            self.falhas_seguidas = 0
+
+
+class PoolChavesAPI:
+    """Distribui as chamadas de uma fila única entre várias chaves.
+
+    Cada chamada vai para a chave saudável que libera a vaga mais cedo, então uma
+    chave lenta ou estrangulada não segura as demais.
+    """
+
+    def __init__(self, api_keys, rpm=LIMITE_RPM, tpm=LIMITE_TPM):
+        self.chaves = [ChaveAPI(k, rpm, tpm) for k in api_keys]
+        self.lock = threading.Lock()
+        print(f"Pool de chaves Gemini: {len(self.chaves)} chave(s)")
+
+    def adquirir(self, tokens):
+        """Bloqueia até alguma chave ter cota; devolve a chave escolhida e o tempo esperado"""
+        esperado = 0.0
+        while True:
+            with self.lock:
+                candidatas = [c for c in self.chaves if c.ativa and c.restantes_dia > 0]
+                if not candidatas:
+                    raise RuntimeError("Nenhuma chave Gemini disponível (inválidas ou sem cota diária)")
+
+                menor_espera = None
+                # Prefere a chave mais saudável e, entre iguais, a com mais folga no balde
+                for chave in sorted(candidatas, key=lambda c: (-c.limitador.fator, -c.limitador.rpm.disponivel)):
+                    espera = chave.limitador.tentar(tokens)
+                    if espera <= 0:
+                        chave.restantes_dia -= 1
+                        return chave, esperado
+                    menor_espera = espera if menor_espera is None else min(menor_espera, espera)
+
+            time.sleep(menor_espera)
+            esperado += menor_espera
+
+    def resumo(self):
+        return " | ".join(
+            f"{c.nome}: {c.limitador.fator:.0%}" + ("" if c.ativa else " (inativa)")
+            for c in self.chaves
+        )
+
+
+class ExecutorLLM:
+    """Executa chamadas `generate_content` em paralelo respeitando a cota das chaves"""
+
+    def __init__(self, api_keys, rpm=LIMITE_RPM, tpm=LIMITE_TPM, max_workers=MAX_WORKERS):
+        genai.configure(api_key=api_keys[0])
+        self.pool = PoolChavesAPI(api_keys, rpm, tpm)
+        self.max_workers = max_workers * len(api_keys)
+        self.contadores = {'chamadas': 0, 'cache_hits': 0, 'retomados': 0, 'retentativas': 0, 'erros_cota': 0, 'falhas_permanentes': 0}
+        self.lock_contadores = threading.Lock()
+
+    def contar(self, nome, quantidade=1):
+        with self.lock_contadores:
+            self.contadores[nome] += quantidade
+
+    def gerar(self, modelo, prompt, etapa=''):
+        """Uma chamada com retentativas; só propaga o erro quando ele é permanente"""
+        metricas = obter_metricas()
+        tokens = estimar_tokens(prompt)
+        for tentativa in range(MAX_TENTATIVAS):
+            chave, esperado = self.pool.adquirir(tokens)
+            metricas.contar(etapa, 'espera_cota_s', esperado)
+            self.contar('chamadas')
+            metricas.contar(etapa, 'chamadas')
+            inicio = time.perf_counter()
+            try:
+                response = chave.modelo(modelo).generate_content(prompt)
+                texto = response.text
+            except Exception as e:
+                chave.registrar_falha(e)
+                ultima = tentativa == MAX_TENTATIVAS - 1
+                if ultima or not (erro_transitorio(e) or (chave_invalida(e) and not chave.ativa)):
+                    raise
+
+                self.contar('retentativas')
+                metricas.contar(etapa, 'retentativas')
+                if chave_invalida(e):
+                    continue
+
+                espera = calcular_backoff(tentativa, extrair_retry_after(e))
+                if erro_de_cota(e):
+                    # A chave fica pausada; a próxima tentativa pode sair por outra chave
+                    self.contar('erros_cota')
+                    metricas.contar(etapa, 'erros_cota')
+                    chave.limitador.reduzir(espera)
+                    print(f"  ↻ Cota esgotada na chave {chave.nome}, pausando {espera:.1f}s")
+                    continue
+
+                print(f"  ↻ Tentativa {tentativa + 1} falhou ({type(e).__name__}), aguardando {espera:.1f}s")
+                time.sleep(espera)
+                metricas.contar(etapa, 'espera_backoff_s', espera)
+                continue
+
+            metricas.registrar_chamada(etapa, time.perf_counter() - inicio, response)
+            chave.registrar_sucesso()
+            return texto
+
+    def executar(self, modelo, prompts, video_ids, rotulo="Classificados", chaves_cache=None, journal=None, etapa=None):
+        """Roda todos os prompts e devolve as respostas na mesma ordem ("erro" em caso de falha).
+
+        Com `chaves_cache`, respostas já conhecidas saem do cache sem chamar a API.
+        Com `journal`, vídeos já concluídos são retomados e cada novo resultado é registrado.
+        `etapa` identifica as chamadas nas métricas (padrão: o rótulo).
+        """
+        etapa = etapa or rotulo
+        metricas = obter_metricas()
+        inicio = time.perf_counter()
+        total = len(prompts)
+        concluidos = [0]
+        lock = threading.Lock()
+        cache = obter_cache() if chaves_cache is not None else None
+        if chaves_cache is None:
+            chaves_cache = [None] * total
+
+        def tarefa(args):
+            prompt, video_id, chave = args
+            resultado = journal.obter(video_id) if journal else None
+            if resultado is not None:
+                self.contar('retomados')
+                metricas.contar(etapa, 'retomados')
+            else:
+                resultado = cache.obter(chave) if chave else None
+                if resultado is not None:
+                    self.contar('cache_hits')
+                    metricas.contar(etapa, 'cache_hits')
+                else:
+                    try:
+                        resultado = self.gerar(modelo, prompt, etapa)
+                        if chave:
+                            cache.gravar(chave, resultado)
+                    except Exception as e:
+                        print(f"Erro ao classificar vídeo {video_id}: {e}")
+                        self.contar('falhas_permanentes')
+                        metricas.contar(etapa, 'falhas_permanentes')
+                        resultado = "erro"
+
+                if journal and resultado != "erro":
+                    journal.registrar(video_id, resultado)
+
+            with lock:
+                concluidos[0] += 1
+                if concluidos[0] % 10 == 0 or concluidos[0] == total:
+                    print(f"{rotulo}: {concluidos[0]}/{total}")
+            return resultado
+
+        if not prompts:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            resultados = list(pool.map(tarefa, zip(prompts, video_ids, chaves_cache)))
+        metricas.contar(etapa, 'duracao_s', time.perf_counter() - inicio)
+
+        print(f"  Chamadas: {self.contadores['chamadas']} | Cache hits: {self.contadores['cache_hits']} | Retomados: {self.contadores['retomados']} | Retentativas: {self.contadores['retentativas']} | "
+              f"Erros de cota: {self.contadores['erros_cota']} | Falhas permanentes: {self.contadores['falhas_permanentes']}")
+        print(f"  Taxa por chave: {self.pool.resumo()}")
+        return resultados
+
+
+# ============================================
+# CACHE PERSISTENTE DE RESPOSTAS LLM
+# ============================================
+
+CAMINHO_CACHE_LLM = os.environ.get('LLM_CACHE_PATH', '.cache/llm_cache.sqlite')
+CACHE_LLM_MAX_MB = float(os.environ.get('LLM_CACHE_MAX_MB', 200))
+
+# Versões dos templates de prompt: incremente ao alterar o texto de um prompt
+# para que respostas antigas deixem de ser reaproveitadas
+VERSAO_PROMPT_CONTEXTO = 'contexto-v1'
+VERSAO_PROMPT_CLASSIFICACAO = 'classificacao-v1'
+VERSAO_PROMPT_CLASSIFICACAO_LOTE = 'classificacao-lote-v1'
+VERSAO_PROMPT_TRILHA = 'trilha-v1'
+VERSAO_PROMPT_TRILHA_DUPLA = 'trilha-dupla-v1'
+# Formato prefixo fixo (em cache de contexto) + sufixo por vídeo
+VERSAO_PROMPT_CONTEXTO_PREFIXO = 'contexto-prefixo-v1'
+VERSAO_PROMPT_CLASSIFICACAO_PREFIXO = 'classificacao-prefixo-v1'
+VERSAO_PROMPT_CLASSIFICACAO_LOTE_PREFIXO = 'classificacao-lote-prefixo-v1'
+
+CONFIG_CONTEXTO = {'temperature': 0, 'top_k': 1}
+CONFIG_CLASSIFICACAO = {'temperature': 0.1}
+CONFIG_TRILHA = {'temperature': 0.1}
+
+
+def chave_cache(modelo, config, versao_prompt, entradas):
+    """Hash do modelo, config de geração, versão do template e entradas da linha"""
+    conteudo = json.dumps(
+        {'modelo': modelo, 'config': config, 'versao': versao_prompt, 'entradas': entradas},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+class CacheLLM:
+    """Cache SQLite endereçado por conteúdo, com despejo LRU limitado por tamanho"""
+
+    def __init__(self, caminho=CAMINHO_CACHE_LLM, max_mb=CACHE_LLM_MAX_MB):
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.caminho = caminho
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                resposta TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_acesso ON respostas (ultimo_acesso)")
+        self.conn.commit()
+        self.gravacoes_desde_despejo = 0
+
+    def obter(self, chave):
+        with self.lock:
+            linha = self.conn.execute("SELECT resposta FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                return None
+            self.conn.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave))
+            self.conn.commit()
+            return linha[0]
+
+    def gravar(self, chave, resposta):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO respostas (chave, resposta, tamanho, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (chave, resposta, len(resposta.encode('utf-8')), time.time()),
+            )
+            self.conn.commit()
+            self.gravacoes_desde_despejo += 1
+            if self.gravacoes_desde_despejo >= 100:
+                self._despejar()
+
+    def _despejar(self):
+        """Remove as entradas menos usadas até ficar abaixo de 90% do limite"""
+        self.gravacoes_desde_despejo = 0
+        total = self.conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        alvo = total - int(self.max_bytes * 0.9)
+        removidos = 0
+        chaves = []
+        for chave, tamanho in self.conn.execute("SELECT chave, tamanho FROM respostas ORDER BY ultimo_acesso"):
+            chaves.append((chave,))
+            removidos += tamanho
+            if removidos >= alvo:
+                break
+        self.conn.executemany("DELETE FROM respostas WHERE chave = ?", chaves)
+        self.conn.commit()
+        print(f"  🧹 Cache LLM: {len(chaves)} entradas antigas removidas")
+
+    def exportar(self, caminho_jsonl):
+        """Exporta o cache como JSONL (para subir como artefato do workflow)"""
+        with self.lock, open(caminho_jsonl, 'w', encoding='utf-8') as f:
+            linhas = self.conn.execute("SELECT chave, resposta, ultimo_acesso FROM respostas")
+            total = 0
+            for chave, resposta, ultimo_acesso in linhas:
+                f.write(json.dumps({'chave': chave, 'resposta': resposta, 'ultimo_acesso': ultimo_acesso}, ensure_ascii=False) + '\n')
+                total += 1
+        print(f"Cache LLM exportado: {total} respostas → {caminho_jsonl}")
+
+    def importar(self, caminho_jsonl):
+        """Mescla um JSONL exportado por outra execução ou shard"""
+        registros = []
+        with open(caminho_jsonl, encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    r = json.loads(linha)
+                    registros.append((r['chave'], r['resposta'], len(r['resposta'].encode('utf-8')), r['ultimo_acesso']))
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO respostas (chave, resposta, tamanho, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                registros,
+            )
+            self.conn.commit()
+            self._despejar()
+        print(f"Cache LLM importado: {len(registros)} respostas de {caminho_jsonl}")
+
+
+_cache_llm = None
+
+def obter_cache():
+    """Cache único do processo; importa os JSONL apontados por LLM_CACHE_IMPORTAR (glob)"""
+    global _cache_llm
+    if _cache_llm is None:
+        _cache_llm = CacheLLM()
+        for caminho in sorted(glob.glob(os.environ.get('LLM_CACHE_IMPORTAR', ''))):
+            _cache_llm.importar(caminho)
+    return _cache_llm
+
+
+
+# ============================================
+# CACHE DE CONTEXTO (PREFIXO FIXO DOS PROMPTS)
+# ============================================
+
+CACHE_CONTEXTO_ATIVO = os.environ.get('CACHE_CONTEXTO', '1') != '0'
+TTL_CACHE_CONTEXTO = int(os.environ.get('CACHE_CONTEXTO_TTL', 3600))
+# Famílias de modelo sem cached content na API: o prompt segue inteiro, no formato original
+MODELOS_SEM_CACHE_CONTEXTO = ('gemma',)
+
+
+def suporta_cache_contexto(nome_modelo):
+    return CACHE_CONTEXTO_ATIVO and not nome_modelo.startswith(MODELOS_SEM_CACHE_CONTEXTO)
+
+
+class ChamadaComPrefixo:
+    """Modelo já ligado a uma chave; prefixa o texto quando o cache não está disponível nela"""
+
+    def __init__(self, modelo, prefixo_inline):
+        self.modelo = modelo
+        self.prefixo_inline = prefixo_inline
+
+    def generate_content(self, sufixo, **kwargs):
+        return self.modelo.generate_content(self.prefixo_inline + sufixo, **kwargs)
+
+
+class ModeloComPrefixo:
+    """GenerativeModel cujo prompt é um prefixo fixo + um sufixo por vídeo.
+
+    O prefixo é registrado uma vez por chave como cached content (cada chave é
+    um projeto, então o cache não é compartilhado) e cada chamada envia só o
+    sufixo. Se a criação falhar numa chave (modelo sem suporte, prefixo abaixo
+    do mínimo de tokens, permissão), essa chave manda o prefixo no texto.
+    """
+
+    def __init__(self, modelo, prefixo, rotulo):
+        self.modelo = modelo
+        self.prefixo = prefixo
+        self.rotulo = rotulo
+        self.caches = {}
+        self.lock = threading.Lock()
+
+    def _cache_da_chave(self, chave):
+        with self.lock:
+            if chave.api_key not in self.caches:
+                try:
+                    cliente = glm.CacheServiceClient(client_options={'api_key': chave.api_key})
+                    criado = cliente.create_cached_content(cached_content=glm.CachedContent(
+                        model=self.modelo.model_name,
+                        display_name=self.rotulo,
+                        system_instruction=glm.Content(parts=[glm.Part(text=self.prefixo)]),
+                        ttl=timedelta(seconds=TTL_CACHE_CONTEXTO),
+                    ))
+                    self.caches[chave.api_key] = (cliente, criado.name)
+                    print(f"  ✓ Prefixo '{self.rotulo}' em cache na chave {chave.nome} ({criado.usage_metadata.total_token_count} tokens)")
+                except Exception as e:
+                    self.caches[chave.api_key] = None
+                    print(f"  ⚠ Cache de contexto indisponível na chave {chave.nome} ({type(e).__name__}); prefixo vai no texto")
+            return self.caches[chave.api_key]
+
+    def para_chave(self, chave):
+        copia = copy.copy(self.modelo)
+        copia._client = chave.cliente
+        cache = self._cache_da_chave(chave)
+        if cache is None:
+            return ChamadaComPrefixo(copia, self.prefixo)
+        copia._cached_content = cache[1]
+        return ChamadaComPrefixo(copia, '')
+
+    def liberar(self):
+        """Apaga os caches criados (o TTL cuidaria disso, mas o armazenamento é cobrado)"""
+        with self.lock:
+            for cache in self.caches.values():
+                if cache is not None:
+                    try:
+                        cache[0].delete_cached_content(name=cache[1])
+                    except Exception as e:
+                        print(f"  ⚠ Não foi possível apagar o cache {cache[1]}: {e}")
+            self.caches.clear()
+
+
+# ============================================
+# CHECKPOINTS POR ETAPA
+# ============================================
+
+DIRETORIO_CHECKPOINTS = os.environ.get('CHECKPOINT_DIR', '.checkpoints')
+
+
+class JournalEtapa:
+    """Diário JSONL (append-only) com o resultado de cada vídeo concluído em uma etapa.
+
+    Ao reiniciar um shard, as linhas já registradas são reaproveitadas e só as
+    faltantes voltam para a API.
+    """
+
+    def __init__(self, diretorio, etapa):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, f"{etapa}.jsonl")
+        self.lock = threading.Lock()
+        self.resultados = {}
+        if os.path.exists(self.caminho):
+            with open(self.caminho, encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        # Última linha truncada por uma queda no meio da escrita
+                        continue
+                    self.resultados[registro['video_id']] = registro['resultado']
+            print(f"  ↺ Checkpoint '{etapa}': {len(self.resultados)} vídeos já concluídos")
+        self.arquivo = open(self.caminho, 'a', encoding='utf-8')
+
+    def obter(self, video_id):
+        return self.resultados.get(video_id)
+
+    def registrar(self, video_id, resultado):
+        with self.lock:
+            self.resultados[video_id] = resultado
+            self.arquivo.write(json.dumps({'video_id': video_id, 'resultado': resultado}, ensure_ascii=False) + '\n')
+            self.arquivo.flush()
+            os.fsync(self.arquivo.fileno())
+
+    def fechar(self):
+        with self.lock:
+            self.arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def diretorio_checkpoint_intervalo(start, end):
+    return os.path.join(DIRETORIO_CHECKPOINTS, f"{start}_{end}")
+
+
+def abrir_journal(diretorio_checkpoint, etapa):
+    """Journal da etapa para usar com `with` (fechado no fim da etapa); None quando o checkpoint está desligado"""
+    if not diretorio_checkpoint:
+        return contextlib.nullcontext()
+    return JournalEtapa(diretorio_checkpoint, etapa)
+
+
+
+_executores = {}
+
+def obter_executor(api_keys):
+    """Executor compartilhado pelas etapas, para que todas dividam o mesmo pool de chaves.
+
+    Aceita uma chave, uma lista de chaves ou várias chaves separadas por vírgula.
+    """
+    if isinstance(api_keys, str):
+        api_keys = [k.strip() for k in api_keys.split(',') if k.strip()]
+    chave = tuple(api_keys)
+    if chave not in _executores:
+        _executores[chave] = ExecutorLLM(list(api_keys))
+    return _executores[chave]
+
+
+
+
+# ============================================
+# PROMPT DE CONTEXTUALIZAÇÃO
+# ============================================
+
+PROMPT_CONTEXTO_INSTRUCOES = """Você é um contextualizador técnico avançado de vídeos educacionais de tecnologia.
+Sua função é ler o título, descrição e nome do canal e produzir uma sinopse técnica limpa, eliminando todo ruído.
+
+======================================================
+OBJETIVO
+======================================================
+Gerar um resumo técnico confiável, eliminando completamente ruídos promocionais e elementos irrelevantes, deixando apenas os dados úteis para que modelos futuros consigam classificar corretamente qual ferramenta e operação o vídeo ensina.
+
+======================================================
+REGRAS ABSOLUTAS
+======================================================
+1. **Não invente ferramentas. Além disso, nunca expanda siglas, termos ou nomes técnicos que você não reconhece/sabe com 100% de certeza o que é**
+   MCP significa exclusivamente "Model Context Protocol".
+   Se você não tiver certeza absoluta do significado de uma sigla ou termo técnico, NÃO tente interpretar, deduzir ou completar — ignore e responda apenas: "invalido".
+   
+2. **IGNORE COMPLETAMENTE** qualquer trecho que não seja técnico:  
+    - links  
+    - redes sociais
+    - cursos
+    - eventos
+    - promoções
+    - reviews 
+    - nomes de cursos, eventos, lives, bootcamps, imersões, desafios, semanas, maratonas
+    - emojis  
+    - hashtags 
+    - agradecimentos     
+    - chamadas de ação (ex.: "comente", "garanta sua vaga", "último lote", "aproveite agora", "cupom de desconto", "seu ingresso", "inscreva-se")  
+    - textos aspiracionais ou emocionais  
+    - storytelling, personagens fictícios, metáforas ou dramatização  
+    - memes ou conteúdo humorístico  
+    - divulgação de eventos, lives, bootcamps, imersões, desafios, semanas, maratonas  
+    - promoções, Black Friday, descontos, lotes, vagas limitadas  
+    - conteúdos sobre carreira, sucesso, mentalidade ou trajetória profissional  
+    - reviews, opiniões ou comparações de cursos, plataformas ou comunidades  
+    - vlogs, rotina, bastidores ou vida pessoal         
+
+3. O nome do canal **NUNCA é prova** de qual ferramenta o vídeo usa.  
+   Use-o apenas como reforço contextual (ex.: canal dedicado a Excel → reforça, mas não prova).
+
+4. Nunca classifique trilha, não classifique ferramenta final, não gere JSON.
+
+5. **Palavras soltas não caracterizam ensino técnico.**
+   Exemplos como “API”, “JavaScript”, “Java”, “Excel”, “docker”, “código”, “backend”, “programação”, quando não acompanhados de operação, conceito, técnica ou processo claramente descrito, **NÃO são suficientes** para gerar sinopse.
+   Exemplos de termos vagos como “webhook”, “servidor”, “app”, “backend”,
+   “URL”, “Stripe”, “pagamento”, “chat”, “nuvem”, “deepseek”, “chatgpt”, “gemini”, “claude”, “deploy”, “autenticação”, “aplicação”
+   quando não acompanhados da ferramenta e de operação, conceito, técnica ou processo claramente descrito, NÃO são suficientes para gerar sinopse.
+   Nesses casos, responda obrigatoriamente: “invalido”.
+
+6. **Hashtags NUNCA podem ser usadas como base semântica.**
+   Se a ferramenta ou o conteúdo técnico aparecer **apenas em hashtags**, responda obrigatoriamente: **"invalido"**.
+
+7. Para que um vídeo seja válido, o título e a descrição devem apresentar evidência suficiente para identificar a FERRAMENTA PRINCIPAL.
+   Essa evidência só existe quando a ferramenta aparece combinada com pelo menos um segundo elemento técnico
+   (procedimento, técnica, operação, implementação, conceito aplicado ou resolução de problema).
+   Se houver apenas um elemento isolado, responda obrigatoriamente: "invalido".
+
+8. **Lives sem escopo educacional explícito são inválidas.**
+   Lives só serão consideradas válidas quando o título e a descrição apresentarem evidência suficiente para identificar a ferramenta principal sendo ensinada.
+   Essa evidência só existe quando a ferramenta aparece combinada com pelo menos um segundo elemento técnico
+   (procedimento, técnica, operação, implementação, conceito aplicado ou resolução de problema).
+   Se isso não estiver claramente indicado, responda obrigatoriamente: "invalido".
+
+9. **Cursos sem escopo educacional explícito são inválidos.**
+   Um curso só será considerado válido quando o título e a descrição apresentarem evidência suficiente para identificar a ferramenta principal sendo ensinada.
+   Essa evidência só existe quando a ferramenta aparece combinada com pelo menos um segundo elemento técnico
+   (procedimento, técnica, operação, implementação, conceito aplicado ou resolução de problema).
+   Se isso não estiver claramente indicado, responda obrigatoriamente: "invalido".
+
+10. **Se o título e a descrição NÃO indicarem claramente qual conteúdo técnico
+    será abordado no vídeo**, sendo compostos apenas por linguagem promocional,
+    aspiracional, anúncios de curso, bootcamp, evento ou venda,
+    responda obrigatoriamente: **"invalido"**.
+
+11. É PROIBIDO utilizar informações (nome, link, etc.) de curso, playlist, canal,
+    formação, bootcamp, evento ou trilha COMO EVIDÊNCIA TÉCNICA do vídeo.    
+
+12. **Vídeos que não sejam de ensino técnico são automaticamente inválidos.**
+    Se o vídeo for sobre qualquer um destes tópicos, responda IMEDIATAMENTE: **"invalido"**:
+    - Notícias (lançamentos, atualizações, banimentos, regulações)
+    - Reviews ou comparativos (X vs Y, "qual é melhor", rankings)
+    - Reacts (reagindo a conteúdo de terceiros)
+    - Entrevistas, bate-papos, podcasts ou bastidores de empresas/profissionais (ex: "Como é a infra do iFood", "Stack da empresa X", "Desafios reais de escala")
+    - Análises de ferramenta, mercado ou tendências tecnológicas
+    - Dicas de carreira, sucesso profissional ou trajetória
+    - Anúncios de cursos, eventos ou promoções
+    - Discussões, opiniões ou debates sobre ferramentas
+    - Conteúdos sobre LLMs (ChatGPT, Claude, Gemini, DeepSeek, etc.) que sejam notícias, comparativos, reviews, análises de impacto ou discussões
+    
+    Só continue se o vídeo for de **ensino técnico** (educação em tecnologia).
+    Se houver dúvida sobre ser ensino → **"invalido"**.
+
+
+"""
+
+PROMPT_CONTEXTO_SAIDA = """
+======================================================
+SAÍDA OBRIGATÓRIA
+======================================================
+
+Produza **apenas um parágrafo de sinopse técnica**,
+contendo exclusivamente informações que sejam **explicitamente sustentadas
+pelo título ou pela descrição**, incluindo:
+
+- A ferramenta principal citada (A ferramenta principal é sempre aquela que o vídeo ensina diretamente, sendo esta a ferramenta foco do vídeo, sobre a qual são dadas instruções práticas e explicado o conceito técnico central do vídeo.)
+- Os conceitos técnicos centrais que o vídeo explica
+- Sem nenhum ruído e sem violar nenhuma REGRA ABSOLUTA
+- Use apenas informações referentes ao vídeo específico e não de elementos externos
+
+Se qualquer um desses itens **não estiver claramente indicado no título ou na descrição**,
+ele **não deve ser inferido, deduzido ou estimado**.
+
+O texto deve parecer uma descrição de conteúdo feita por um analista técnico.
+"""
+
+
+def montar_bloco_entradas_contexto(titulo, descricao, canal):
+    return f"""======================================================
+ENTRADAS DO VÍDEO
+======================================================
+Título: {titulo}
+Descrição: {descricao if descricao else 'Sem descrição'}
+Nome do canal: {canal}
+"""
+
+
+def montar_prompt_contexto(titulo, descricao, canal):
+    """Prompt de contextualização (texto idêntico ao da versão original, por causa do cache)"""
+    return PROMPT_CONTEXTO_INSTRUCOES + montar_bloco_entradas_contexto(titulo, descricao, canal) + PROMPT_CONTEXTO_SAIDA
+
+
+def registros(df, colunas):
+    """Linhas como tuplas nomeadas só com as colunas pedidas (sem montar uma Series por linha)"""
+    return list(df[colunas].itertuples(index=False, name='Registro'))
+
+
+def contextualizar_videos_groq(df, groq_api_key, limite=100, diretorio_checkpoint=None):
+    """Classifica vídeos com Groq (Llama 3.1) - com limite"""    
+    
+    executor = obter_executor(groq_api_key)
+    
+    print(f"\nClassificando {len(df)} vídeos com Groq...")
+    
+    linhas = registros(df, ['title', 'description', 'channel_name'])
+    model = genai.GenerativeModel(model_name=MODELO_GEMINI, generation_config=GenerationConfig(**CONFIG_CONTEXTO))
+    
+    if suporta_cache_contexto(MODELO_GEMINI):
+        # Instruções fixas em cache de contexto; cada chamada leva só as entradas do vídeo
+        model = ModeloComPrefixo(model, PROMPT_CONTEXTO_INSTRUCOES + PROMPT_CONTEXTO_SAIDA, 'contexto')
+        prompts = [montar_bloco_entradas_contexto(row.title, row.description, row.channel_name) for row in linhas]
+        versao = VERSAO_PROMPT_CONTEXTO_PREFIXO
+    else:
+        prompts = [montar_prompt_contexto(row.title, row.description, row.channel_name) for row in linhas]
+        versao = VERSAO_PROMPT_CONTEXTO
+    
+    limpeza = assinatura_limpeza(df)
+    chaves = [
+        chave_cache(MODELO_GEMINI, CONFIG_CONTEXTO, versao,
+                    {'title': row.title, 'description': descricao, 'channel_name': row.channel_name, 'limpeza': limpeza})
+        for row, descricao in zip(linhas, descricoes_para_cache(df))
+    ]
+    with abrir_journal(diretorio_checkpoint, 'contexto') as journal:
+        classificacoes = executor.executar(model, prompts, df['video_id'].tolist(), chaves_cache=chaves,
+                                           journal=journal, etapa='contexto')
+    if isinstance(model, ModeloComPrefixo):
+        model.liberar()
+    
+    return df.assign(contexto=classificacoes)
+
+
+
+
+# ============================================
+# PROMPT DE CLASSIFICAÇÃO DE FERRAMENTA
+# ============================================
+
+PROMPT_CLASSIFICACAO_CABECALHO = """Você é um especialista em classificação de conteúdo educacional de tecnologia e programação do YouTube brasileiro.
+                    Você receberá APENAS uma SINOPSE TÉCNICA PURIFICADA — um texto curto,
+                    objetivo, sem ruído, descrevendo exatamente o que o vídeo ensina.
+                    Essa sinopse já removeu promoções, links, tags irrelevantes e palavras-chave de SEO.
+
+**OBJETIVO:**
+Extrair a FERRAMENTA PRINCIPAL ensinada no vídeo da sinopse técnica fornecida,
+seguindo exclusivamente a lista de ferramentas aceitas do sistema.
+
+**REGRAS CRÍTICAS:**
+1. Use SOMENTE o que está explícito na sinopse.
+2. NÃO invente ferramentas.
+3. NUNCA invente ou presuma ferramentas não mencionadas
+
+**LISTA FERRAMENTAS ACEITAS (use EXATAMENTE estes nomes):**
+Python | Java | C | C++ | JavaScript | TypeScript | PHP | Go | Rust | Kotlin | Swift | SQL | HTML | CSS
+React | Angular | Vue | Next.js | Node.js | Spring Boot | Express | GraphQL | Flutter | Tailwind CSS | Vite | Pandas | dbt | Spark | MLflow | Laravel | React Native | Prisma | NestJS
+PyTorch | TensorFlow | Scikit-Learn | Model Context Protocol (MCP)
+MongoDB | Firebase | Supabase | Redis
+Linux | IDE
+Docker | Kubernetes | Airflow | Jenkins | GitHub Actions | Terraform 
+AWS | Azure | GCP
+Excel | Power BI | Tableau | Grafana
+RabbitMQ | Kafka
+Prometheus
+Git | Cypress | Postman | Selenium | Cypress | JUnit | Espresso | JMeter
+
+---
+
+"""
+
+PROMPT_CLASSIFICACAO_REGRAS = """🎯 REGRAS:
+1. Quando mais de uma ferramenta da lista for citada na sinopse, a ferramenta principal DEVE
+   ser aquela sobre a qual a técnica, implementação, configuração, ou construção
+   está sendo diretamente ensinada.
+
+   A ferramenta principal é sempre aquela que o vídeo ENSINA diretamente.
+   É o foco do vídeo. Aquela sobre a qual o vídeo está dando instruções práticas e explicando o conceito técnico central do vídeo.
+   
+2. Classifique sempre no nível da FERRAMENTA PRINCIPAL
+   (nunca comandos internos, bibliotecas de baixo nível ou conceitos).
+
+3. Se o vídeo ensinar uma funcionalidade de uma ferramenta,
+   classifique pela ferramenta responsável diretamente por essa funcionalidade.
+
+4. Evite classificar conceitos abstratos
+   (loops, algoritmos, ponteiros, estruturas conceituais).
+
+5. Se a sinopse descrever qualquer um destes conteúdos, classifique IMEDIATAMENTE como "invalido":
+   - Notícias (lançamentos, atualizações, banimentos, regulações)
+   - Reviews ou comparativos (X vs Y, "qual é melhor", rankings)
+   - Reacts (reagindo a conteúdo de terceiros)
+   - Entrevistas, bate-papos, podcasts ou bastidores de empresas/profissionais (ex: "Como é a infra do iFood", "Stack da empresa X", "Desafios reais de escala")
+   - Análises de ferramenta, mercado ou tendências tecnológicas
+   - Dicas de carreira, sucesso profissional ou trajetória
+   - Anúncios de cursos, eventos ou promoções
+   - Discussões, opiniões ou debates sobre ferramentas
+   - Conteúdos sobre LLMs (ChatGPT, Claude, Gemini, DeepSeek, etc.) que sejam notícias, comparativos, reviews, análises de impacto ou discussões
+   
+   Só classifique se a sinopse descrever claramente **ensino técnico** (educação em tecnologia).
+   Se a sinopse for ambígua ou não indicar ensino → "invalido".
+
+6. 🧠 INFERÊNCIA PERMITIDA:
+Inferência só é permitida se TODAS as 3 condições abaixo forem verdadeiras:
+1. A ferramenta DEVE estar explicitamente mencionada na sinopse
+2. A ferramenta DEVE estar na Lista de Ferramentas Aceitas
+3. DEVE haver pelo menos um elemento técnico oficial, documentado e característico da ferramenta na sinopse
+
+Se QUALQUER uma das 3 condições falhar → classifique como "invalido" IMEDIATAMENTE.
+
+Exemplos válidos:
+- BullMQ → roda em Node.js → tecnologia_base: Node.js
+- Pandas → biblioteca Python → tecnologia_base: Python
+- DAX → linguagem do Power BI → tecnologia_base: Power BI
+- nftables → comando do Linux → tecnologia_base: Linux
+- Express → framework Node.js → tecnologia_base: Node.js
+- VBA → roda em excel → tecnologia_base: Excel
+- Lodash → biblioteca JavaScript → tecnologia_base: JavaScript
+- CloudWatch → serviço de monitoramento AWS → tecnologia_base: AWS
+- docker run → comando Docker → tecnologia_base: Docker
+- NestJS (também escrito Nest.js, não confundir com Next.js são frameworks diferentes) → framework Node.js → tecnologia_base: Node.js
+
+✔ Nome da ferramenta (ex.: React, Terraform, Power BI)
+✔ Um conceito, operação ou recurso oficial e documentado da ferramenta
+
+- useState, JSX → React 
+
+- terraform apply, providers → Terraform
+
+- DataFrame, merge → Pandas
+
+- SELECT, JOIN → SQL
+
+✔ Uma técnica ou processo oficial dessa ferramenta
+
+- App Router do Next.js
+
+- Hooks do React
+
+- DAGs do Airflow
+
+- \keras Models do TensorFlow
+
+- Clusters no Kubernetes
+
+- Components, Props do Vue
+
+7. Não infira ferramentas quando a sinopse mencionar APENAS:
+    - Contexto geral sem ferramenta da lista (ex: "backend", "aplicação", "front-end", "API", "servidor", "webscraping", etc.)
+    - Tipo de projeto sem ferramenta da lista (ex: "chat", "dashboard", "IA", "e-commerce", "blog", "webscraping", etc.)
+    - Se a sinopse descrever apenas conceitos sem ferramenta da lista (ex: webhooks, DTOs, APIs, microsserviços, padrões de design, arquitetura, etc.)  
+    - Ferramentas não listadas sem ferramenta da lista (ex: Bubble, Vercel, Netlify, n8n, Zapier, Webflow, WordPress, IFTTT, Make (Integromat), etc.)
+    - Se a sinopse for genérica demais (ex: motivacional, opinião, apresentação, dicas vagas, cursos, lives, etc.)
+    Nesses casos, se NÃO houver ferramenta da LISTA DE FERRAMENTAS ACEITAS explicitamente mencionada, classifique como "invalido".
+
+"""
+
+PROMPT_CLASSIFICACAO_SAIDA = """**RESPONDA APENAS COM JSON (sem markdown, sem explicações):**
+
+{
+    "ferramenta_principal": "nome_exato_da_lista_ou_invalido",
+    "tecnologia_base": "tecnologia_base_ou_invalido",
+    "classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes": true/false,
+    "cargo": "front-end | back-end | fullstack | devops | qa | analista de dados | engenheiro de dados | cientista de dados | analista de bi | android | ios | invalido",
+    "tipo_video": "projeto | aula | curso | invalido"
+}
+
+Internamente, identifique qual é a ferramenta principal que o vídeo ensina diretamente, 
+sendo esta a ferramenta foco do vídeo, sobre a qual são dadas instruções práticas e explicado o conceito técnico central do vídeo.
+Use essa decisão para classificar; NÃO exponha nem explique esse raciocínio.
+"""
+
+PROMPT_CLASSIFICACAO_SAIDA_LOTE = """**VOCÊ RECEBERÁ VÁRIOS VÍDEOS, CADA UM IDENTIFICADO POR video_id.**
+Classifique cada vídeo de forma independente, aplicando todas as regras acima a cada um.
+
+**RESPONDA APENAS COM UM ARRAY JSON (sem markdown, sem explicações), com um objeto por vídeo:**
+
+[
+  {
+    "video_id": "id_exato_recebido",
+    "ferramenta_principal": "nome_exato_da_lista_ou_invalido",
+    "tecnologia_base": "tecnologia_base_ou_invalido",
+    "classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes": true/false,
+    "cargo": "front-end | back-end | fullstack | devops | qa | analista de dados | engenheiro de dados | cientista de dados | analista de bi | android | ios | invalido",
+    "tipo_video": "projeto | aula | curso | invalido"
+  }
+]
+
+Internamente, identifique para cada vídeo qual é a ferramenta principal que ele ensina diretamente.
+Use essa decisão para classificar; NÃO exponha nem explique esse raciocínio.
+
+**VÍDEOS A ANALISAR:**
+"""
+
+# Sinopses por requisição no modo em lote (1 = uma requisição por vídeo)
+TAMANHO_LOTE_CLASSIFICACAO = int(os.environ.get('CLASSIFICACAO_LOTE', 1))
+
+CAMPOS_CLASSIFICACAO = (
+    "ferramenta_principal",
+    "tecnologia_base",
+    "classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes",
+    "cargo",
+    "tipo_video",
+)
+
+
+# Prefixos fixos para o cache de contexto: todas as instruções antes, o vídeo no fim
+PREFIXO_CLASSIFICACAO = PROMPT_CLASSIFICACAO_CABECALHO + PROMPT_CLASSIFICACAO_REGRAS + PROMPT_CLASSIFICACAO_SAIDA
+PREFIXO_CLASSIFICACAO_LOTE = PROMPT_CLASSIFICACAO_CABECALHO + PROMPT_CLASSIFICACAO_REGRAS + PROMPT_CLASSIFICACAO_SAIDA_LOTE
+
+
+def montar_bloco_video_classificacao(contexto, titulo):
+    return f"**VÍDEO A ANALISAR:**\nSinopse Técnica: {contexto}\nTítulo do Vídeo: {titulo}\n---\n"
+
+
+def montar_prompt_classificacao(contexto, titulo):
+    """Prompt de um vídeo (texto idêntico ao da versão original, por causa do cache)"""
+    video = montar_bloco_video_classificacao(contexto, titulo)
+    return PROMPT_CLASSIFICACAO_CABECALHO + video + PROMPT_CLASSIFICACAO_REGRAS + PROMPT_CLASSIFICACAO_SAIDA
+
+
+def montar_bloco_videos_lote(linhas):
+    return "\n".join(
+        f"[video_id: {video_id}]\nSinopse Técnica: {contexto}\nTítulo do Vídeo: {titulo}\n---"
+        for video_id, contexto, titulo in linhas
+    ) + "\n"
+
+
+def montar_prompt_classificacao_lote(linhas):
+    """Prompt com o bloco fixo de instruções uma única vez e N sinopses no final"""
+    return PREFIXO_CLASSIFICACAO_LOTE + montar_bloco_videos_lote(linhas)
+
+
+def limpar_markdown_json(texto):
+    """Remove cercas ```json ... ``` que o modelo às vezes coloca em volta do JSON"""
+    cleaned = re.sub(r'^```(?:json)?\s*', '', texto.strip())
+    cleaned = re.sub(r'\s*```$', '', cleaned)
+    return cleaned.strip()
+
+
+def separar_resposta_lote(texto, video_ids):
+    """Valida o array JSON do lote e devolve {video_id: json_da_classificacao} dos itens válidos"""
+    try:
+        itens = json.loads(limpar_markdown_json(texto))
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    if not isinstance(itens, list):
+        return {}
+
+    esperados = set(video_ids)
+    resultados = {}
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        video_id = str(item.get("video_id", ""))
+        if video_id not in esperados or not all(campo in item for campo in CAMPOS_CLASSIFICACAO):
+            continue
+        resultados[video_id] = json.dumps({campo: item[campo] for campo in CAMPOS_CLASSIFICACAO}, ensure_ascii=False)
+    return resultados
+
+
+
+
+def classificar_em_lotes(executor, modelo, df, tamanho_lote, journal=None):
+    """Classifica as sinopses em lotes de `tamanho_lote` por requisição.
+
+    Devolve {video_id: json_da_classificacao} só dos itens que passaram na validação;
+    os demais ficam para o envio individual.
+    """
+    resultados = {}
+    linhas = []
+    for row in df[['video_id', 'contexto', 'title']].itertuples(index=False):
+        video_id = str(row.video_id)
+        anterior = journal.obter(video_id) if journal else None
+        if anterior is not None:
+            resultados[video_id] = anterior
+        elif video_id not in resultados:
+            linhas.append((video_id, row.contexto, row.title))
+
+    lotes = [linhas[i:i + tamanho_lote] for i in range(0, len(linhas), tamanho_lote)]
+    if suporta_cache_contexto(MODELO_GEMINI):
+        modelo = ModeloComPrefixo(modelo, PREFIXO_CLASSIFICACAO_LOTE, 'classificacao_lote')
+        prompts = [montar_bloco_videos_lote(lote) for lote in lotes]
+        versao = VERSAO_PROMPT_CLASSIFICACAO_LOTE_PREFIXO
+    else:
+        prompts = [montar_prompt_classificacao_lote(lote) for lote in lotes]
+        versao = VERSAO_PROMPT_CLASSIFICACAO_LOTE
+    chaves = [
+        chave_cache(MODELO_GEMINI, CONFIG_CLASSIFICACAO, versao,
+                    [{'video_id': v, 'contexto': c, 'title': t} for v, c, t in lote])
+        for lote in lotes
+    ]
+    respostas = executor.executar(modelo, prompts, [f"lote {i + 1}" for i in range(len(lotes))],
+                                  rotulo="Lotes classificados", chaves_cache=chaves, etapa='classificacao_lote')
+    if isinstance(modelo, ModeloComPrefixo):
+        modelo.liberar()
+
+    rejeitados = 0
+    for lote, resposta in zip(lotes, respostas):
+        itens = separar_resposta_lote(resposta, [v for v, _, _ in lote])
+        rejeitados += len(lote) - len(itens)
+        for video_id, classificacao in itens.items():
+            resultados[video_id] = classificacao
+            if journal:
+                journal.registrar(video_id, classificacao)
+
+    print(f"  Lotes: {len(lotes)} requisições para {len(linhas)} vídeos | {rejeitados} itens reenviados individualmente")
+    return resultados
+
+
+def classificar_videos_groq(df, groq_api_key, limite=100, diretorio_checkpoint=None, tamanho_lote=TAMANHO_LOTE_CLASSIFICACAO):
+    """Classifica vídeos com Groq (Llama 3.1) - com limite.
+
+    Com `tamanho_lote` > 1 várias sinopses vão na mesma requisição; itens que não
+    passarem na validação do JSON são reenviados um a um.
+    """
+    
+    executor = obter_executor(groq_api_key)
+
+    
+    print(f"\nClassificando {len(df)} vídeos com Groq...")
+    
+    with abrir_journal(diretorio_checkpoint, 'classificacao_gemini') as journal:
+        model = genai.GenerativeModel(model_name=MODELO_GEMINI, generation_config=GenerationConfig(**CONFIG_CLASSIFICACAO))
+        video_ids = df['video_id'].astype(str).tolist()
+
+        classificacoes_lote = {}
+        if tamanho_lote > 1:
+            classificacoes_lote = classificar_em_lotes(executor, model, df, tamanho_lote, journal)
+
+        # Com cache de contexto, o bloco de instruções fica no servidor e o prompt é só o vídeo
+        montar, versao = montar_prompt_classificacao, VERSAO_PROMPT_CLASSIFICACAO
+        if suporta_cache_contexto(MODELO_GEMINI):
+            model = ModeloComPrefixo(model, PREFIXO_CLASSIFICACAO, 'classificacao')
+            montar, versao = montar_bloco_video_classificacao, VERSAO_PROMPT_CLASSIFICACAO_PREFIXO
+
+        classificacoes = np.full(len(df), None, dtype=object)
+        prompts, chaves, pendentes = [], [], []
+
+        for posicao, row in enumerate(registros(df, ['contexto', 'title'])):
+            if video_ids[posicao] in classificacoes_lote:
+                classificacoes[posicao] = classificacoes_lote[video_ids[posicao]]
+                continue
+            pendentes.append(posicao)
+            prompts.append(montar(row.contexto, row.title))
+            chaves.append(chave_cache(MODELO_GEMINI, CONFIG_CLASSIFICACAO, versao,
+                                      {'title': row.title, 'contexto': row.contexto}))
+
+        respostas = executor.executar(model, prompts, [video_ids[p] for p in pendentes], chaves_cache=chaves, journal=journal,
+                                      etapa='classificacao')
+    if isinstance(model, ModeloComPrefixo):
+        model.liberar()
+    for posicao, resposta in zip(pendentes, respostas):
+        classificacoes[posicao] = resposta
+    
+    return df.assign(classificacao_gemini=classificacoes)
+
+
+
+# ============================================
+# ETAPA FUNDIDA (CONTEXTO + CLASSIFICAÇÃO NA MESMA CHAMADA)
+# ============================================
+
+# 'fundido' faz sinopse e classificação em uma única requisição por vídeo;
+# 'duas_chamadas' mantém contextualizar_videos_groq + classificar_videos_groq
+MODO_CLASSIFICACAO = os.environ.get('MODO_CLASSIFICACAO', 'duas_chamadas')
+
+VERSAO_PROMPT_FUNDIDO = 'fundido-v1'
+CONFIG_FUNDIDO = {'temperature': 0, 'top_k': 1}
+# Famílias de modelo sem response_schema na API: o JSON é pedido só no prompt e validado aqui
+MODELOS_SEM_SAIDA_ESTRUTURADA = ('gemma',)
+
+CARGOS = ("front-end", "back-end", "fullstack", "devops", "qa", "analista de dados", "engenheiro de dados",
+          "cientista de dados", "analista de bi", "android", "ios", "invalido")
+TIPOS_VIDEO = ("projeto", "aula", "curso", "invalido")
+
+PROMPT_FUNDIDO_PONTE = """
+======================================================
+ETAPA 2 — CLASSIFICAÇÃO DA FERRAMENTA
+======================================================
+Depois de escrever a sinopse, classifique o vídeo usando SOMENTE a sinopse que você escreveu.
+Se a sinopse for "invalido", todos os campos da classificação também são "invalido" e o empate é false.
+
+"""
+
+PROMPT_FUNDIDO_SAIDA = """**RESPONDA APENAS COM UM OBJETO JSON (sem markdown, sem explicações):**
+
+{
+    "sinopse": "o parágrafo de sinopse técnica ou invalido",
+    "ferramenta_principal": "nome_exato_da_lista_ou_invalido",
+    "tecnologia_base": "tecnologia_base_ou_invalido",
+    "classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes": true/false,
+    "cargo": "front-end | back-end | fullstack | devops | qa | analista de dados | engenheiro de dados | cientista de dados | analista de bi | android | ios | invalido",
+    "tipo_video": "projeto | aula | curso | invalido"
+}
+
+"""
+
+# Instruções das duas etapas antes, entradas do vídeo no fim (prefixo igual para todos os vídeos)
+PREFIXO_FUNDIDO = (
+    PROMPT_CONTEXTO_INSTRUCOES + PROMPT_CONTEXTO_SAIDA + PROMPT_FUNDIDO_PONTE
+    + PROMPT_CLASSIFICACAO_CABECALHO[PROMPT_CLASSIFICACAO_CABECALHO.index('**OBJETIVO:**'):]
+    + PROMPT_CLASSIFICACAO_REGRAS + PROMPT_FUNDIDO_SAIDA
+)
+
+
+def suporta_saida_estruturada(nome_modelo):
+    return not nome_modelo.startswith(MODELOS_SEM_SAIDA_ESTRUTURADA)
+
+
+def schema_fundido():
+    """response_schema da etapa fundida: enums para ferramenta, cargo e tipo de vídeo"""
+    ferramentas = list(dict.fromkeys(ferramentas_da_lista_aceita())) + ['invalido']
+    return {
+        'type': 'object',
+        'properties': {
+            'sinopse': {'type': 'string'},
+            'ferramenta_principal': {'type': 'string', 'enum': ferramentas},
+            'tecnologia_base': {'type': 'string'},
+            'classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes': {'type': 'boolean'},
+            'cargo': {'type': 'string', 'enum': list(CARGOS)},
+            'tipo_video': {'type': 'string', 'enum': list(TIPOS_VIDEO)},
+        },
+        'required': ['sinopse', *CAMPOS_CLASSIFICACAO],
+    }
+
+
+def separar_resposta_fundida(texto):
+    """(sinopse, json_da_classificacao) de uma resposta fundida, ou None se não passar na validação"""
+    try:
+        item = json.loads(limpar_markdown_json(texto))
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(item, dict) or not isinstance(item.get('sinopse'), str) or not item['sinopse'].strip():
+        return None
+
+    sinopse = item['sinopse'].strip()
+    if sinopse.lower() == 'invalido':
+        # Vídeo descartado na sinopse: a classificação não é lida adiante
+        classificacao = {campo: 'invalido' for campo in CAMPOS_CLASSIFICACAO}
+        classificacao['classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes'] = False
+    elif all(campo in item for campo in CAMPOS_CLASSIFICACAO):
+        classificacao = {campo: item[campo] for campo in CAMPOS_CLASSIFICACAO}
+    else:
+        return None
+    return sinopse, json.dumps(classificacao, ensure_ascii=False)
+
+
+def contextualizar_e_classificar(df, groq_api_key, diretorio_checkpoint=None):
+    """Sinopse e classificação em uma chamada por vídeo (colunas contexto e classificacao_gemini).
+
+    Com saída estruturada o modelo fica preso ao schema; respostas que mesmo assim
+    não passarem na validação voltam pelo caminho de duas chamadas.
+    """
+    executor = obter_executor(groq_api_key)
+
+    print(f"\nContextualizando e classificando {len(df)} vídeos (chamada única)...")
+
+    estruturada = suporta_saida_estruturada(MODELO_GEMINI)
+    config = dict(CONFIG_FUNDIDO)
+    if estruturada:
+        config.update(response_mime_type='application/json', response_schema=schema_fundido())
+    model = genai.GenerativeModel(model_name=MODELO_GEMINI, generation_config=GenerationConfig(**config))
+    prefixo = PREFIXO_FUNDIDO
+    if suporta_cache_contexto(MODELO_GEMINI):
+        model = ModeloComPrefixo(model, PREFIXO_FUNDIDO, 'fundido')
+        prefixo = ''
+
+    linhas = registros(df, ['title', 'description', 'channel_name'])
+    prompts = [prefixo + montar_bloco_entradas_contexto(row.title, row.description, row.channel_name) for row in linhas]
+    limpeza = assinatura_limpeza(df)
+    chaves = [
+        chave_cache(MODELO_GEMINI, {**CONFIG_FUNDIDO, 'schema': estruturada}, VERSAO_PROMPT_FUNDIDO,
+                    {'title': row.title, 'description': descricao, 'channel_name': row.channel_name, 'limpeza': limpeza})
+        for row, descricao in zip(linhas, descricoes_para_cache(df))
+    ]
+    with abrir_journal(diretorio_checkpoint, 'fundido') as journal:
+        respostas = executor.executar(model, prompts, df['video_id'].tolist(), chaves_cache=chaves,
+                                      journal=journal, etapa='fundido')
+    if isinstance(model, ModeloComPrefixo):
+        model.liberar()
+
+    contextos = np.full(len(df), 'erro', dtype=object)
+    classificacoes = np.full(len(df), 'erro', dtype=object)
+    fora_do_schema = np.zeros(len(df), dtype=bool)
+    for posicao, resposta in enumerate(respostas):
+        if resposta == 'erro':
+            continue
+        separada = separar_resposta_fundida(resposta)
+        if separada is None:
+            fora_do_schema[posicao] = True
+        else:
+            contextos[posicao], classificacoes[posicao] = separada
+
+    print(f"  Fundido: {len(df)} vídeos | {int(fora_do_schema.sum())} respostas fora do schema → duas chamadas")
+    obter_metricas().registrar_funil('fundido_fora_do_schema', fora_do_schema.sum())
+    df = df.assign(contexto=contextos, classificacao_gemini=classificacoes)
+    if not fora_do_schema.any():
+        return df
+
+    df_reenvio = contextualizar_videos_groq(df[fora_do_schema].drop(columns=['contexto', 'classificacao_gemini']),
+                                            groq_api_key, diretorio_checkpoint=diretorio_checkpoint)
+    df_reenvio['contexto'] = df_reenvio['contexto'].astype(str).str.strip().str.lower()
+    validos = ~df_reenvio['contexto'].isin(['invalido', 'erro'])
+    df_reenvio = df_reenvio.assign(classificacao_gemini='invalido')
+    if validos.any():
+        df_reenvio.loc[validos, 'classificacao_gemini'] = classificar_videos_groq(
+            df_reenvio[validos], groq_api_key, diretorio_checkpoint=diretorio_checkpoint)['classificacao_gemini']
+    df.loc[df_reenvio.index, ['contexto', 'classificacao_gemini']] = df_reenvio[['contexto', 'classificacao_gemini']]
+    return df
+
+
+
+
+
+def carregar_trilhas(caminho_json="datasets/trilhas.json"):    
+    with open(caminho_json, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    return dados["trilhas"]
+
+
+# Grafias alternativas → ferramenta da trilha (as duas já normalizadas). Só outro nome
+# do mesmo produto: framework vizinho (Nuxt, Spring) ou plataforma (.NET) não herda a trilha
+ALIASES_TRILHAS = {
+    'NODE': 'NODEJS',
+    'REACTJS': 'REACT',
+    'VUEJS': 'VUE',
+    'NEXT': 'NEXTJS',
+    'NEST': 'NESTJS',
+    'SKLEARN': 'SCIKITLEARN',
+    'SCIKIT': 'SCIKITLEARN',
+    'PYSPARK': 'SPARK',
+    'APACHESPARK': 'SPARK',
+    'APACHEKAFKA': 'KAFKA',
+    'APACHEAIRFLOW': 'AIRFLOW',
+    'GOLANG': 'GO',
+    'JS': 'JAVASCRIPT',
+    'TS': 'TYPESCRIPT',
+    'TAILWIND': 'TAILWINDCSS',
+    'K8S': 'KUBERNETES',
+    'MCP': 'MODELCONTEXTPROTOCOLMCP',
+    'MODELCONTEXTPROTOCOL': 'MODELCONTEXTPROTOCOLMCP',
+    'GOOGLECLOUD': 'GCP',
+    'GOOGLECLOUDPLATFORM': 'GCP',
+    'AMAZONWEBSERVICES': 'AWS',
+    'MICROSOFTAZURE': 'AZURE',
+    'MICROSOFTEXCEL': 'EXCEL',
+    'MSEXCEL': 'EXCEL',
+    'MICROSOFTPOWERBI': 'POWERBI',
+    'GITHUBACTION': 'GITHUBACTIONS',
+    'CSHARP': 'C#',
+    'CPP': 'C++',
+}
+
+
+def normalizar_nome(nome):
+    """Chave de comparação de ferramentas: sem acento, maiúscula, sem espaço/ponto/hífen"""
+    texto = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[\s.\-_/()]', '', texto.upper())
+
+
+def normalizar_topico(texto):
+    """Chave de comparação de tópicos: tolera aspas, marcador de lista, caixa e pontuação final"""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii')
+    texto = texto.strip().strip('`"\'*').lstrip('-• ').rstrip('.').strip().strip('`"\'*')
+    return re.sub(r'\s+', ' ', texto.lower())
+
+
+class TopicosTrilha(list):
+    """Lista de tópicos de uma trilha com os dados pré-computados para prompt e validação"""
+
+    def __init__(self, ferramenta, topicos, expansoes=None):
+        super().__init__(topicos)
+        self.ferramenta = ferramenta
+        self.expansoes = expansoes or {}
+        self.texto_prompt = "\n".join([f"- {t}" for t in topicos])
+        self.normalizados = {normalizar_topico(t): t for t in topicos}
+
+    def validar(self, resposta):
+        """Tópico canônico correspondente à resposta do modelo, ou None"""
+        return self.normalizados.get(normalizar_topico(resposta))
+
+    def aproximar(self, resposta):
+        """Tópico canônico mais próximo da resposta (parênteses omitidos, texto a mais, grafia), ou None"""
+        topico = self.validar(resposta)
+        normalizada = normalizar_topico(resposta)
+        if topico or len(normalizada) < 4 or normalizada in ('invalido', 'sem_trilha', 'erro'):
+            return topico
+
+        contidos = [chave for chave in self.normalizados
+                    if len(chave) >= 4 and (chave in normalizada or normalizada in chave)]
+        if len(contidos) == 1:
+            return self.normalizados[contidos[0]]
+        proximos = difflib.get_close_matches(normalizada, contidos or list(self.normalizados), n=1,
+                                             cutoff=SIMILARIDADE_MINIMA_TOPICO)
+        return self.normalizados[proximos[0]] if proximos else None
+
+    def subconjunto(self, topicos):
+        """Mesma trilha restrita a `topicos` (para o prompt); a validação segue pela trilha completa"""
+        return TopicosTrilha(self.ferramenta, topicos)
+
+    @functools.cached_property
+    def ranqueador(self):
+        return RanqueadorTopicos(self, self.expansoes)
+
+
+class TrilhasIndex:
+    """Índice das trilhas carregado uma vez: ferramenta/alias normalizado → tópicos"""
+
+    def __init__(self, trilhas, expansoes=None):
+        expansoes = {normalizar_nome(f): e for f, e in (expansoes or {}).items()}
+        self.trilhas = {}
+        for trilha in trilhas:
+            chave = normalizar_nome(trilha["ferramenta"])
+            self.trilhas[chave] = TopicosTrilha(trilha["ferramenta"], trilha["topicos"], expansoes.get(chave))
+
+        self.chaves = {chave: chave for chave in self.trilhas}
+        for alias, chave in ALIASES_TRILHAS.items():
+            if chave in self.trilhas:
+                self.chaves.setdefault(alias, chave)
+
+    def topicos(self, ferramenta):
+        """Tópicos da trilha da ferramenta (por nome ou alias), ou [] se não houver"""
+        chave = self.chaves.get(normalizar_nome(ferramenta))
+        return self.trilhas[chave] if chave else []
+
+
+@functools.lru_cache(maxsize=None)
+def carregar_indice_trilhas(caminho_json="datasets/trilhas.json"):
+    """TrilhasIndex compartilhado (o JSON é lido uma única vez por processo)"""
+    expansoes = None
+    if os.path.exists(CAMINHO_EXPANSOES_TOPICOS):
+        with open(CAMINHO_EXPANSOES_TOPICOS, encoding="utf-8") as f:
+            expansoes = json.load(f)
+    return TrilhasIndex(carregar_trilhas(caminho_json), expansoes)
+
+
+def _como_indice(trilhas_data):
+    if isinstance(trilhas_data, TrilhasIndex):
+        return trilhas_data
+    return TrilhasIndex(trilhas_data)
+
+
+
+def interpretar_classificacao(classificacao_json):
+    """Dict da classificação (aceita texto com ```json ... ``` ou um dict); None se inválido"""
+    if isinstance(classificacao_json, dict):
+        return classificacao_json
+    try:
+        classificacao = json.loads(limpar_markdown_json(classificacao_json))
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        return None
+    return classificacao if isinstance(classificacao, dict) else None
+
+
+def obter_trilha(classificacao_json, trilhas_data):   
+    if not classificacao_json:
+        return []
+
+    # 1. Garantir que está em dict
+    classificacao = interpretar_classificacao(classificacao_json)
+    if classificacao is None:
+        return []
+
+    # 2. Extrair as duas possibilidades
+    ferramenta_principal = classificacao.get("ferramenta_principal", "")
+    tecnologia_base = classificacao.get("tecnologia_base", "")
+
+    # 3. Procurar trilha por ferramenta principal
+    indice = _como_indice(trilhas_data)
+    topicos = indice.topicos(ferramenta_principal)
+    if topicos:
+        return topicos
+
+    # 4. Se não encontrar → tentar tecnologia base (5. ou [] se não achou nada)
+    return indice.topicos(tecnologia_base)
+
+def obter_tecnologia_base(classificacao_json, trilhas_data):   
+    if not classificacao_json:
+        return []
+
+    # 1. Garantir que está em dict
+    classificacao = interpretar_classificacao(classificacao_json)
+    if classificacao is None:
+        return []
+
+    # 2. Extrair as duas possibilidades
+    ferramenta_principal = classificacao.get("ferramenta_principal", "")
+    tecnologia_base = classificacao.get("tecnologia_base", "")
+    empate_tecnico = classificacao.get("classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes", "")
+
+    if empate_tecnico:
+        if ferramenta_principal != tecnologia_base:
+            topicos = _como_indice(trilhas_data).topicos(tecnologia_base)
+            if topicos:
+                return topicos
+
+    return ""
+
+
+# ============================================
+# PRÉ-RANKING DE TÓPICOS (BM25)
+# ============================================
+
+PRE_RANKING_TOPICOS = os.environ.get('TOPICOS_PRE_RANKING', '1') != '0'
+# Tópicos enviados no prompt quando a trilha é maior que isso
+TOPICOS_TOP_K = int(os.environ.get('TOPICOS_TOP_K', 8))
+# Atribuição sem LLM: o melhor tópico precisa de pontuação mínima (~2 termos raros em comum)
+# e de uma margem sobre o segundo colocado
+TOPICO_AUTOMATICO = os.environ.get('TOPICO_AUTOMATICO', '1') != '0'
+PONTUACAO_TOPICO_AUTOMATICO = float(os.environ.get('TOPICO_AUTOMATICO_MIN', 5.0))
+MARGEM_TOPICO_AUTOMATICO = float(os.environ.get('TOPICO_AUTOMATICO_MARGEM', 2.0))
+# Tópicos "guarda-chuva" que sempre vão para o prompt
+TOPICOS_SEMPRE_ENVIADOS = ('Visão Geral',)
+# Palavras-chave extras por tópico ({"FERRAMENTA": {"Tópico": ["termo", ...]}}), opcional
+CAMINHO_EXPANSOES_TOPICOS = os.environ.get('TOPICOS_EXPANSOES_PATH', 'datasets/expansoes_topicos.json')
+# Similaridade mínima (difflib) para encaixar a resposta do modelo em um tópico da trilha
+SIMILARIDADE_MINIMA_TOPICO = 0.75
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+PALAVRAS_VAZIAS = {
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas', 'um', 'uma',
+    'com', 'para', 'por', 'que', 'se', 'ao', 'aos', 'como', 'sobre', 'entre', 'sua', 'seu', 'suas', 'seus',
+    'video', 'aula', 'curso', 'conceito', 'conceitos', 'ensina', 'explica', 'mostra', 'apresenta', 'utilizando',
+    'usando', 'uso', 'pratica', 'exemplo', 'exemplos', 'the', 'and', 'of', 'to', 'in', 'vs',
+}
+SUFIXOS_PLURAL = (('coes', 'cao'), ('soes', 'sao'), ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ns', 'm'),
+                  ('res', 'r'), ('s', ''))
+
+
+def termos_ranking(texto):
+    """Termos do texto para o BM25: sem acento, sem palavras vazias, plural reduzido e prefixo de 6 letras"""
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower()).encode('ascii', 'ignore').decode('ascii')
+    termos = []
+    for palavra in re.findall(r'[a-z0-9+#]+', texto):
+        if len(palavra) < 2 or palavra in PALAVRAS_VAZIAS:
+            continue
+        if len(palavra) > 4:
+            for sufixo, troca in SUFIXOS_PLURAL:
+                if palavra.endswith(sufixo):
+                    palavra = palavra[:-len(sufixo)] + troca
+                    break
+        termos.append(palavra[:6])
+    return termos
+
+
+class RanqueadorTopicos:
+    """BM25 dos tópicos de uma trilha (nome do tópico + expansões) contra o texto de um vídeo"""
+
+    def __init__(self, topicos, expansoes=None):
+        expansoes = expansoes or {}
+        documentos = [termos_ranking(' '.join([t, *expansoes.get(t, [])])) for t in topicos]
+        self.vocabulario = {termo: i for i, termo in enumerate(sorted({t for d in documentos for t in d}))}
+
+        frequencias = np.zeros((len(self.vocabulario), len(documentos)))
+        for coluna, documento in enumerate(documentos):
+            for termo, quantidade in collections.Counter(documento).items():
+                frequencias[self.vocabulario[termo], coluna] = quantidade
+        tamanhos = frequencias.sum(axis=0)
+        media = tamanhos.mean() if len(documentos) and tamanhos.mean() else 1.0
+        presentes = (frequencias > 0).sum(axis=1, keepdims=True)
+        idf = np.log((len(documentos) - presentes + 0.5) / (presentes + 0.5) + 1)
+        # Peso BM25 de cada termo em cada tópico, já pronto: a pontuação é uma soma de linhas
+        self.pesos = idf * frequencias * (BM25_K1 + 1) / (
+            frequencias + BM25_K1 * (1 - BM25_B + BM25_B * tamanhos / media))
+
+    def pontuar(self, texto):
+        linhas = [self.vocabulario[t] for t in set(termos_ranking(texto)) if t in self.vocabulario]
+        return self.pesos[linhas].sum(axis=0)
+
+
+def selecionar_topicos(trilha, texto, top_k=TOPICOS_TOP_K):
+    """(tópico atribuído sem LLM ou None, TopicosTrilha com os candidatos que vão no prompt).
+
+    Candidatos são os tópicos com algum termo em comum com o texto (até `top_k`);
+    com menos de dois deles não há evidência para cortar e a trilha inteira vai para o modelo.
+    """
+    if not PRE_RANKING_TOPICOS or len(trilha) < 2:
+        return None, trilha
+    pontos = trilha.ranqueador.pontuar(texto)
+    ordem = np.argsort(-pontos, kind='stable')
+    melhor, segundo = pontos[ordem[0]], pontos[ordem[1]]
+    if melhor <= 0:
+        return None, trilha
+    if TOPICO_AUTOMATICO and melhor >= PONTUACAO_TOPICO_AUTOMATICO and melhor >= MARGEM_TOPICO_AUTOMATICO * segundo:
+        return trilha[ordem[0]], trilha
+    positivos = int((pontos > 0).sum())
+    if positivos < 2 or len(trilha) <= min(top_k, positivos):
+        return None, trilha
+
+    # Candidatos na ordem original da trilha, mais os tópicos guarda-chuva
+    escolhidos = set(ordem[:min(top_k, positivos)].tolist())
+    return None, trilha.subconjunto([t for i, t in enumerate(trilha) if i in escolhidos or t in TOPICOS_SEMPRE_ENVIADOS])
+
+
+
+# ============================================
+# PROMPT DE CLASSIFICAÇÃO DE TRILHA
+# ============================================
+
+PROMPT_TRILHA_CABECALHO = """Você é um CLASSIFICADOR ESPECIALISTA de vídeos educacionais de tecnologia.
+
+Você receberá APENAS uma SINOPSE TÉCNICA PURIFICADA — um texto curto,
+objetivo e 100% limpo de ruído, descrevendo o conteúdo real do vídeo.
+
+==================================================
+OBJETIVO
+==================================================
+Classificar o vídeo no TÓPICO MAIS ADEQUADO da trilha fornecida.
+
+
+==================================================
+REGRAS ABSOLUTAS (SIGA À RISCA)
+==================================================
+1. Classifique somente com base na sinopse.
+2. Não invente tópicos.
+3. A sinopse já removeu tudo que é ruído — confie nela.
+4. Classificar quando a sinopse descreve exatamente o que o tópico aborda.
+5. Classificar quando há palavras-chave técnicas explícitas compatíveis.
+6. Quando a sinopse descrever uma ação, prática ou explicação que se encaixa de forma natural em um tópico (mesmo sem match literal), você DEVE classificar.
+7. Só retorne "invalido" quando NÃO houver relação técnica plausível com NENHUM dos tópicos.
+
+
+==================================================
+DADOS DO VÍDEO
+==================================================
+
+"""
+
+PROMPT_TRILHA_LEMBRETE = """==================================================
+LEMBRETE FINAL:
+- Você NÃO PODE criar novos tópicos
+- Se não houver correspondência clara, responda "invalido".
+- Se a sinopse for genérica demais (ex: motivacional, opinião,
+   apresentação, dicas vagas), classifique como "invalido".
+
+"""
+
+PROMPT_TRILHA_SAIDA = """RESPONDA APENAS COM:
+- O nome EXATO de um tópico da lista acima
+- "invalido"
+
+Sem explicações. Sem JSON.
+"""
+
+PROMPT_TRILHA_SAIDA_DUPLA = """RESPONDA APENAS COM UM JSON (sem markdown, sem explicações):
+
+{
+    "topico_principal": "nome EXATO de um tópico da PRIMEIRA lista ou invalido",
+    "topico_base": "nome EXATO de um tópico da SEGUNDA lista ou invalido"
+}
+"""
+
+# Liga a classificação das duas trilhas de um empate técnico em uma só chamada
+TRILHA_COMBINADA = os.environ.get('TRILHA_COMBINADA', '1') != '0'
+
+
+def montar_prompt_trilha(contexto, titulo, classificacao_json, trilha_txt):
+    """Prompt de tópico de uma trilha (texto idêntico ao da versão original, por causa do cache)"""
+    video = (f"Sinopse Técnica: {contexto}\nTítulo do Vídeo: {titulo}\n"
+             "==================================================\n")
+    topicos = f'TÓPICOS DISPONÍVEIS PARA "{classificacao_json}":\n{trilha_txt}\n\n'
+    return PROMPT_TRILHA_CABECALHO + video + topicos + PROMPT_TRILHA_LEMBRETE + PROMPT_TRILHA_SAIDA
+
+
+def montar_prompt_trilha_dupla(contexto, titulo, trilha_principal, trilha_base):
+    """Um único prompt pedindo o tópico da ferramenta principal e o da tecnologia base"""
+    video = (f"Sinopse Técnica: {contexto}\nTítulo do Vídeo: {titulo}\n"
+             "==================================================\n")
+    topicos = (
+        "O vídeo tem EMPATE TÉCNICO entre duas ferramentas. Classifique-o nas DUAS trilhas abaixo, de forma independente.\n\n"
+        f'PRIMEIRA LISTA — TÓPICOS DISPONÍVEIS PARA "{trilha_principal.ferramenta}":\n{trilha_principal.texto_prompt}\n\n'
+        f'SEGUNDA LISTA — TÓPICOS DISPONÍVEIS PARA "{trilha_base.ferramenta}":\n{trilha_base.texto_prompt}\n\n'
+    )
+    return PROMPT_TRILHA_CABECALHO + video + topicos + PROMPT_TRILHA_LEMBRETE + PROMPT_TRILHA_SAIDA_DUPLA
+
+
+def separar_resposta_dupla(texto, trilha_principal, trilha_base):
+    """(tópico principal, tópico base) da resposta combinada, ou None se não for um JSON válido"""
+    try:
+        resposta = json.loads(limpar_markdown_json(texto))
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(resposta, dict) or not {'topico_principal', 'topico_base'} <= resposta.keys():
+        return None
+    principal, base = str(resposta['topico_principal']), str(resposta['topico_base'])
+    return trilha_principal.aproximar(principal) or principal, trilha_base.aproximar(base) or base
+
+
+
+
+COLUNAS_CLASSIFICACAO = {
+    "ferramenta_principal": "ferramenta_principal",
+    "tecnologia_base": "tecnologia_base",
+    "classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes": "empate",
+    "cargo": "cargo",
+    "tipo_video": "tipo_video",
+}
+
+
+def _para_bool(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('true', 'sim', '1')
+    return bool(valor) if valor is not None and valor == valor else False
+
+
+def expandir_classificacao(df, coluna_classificacao='classificacao_gemini'):
+    """Interpreta o JSON da classificação uma única vez e o expande em colunas tipadas.
+
+    Cria ferramenta_principal, tecnologia_base, empate (bool), cargo, tipo_video e
+    status_parse ('ok', 'erro', 'vazio', 'json_invalido'); as etapas seguintes leem
+    essas colunas em vez de interpretar o texto de novo.
+    """
+    bruto = df[coluna_classificacao].fillna('').astype(str)
+
+    # Limpeza das cercas de markdown vetorizada; só o json.loads é por linha
+    limpo = (bruto.str.strip()
+                  .str.replace(r'^```(?:json)?\s*', '', regex=True)
+                  .str.replace(r'\s*```$', '', regex=True)
+                  .str.strip())
+
+    def carregar(texto):
+        try:
+            valor = json.loads(texto)
+        except (json.JSONDecodeError, TypeError):
+            return None
+        return valor if isinstance(valor, dict) else None
+
+    dicts = limpo.map(carregar)
+
+    status = pd.Series('ok', index=df.index)
+    status[dicts.isna()] = 'json_invalido'
+    status[limpo == ''] = 'vazio'
+    status[bruto.str.strip().str.lower() == 'erro'] = 'erro'
+    novas = {'status_parse': status}
+
+    campos = pd.DataFrame(
+        [d if d is not None else {} for d in dicts],
+        index=df.index,
+        columns=list(COLUNAS_CLASSIFICACAO),
+    ).rename(columns=COLUNAS_CLASSIFICACAO)
+
+    for nome in ('ferramenta_principal', 'tecnologia_base', 'cargo', 'tipo_video'):
+        novas[nome] = campos[nome].where(campos[nome].notna(), '').astype(str).str.strip()
+    novas['empate'] = campos['empate'].map(_para_bool).astype(bool)
+    df = df.assign(**novas)
+
+    contagem = status.value_counts().to_dict()
+    print(f"\nClassificações interpretadas: {contagem}")
+    return df
+
+
+def classificacao_da_linha(row):
+    """Dict no formato original da resposta, montado a partir das colunas tipadas de um registro"""
+    return {campo: getattr(row, coluna) for campo, coluna in COLUNAS_CLASSIFICACAO.items()}
+
+
+def precisa_segundo_topico(df, trilhas_data=None):
+    """Máscara das linhas com empate técnico real: a base tem trilha própria, diferente da principal"""
+    indice = _como_indice(trilhas_data if trilhas_data is not None else carregar_indice_trilhas())
+    if 'status_parse' not in df.columns:
+        return df['classificacao_gemini'].map(lambda c: bool(obter_tecnologia_base(c, indice))).astype(bool)
+    trilha_propria = pd.Series(
+        [bool(indice.topicos(base)) and indice.topicos(base) is not indice.topicos(principal)
+         for principal, base in zip(df['ferramenta_principal'], df['tecnologia_base'])],
+        index=df.index, dtype=bool,
+    )
+    return (df['status_parse'] == 'ok') & df['empate'] & (df['ferramenta_principal'] != df['tecnologia_base']) & trilha_propria
+
+
+def classificar_trilhas_groq(df, groq_api_key, coluna_classificacao='classificacao_gemini',coluna='topico_trilha',funcao=obter_trilha,diretorio_checkpoint=None,
+                             combinar_segundo_topico=False, coluna_segundo='topico_duplicado'):
+    """Classifica cada vídeo no tópico da trilha devolvida por `funcao`.
+
+    Com `combinar_segundo_topico`, vídeos com empate técnico cujas duas trilhas já
+    são conhecidas recebem os dois tópicos em uma única chamada (`coluna` e
+    `coluna_segundo`); `classificar_segundo_topico` depois só cuida do que faltar.
+    """
+        
+    executor = obter_executor(groq_api_key)
+    
+    # Carregar trilhas (índice em memória, lido uma vez por processo)
+    trilhas_data = carregar_indice_trilhas()
+    
+    print(f"\nClassificando {len(df)} vídeos nas trilhas com Groq...")
+    
+    colunas_tipadas = 'status_parse' in df.columns
+    combinar = combinar_segundo_topico and colunas_tipadas
+    empate = precisa_segundo_topico(df, trilhas_data).to_numpy() if combinar else None
+    topicos_classificados = np.full(len(df), "sem_trilha", dtype=object)
+    segundos_topicos = np.full(len(df), None, dtype=object)
+    posicoes, prompts, video_ids, chaves, trilhas_enviadas = [], [], [], [], []
+    duplas = []
+    sem_trilha = 0
+    automaticos = 0
+    topicos_enviados = 0
+    
+    # Só as colunas que o loop lê; classificacao_da_linha usa as colunas tipadas
+    colunas = ['video_id', 'title', 'contexto']
+    if colunas_tipadas:
+        colunas += ['status_parse'] + [c for c in COLUNAS_CLASSIFICACAO.values() if c not in colunas]
+    classificacoes_json = df[coluna_classificacao].tolist()
+    
+    for posicao, row in enumerate(registros(df, colunas)):
+        # Pegar a ferramenta classificada
+        classificacao_json = classificacoes_json[posicao]
+        
+        # Buscar a trilha dessa ferramenta (pelas colunas já interpretadas, quando existirem)
+        if colunas_tipadas:
+            trilha = funcao(classificacao_da_linha(row), trilhas_data) if row.status_parse == 'ok' else []
+        else:
+            trilha = funcao(classificacao_json, trilhas_data)
+        
+        # Se não encontrou trilha, fica "sem_trilha"
+        if not trilha:
+            sem_trilha += 1
+            continue
+        
+        # Pré-ranking local: só os tópicos mais prováveis vão no prompt (ou nenhum, com margem alta)
+        texto = f"{row.contexto} {row.title}"
+        automatico, candidatos = selecionar_topicos(trilha, texto)
+        
+        # Empate técnico com as duas trilhas conhecidas: um só prompt para os dois tópicos
+        if combinar and empate[posicao] and trilha is trilhas_data.topicos(row.ferramenta_principal):
+            base = trilhas_data.topicos(row.tecnologia_base)
+            automatico_base, candidatos_base = selecionar_topicos(base, texto)
+            if automatico and automatico_base:
+                topicos_classificados[posicao], segundos_topicos[posicao] = automatico, automatico_base
+                automaticos += 1
+                continue
+            topicos_enviados += len(candidatos) + len(candidatos_base)
+            duplas.append((posicao, row, classificacao_json, trilha, base, candidatos, candidatos_base))
+            continue
+        
+        if automatico:
+            topicos_classificados[posicao] = automatico
+            automaticos += 1
+            continue
+        
+        topicos_enviados += len(candidatos)
+        posicoes.append(posicao)
+        trilhas_enviadas.append(trilha)
+        prompts.append(montar_prompt_trilha(row.contexto, row.title, classificacao_json, candidatos.texto_prompt))
+        video_ids.append(row.video_id)
+        chaves.append(chave_cache(MODELO_GEMINI, CONFIG_TRILHA, VERSAO_PROMPT_TRILHA,
+                                  {'title': row.title, 'contexto': row.contexto,
+                                   'classificacao': classificacao_json, 'topicos': list(candidatos)}))
+    
+    print(f"  ✓ {len(df) - sem_trilha} vídeos com trilha | ⚠ {sem_trilha} sem trilha encontrada")
+    if PRE_RANKING_TOPICOS:
+        enviados = len(posicoes) + 2 * len(duplas)
+        com_trilha = len(df) - sem_trilha
+        print(f"  Pré-ranking: {automaticos}/{com_trilha} vídeos ({automaticos / max(1, com_trilha):.0%}) com tópico "
+              f"atribuído sem LLM{'' if TOPICO_AUTOMATICO else ' (TOPICO_AUTOMATICO=0)'} | "
+              f"{topicos_enviados / max(1, enviados):.1f} tópicos por lista enviada")
+        obter_metricas().registrar_funil(f'{coluna}_automatico', automaticos)
+    
+    model = genai.GenerativeModel(model_name=MODELO_GEMINI, generation_config=GenerationConfig(**CONFIG_TRILHA))
+    
+    if duplas:
+        with abrir_journal(diretorio_checkpoint, f"{coluna}_{coluna_segundo}") as journal:
+            respostas_duplas = executor.executar(
+                model,
+                [montar_prompt_trilha_dupla(row.contexto, row.title, candidatos, candidatos_base)
+                 for _, row, _, _, _, candidatos, candidatos_base in duplas],
+                [row.video_id for _, row, *_ in duplas],
+                rotulo="Trilhas (empate) classificadas",
+                chaves_cache=[
+                    chave_cache(MODELO_GEMINI, CONFIG_TRILHA, VERSAO_PROMPT_TRILHA_DUPLA,
+                                {'title': row.title, 'contexto': row.contexto,
+                                 'topicos': list(candidatos), 'topicos_base': list(candidatos_base)})
+                    for _, row, _, _, _, candidatos, candidatos_base in duplas
+                ],
+                journal=journal,
+                etapa=f"{coluna}_{coluna_segundo}",
+            )
+        falhas = 0
+        for (posicao, row, classificacao_json, principal, base, candidatos, _), resposta in zip(duplas, respostas_duplas):
+            topicos = separar_resposta_dupla(resposta, principal, base)
+            if topicos is None:
+                # Resposta combinada ilegível: volta para o fluxo de um tópico por chamada
+                falhas += 1
+                posicoes.append(posicao)
+                trilhas_enviadas.append(principal)
+                prompts.append(montar_prompt_trilha(row.contexto, row.title, classificacao_json, candidatos.texto_prompt))
+                video_ids.append(row.video_id)
+                chaves.append(chave_cache(MODELO_GEMINI, CONFIG_TRILHA, VERSAO_PROMPT_TRILHA,
+                                          {'title': row.title, 'contexto': row.contexto,
+                                           'classificacao': classificacao_json, 'topicos': list(candidatos)}))
+                continue
+            topicos_classificados[posicao], segundos_topicos[posicao] = topicos
+        print(f"  Empates combinados: {len(duplas)} vídeos em {len(duplas)} chamadas | {falhas} reenviados no fluxo simples")
+    
+    # Chamar Gemini em paralelo (cota controlada pelo executor)
+    with abrir_journal(diretorio_checkpoint, coluna) as journal:
+        respostas = executor.executar(model, prompts, video_ids, rotulo="Trilhas classificadas", chaves_cache=chaves,
+                                      journal=journal, etapa=coluna)
+    
+    # Respostas que batem com um tópico da trilha (a menos de caixa, aspas, acentos,
+    # parênteses omitidos ou pequenas diferenças de grafia) são trocadas pelo nome canônico
+    for posicao, trilha, topico in zip(posicoes, trilhas_enviadas, respostas):
+        topicos_classificados[posicao] = trilha.aproximar(topico) or topico
+    
+    # Adicionar coluna ao DataFrame
+    novas = {coluna: topicos_classificados}
+    if combinar:
+        novas[coluna_segundo] = segundos_topicos
+    
+    return df.assign(**novas)
+
+
+def classificar_segundo_topico(df, groq_api_key, coluna='topico_duplicado', diretorio_checkpoint=None):
+    """Segunda passada de trilhas só sobre os vídeos com empate técnico real.
+
+    Os demais recebem "sem_trilha" direto, sem passar pelo loop; os que já tiveram
+    o segundo tópico resolvido na chamada combinada são mantidos.
+    """
+    precisa = precisa_segundo_topico(df)
+    ja_resolvido = df[coluna].notna() if coluna in df.columns else pd.Series(False, index=df.index)
+
+    anteriores = df[coluna] if coluna in df.columns else pd.Series(None, index=df.index, dtype=object)
+    topicos = anteriores.where(precisa & ja_resolvido, "sem_trilha").astype(object)
+
+    mascara_pendentes = precisa & ~ja_resolvido
+    print(f"\nSegundo tópico: {int(precisa.sum())}/{len(df)} vídeos com empate técnico "
+          f"({int((precisa & ja_resolvido).sum())} já resolvidos na chamada combinada, {int(mascara_pendentes.sum())} pendentes)")
+
+    if mascara_pendentes.any():
+        classificados = classificar_trilhas_groq(df.loc[mascara_pendentes, df.columns != coluna], groq_api_key, coluna=coluna,
+                                                 funcao=obter_tecnologia_base, diretorio_checkpoint=diretorio_checkpoint)
+        topicos[mascara_pendentes] = classificados[coluna].to_numpy()
+    return df.assign(**{coluna: topicos})
+
+
+
+# ============================================
+# PRÉ-FILTRO LOCAL (ANTES DE QUALQUER LLM)
+# ============================================
+
+PREFILTRO_ATIVO = os.environ.get('PREFILTRO', '1') != '0'
+
+# Duração máxima (s) tratada como Short (o YouTube aceita Shorts de até 3 minutos)
+DURACAO_MAXIMA_SHORT = int(os.environ.get('PREFILTRO_DURACAO_SHORT', 180))
+
+# Siglas/termos genéricos que, sozinhos, o contextualizador considera insuficientes
+TERMOS_GENERICOS = {
+    'api', 'apis', 'rest', 'crud', 'etl', 'poo', 'io', 'ui', 'ux', 'cli', 'ci', 'cd', 'seo', 'ai', 'llms',
+    'backend', 'frontend', 'app', 'deploy', 'webhook', 'webhooks', 'servidor', 'url', 'chat', 'nuvem',
+}
+
+# Bibliotecas, comandos e recursos que o classificador aceita por inferência
+# (ex.: "DAX → Power BI", "VBA → Excel"), além dos nomes da lista oficial
+TERMOS_FERRAMENTAS_EXTRAS = [
+    'Nest.js', 'NodeJS', 'Node', 'ReactJS', 'VueJS', 'Nuxt', 'NextJS', 'Postgres', 'PostgreSQL', 'MySQL',
+    'SQLite', 'SQL Server', 'Oracle', 'PL/SQL', 'NumPy', 'Matplotlib', 'Seaborn', 'Jupyter', 'Colab', 'sklearn',
+    'Keras', 'PySpark', 'Databricks', 'BigQuery', 'Bash', 'Shell', 'PowerShell', 'Ubuntu', 'Debian', 'WSL',
+    'VS Code', 'VSCode', 'IntelliJ', 'PyCharm', 'Eclipse', 'Vim', 'Neovim', 'GitHub', 'GitLab', 'npm', 'Yarn',
+    'jQuery', 'Bootstrap', 'Sass', 'Webpack', 'Jest', 'Vitest', 'pytest', 'Playwright', 'Appium', 'Lodash',
+    'Axios', 'BullMQ', 'Socket.io', 'TypeORM', 'Sequelize', 'Mongoose', 'Eloquent', 'Artisan', 'Blade',
+    'JPA', 'Hibernate', 'Maven', 'Gradle', 'Android Studio', 'Jetpack Compose', 'SwiftUI', 'Xcode', 'Dart',
+    'DAX', 'Power Query', 'VBA', 'PROCV', 'XLOOKUP', 'Planilha', 'Planilhas', 'Looker', 'Helm', 'kubectl',
+    'Ansible', 'Nginx', 'CloudWatch', 'EC2', 'S3', 'Lambda', 'DynamoDB', 'Cloud Run', 'Firestore', 'Ollama',
+    'LangChain', 'JSX', 'Hooks', 'useState', 'useEffect', 'Redux', 'Zustand', 'Pinia', 'RxJS', 'Django',
+    'Flask', 'FastAPI', 'Streamlit', 'SQLAlchemy', 'Pydantic', 'Celery', 'Tkinter', 'PyQt', 'Selenium',
+]
+
+PADRAO_HASHTAG = re.compile(r'#[\w\-]+')
+PADRAO_LIVE = re.compile(r'\b(?:live|lives|ao vivo|aovivo|stream|podcast)\b', re.IGNORECASE)
+PADRAO_PROMOCIONAL = re.compile(
+    r'black\s*friday|cupom|desconto|inscri[çc][õo]es\s+abertas|[úu]ltim[oa]s?\s+(?:vagas|lote|dias)|'
+    r'garanta\s+(?:sua|j[áa])|lote\s+promocional|oferta|pr[ée]-?venda|matr[íi]culas?\s+abertas',
+    re.IGNORECASE,
+)
+
+
+def ferramentas_da_lista_aceita():
+    """Nomes da LISTA FERRAMENTAS ACEITAS embutida no prompt de classificação"""
+    inicio = PROMPT_CLASSIFICACAO_CABECALHO.index('**LISTA FERRAMENTAS ACEITAS')
+    bloco = PROMPT_CLASSIFICACAO_CABECALHO[inicio:].split('\n', 1)[1].split('---', 1)[0]
+    nomes = []
+    for linha in bloco.splitlines():
+        nomes.extend(n.strip() for n in linha.split('|') if n.strip())
+    return nomes
+
+
+def _alternancia(termos):
+    """Regex única (alternância) para uma lista de termos, sem casar dentro de outras palavras"""
+    unicos = sorted({t for t in termos if t and t.lower() not in TERMOS_GENERICOS}, key=len, reverse=True)
+    return re.compile(r'(?<![\w])(?:' + '|'.join(re.escape(t) for t in unicos) + r')(?![\w])', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=None)
+def regex_prefiltro():
+    """Compila (uma vez) a regex de ferramentas: lista aceita, extras e ferramentas das trilhas"""
+    ferramentas = ferramentas_da_lista_aceita() + TERMOS_FERRAMENTAS_EXTRAS
+    ferramentas += [trilha.ferramenta for trilha in carregar_indice_trilhas().trilhas.values()]
+    ferramentas += ['MCP']
+    return _alternancia(ferramentas)
+
+
+def texto_tags(df):
+    """Tags do vídeo como texto (lista da API, array do Parquet ou repr da lista no CSV)"""
+    if 'tags' not in df:
+        return pd.Series('', index=df.index)
+
+    def juntar(tags):
+        if isinstance(tags, (list, tuple, np.ndarray)):
+            return ' '.join(map(str, tags))
+        return '' if pd.isna(tags) else re.sub(r"[\[\]',\"]", ' ', str(tags))
+
+    return df['tags'].map(juntar).astype(str)
+
+
+def prefiltrar_videos(df):
+    """Roteia cada vídeo para 'pular' ou 'enviar' sem chamar a API.
+
+    - pular: Shorts, vídeos sem nenhuma ferramenta no título/descrição/tags
+      (hashtags não contam), lives e anúncios sem ferramenta no título;
+    - enviar: todo o resto segue o fluxo normal.
+
+    Retorna uma Series de rotas alinhada ao índice do DataFrame.
+    """
+    regex_ferramentas = regex_prefiltro()
+
+    titulo = df['title'].fillna('').astype(str)
+    descricao = df['description'].fillna('').astype(str).str.replace(PADRAO_HASHTAG, ' ', regex=True)
+    titulo_sem_hashtag = titulo.str.replace(PADRAO_HASHTAG, ' ', regex=True)
+
+    ferramenta_titulo = titulo_sem_hashtag.str.contains(regex_ferramentas)
+    ferramenta_texto = (ferramenta_titulo | descricao.str.contains(regex_ferramentas)
+                        | texto_tags(df).str.contains(regex_ferramentas))
+
+    duracao = pd.to_timedelta(df['duration'], errors='coerce').dt.total_seconds() if 'duration' in df else pd.Series(float('nan'), index=df.index)
+    short = (duracao > 0) & (duracao <= DURACAO_MAXIMA_SHORT) | titulo.str.contains('#shorts', case=False, regex=False)
+    live = titulo.str.contains(PADRAO_LIVE) | (duracao == 0)
+    promocional = titulo.str.contains(PADRAO_PROMOCIONAL)
+
+    regras_pular = {
+        'short': short,
+        'sem_ferramenta': ~ferramenta_texto,
+        'live_sem_ferramenta': live & ~ferramenta_titulo,
+        'anuncio_sem_ferramenta': promocional & ~ferramenta_titulo,
+    }
+
+    pular = pd.Series(False, index=df.index)
+    for mascara in regras_pular.values():
+        pular |= mascara
+
+    rotas = pd.Series('enviar', index=df.index)
+    rotas[pular] = 'pular'
+
+    print(f"\nPré-filtro local: {len(df)} vídeos")
+    for nome, mascara in regras_pular.items():
+        print(f"  - {nome}: {int(mascara.sum())}")
+    print(f"  → pular: {int(pular.sum())} | enviar: {int((rotas == 'enviar').sum())}")
+    print(f"  → Chamadas economizadas: {int(pular.sum())} (contextualização)")
+    return rotas
+
+
+
+# ============================================
+# DEDUPLICAÇÃO (MINHASH + LSH)
+# ============================================
+
+DEDUP_ATIVO = os.environ.get('DEDUP', '1') != '0'
+# Jaccard mínimo (estimado pelas assinaturas) entre os textos de dois vídeos do mesmo cluster
+LIMIAR_QUASE_DUPLICADO = float(os.environ.get('DEDUP_LIMIAR', 0.8))
+# Jaccard mínimo entre as palavras dos títulos: o mesmo rodapé de descrição do canal não basta
+LIMIAR_TITULO_DUPLICADO = 0.5
+PERMUTACOES_MINHASH = 128
+# 16 bandas de 8 linhas: pares com Jaccard 0,8 viram candidatos com ~95% de chance, com 0,5 com ~6%
+BANDAS_LSH = 16
+# Shingles de 3 palavras; textos com menos shingles que isso não entram em cluster
+TAMANHO_SHINGLE = 3
+PRIMO_MINHASH = (1 << 31) - 1
+
+PADRAO_URL = re.compile(r'https?://\S+|www\.\S+')
+
+
+def normalizar_texto_dedup(texto):
+    """Palavras do texto sem links, hashtags, acentos, pontuação e números soltos ("Parte 2", "#3")"""
+    texto = PADRAO_HASHTAG.sub(' ', PADRAO_URL.sub(' ', str(texto or '').lower()))
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\b\d+\b', ' ', re.sub(r'[^a-z0-9+#]+', ' ', texto)).split()
+
+
+def shingles(palavras, tamanho=TAMANHO_SHINGLE):
+    """Hashes (31 bits, estáveis entre processos) das sequências de `tamanho` palavras"""
+    return {
+        zlib.crc32(' '.join(palavras[i:i + tamanho]).encode('utf-8')) & PRIMO_MINHASH
+        for i in range(max(1, len(palavras) - tamanho + 1))
+    }
+
+
+class IndiceMinHash:
+    """Assinaturas MinHash e LSH em bandas, calculados em bloco para o dataset inteiro"""
+
+    def __init__(self, permutacoes=PERMUTACOES_MINHASH, bandas=BANDAS_LSH, seed=0):
+        gerador = np.random.default_rng(seed)
+        self.a = gerador.integers(1, PRIMO_MINHASH, permutacoes, dtype=np.uint64)
+        self.b = gerador.integers(0, PRIMO_MINHASH, permutacoes, dtype=np.uint64)
+        self.bandas = bandas
+        self.linhas = permutacoes // bandas
+        # Pesos do hash de cada banda (a soma transborda em uint64 de propósito)
+        self.pesos = gerador.integers(1, 1 << 63, self.linhas, dtype=np.uint64)
+
+    def assinaturas(self, conjuntos):
+        """Matriz (vídeos × permutações) com o menor hash permutado de cada conjunto (não vazio)"""
+        tamanhos = np.fromiter((len(c) for c in conjuntos), dtype=np.int64, count=len(conjuntos))
+        valores = np.fromiter(itertools.chain.from_iterable(conjuntos), dtype=np.uint64, count=int(tamanhos.sum()))
+        inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1])).astype(np.int64)
+        assinaturas = np.empty((len(conjuntos), len(self.a)), dtype=np.uint64)
+        if not len(conjuntos):
+            return assinaturas
+        for k in range(len(self.a)):
+            assinaturas[:, k] = np.minimum.reduceat((self.a[k] * valores + self.b[k]) % PRIMO_MINHASH, inicios)
+        return assinaturas
+
+    def pares_candidatos(self, assinaturas):
+        """Pares (primeiro do bucket, outro) de linhas com alguma banda inteira igual"""
+        pares = set()
+        if len(assinaturas) < 2:
+            return pares
+        for banda in range(self.bandas):
+            bloco = assinaturas[:, banda * self.linhas:(banda + 1) * self.linhas]
+            chaves = (bloco * self.pesos).sum(axis=1)
+            ordem = np.argsort(chaves, kind='stable')
+            ordenadas = chaves[ordem]
+            novo_bucket = np.r_[True, ordenadas[1:] != ordenadas[:-1]]
+            # Ordenação estável: o primeiro de cada bucket é a menor posição
+            primeiro = ordem[np.maximum.accumulate(np.where(novo_bucket, np.arange(len(ordem)), 0))]
+            pares.update(zip(primeiro[~novo_bucket].tolist(), ordem[~novo_bucket].tolist()))
+        return pares
+
+
+def agrupar_quase_duplicados(df, limiar=LIMIAR_QUASE_DUPLICADO):
+    """cluster_id de cada vídeo: o video_id do primeiro vídeo do seu grupo de quase duplicados.
+
+    Candidatos saem do LSH (sem comparar todos os pares); um par só vira cluster se
+    a similaridade estimada de título+descrição passar de `limiar` e os títulos
+    também forem parecidos. Vídeos sem par recebem o próprio video_id.
+    """
+    video_ids = df['video_id'].astype(str).tolist()
+    titulos = [set(normalizar_texto_dedup(t)) for t in df['title']]
+    conjuntos = [shingles(normalizar_texto_dedup(f"{row.title} {row.description}"))
+                 for row in registros(df, ['title', 'description'])]
+    posicoes = [p for p, conjunto in enumerate(conjuntos) if len(conjunto) >= TAMANHO_SHINGLE]
+    if len(posicoes) < 2:
+        return pd.Series(video_ids, index=df.index, name='cluster_id', dtype=object)
+
+    indice = IndiceMinHash()
+    assinaturas = indice.assinaturas([conjuntos[p] for p in posicoes])
+    pares = np.array(sorted(indice.pares_candidatos(assinaturas)), dtype=np.int64).reshape(-1, 2)
+    similares = (assinaturas[pares[:, 0]] == assinaturas[pares[:, 1]]).mean(axis=1) >= limiar
+
+    pai = list(range(len(df)))
+
+    def raiz(posicao):
+        while pai[posicao] != posicao:
+            pai[posicao] = pai[pai[posicao]]
+            posicao = pai[posicao]
+        return posicao
+
+    for i, j in pares[similares].tolist():
+        i, j = posicoes[i], posicoes[j]
+        uniao = titulos[i] | titulos[j]
+        if uniao and len(titulos[i] & titulos[j]) / len(uniao) < LIMIAR_TITULO_DUPLICADO:
+            continue
+        # A raiz é sempre a menor posição: o representante é o primeiro vídeo do cluster
+        primeira, segunda = sorted((raiz(i), raiz(j)))
+        pai[segunda] = primeira
+
+    return pd.Series([video_ids[raiz(p)] for p in range(len(df))], index=df.index, name='cluster_id')
+
+
+def deduplicar_videos(df):
+    """Remove video_id repetidos e agrupa os quase duplicados.
+
+    Retorna (df sem repetidos, Series cluster_id); só os representantes
+    (cluster_id == video_id) seguem para as etapas de LLM.
+    """
+    repetidos = df['video_id'].duplicated()
+    df = df[~repetidos]
+    if DEDUP_ATIVO:
+        clusters = agrupar_quase_duplicados(df)
+    else:
+        clusters = df['video_id'].astype(str).rename('cluster_id')
+    membros = int((clusters != df['video_id'].astype(str)).sum())
+
+    print(f"\nDeduplicação: {len(df) + int(repetidos.sum())} vídeos")
+    print(f"  - video_id repetido: {int(repetidos.sum())}")
+    print(f"  - quase duplicados: {membros} em {clusters[clusters.duplicated(keep=False)].nunique()} clusters")
+    print(f"  → Vídeos economizados: {int(repetidos.sum()) + membros} (todas as etapas)")
+    return df, clusters
+
+
+def propagar_rotulos(df_videos, clusters, df_rotulos):
+    """Linhas completas de todos os membros dos clusters classificados, com os rótulos do representante"""
+    rotulos = df_rotulos.set_axis(clusters.loc[df_rotulos.index])
+    membros = clusters[clusters.isin(rotulos.index)]
+    return df_videos.loc[membros.index].assign(cluster_id=membros).join(
+        rotulos.reindex(membros.values).set_axis(membros.index))
+
+
+
+# ============================================
+# LIMPEZA DAS DESCRIÇÕES (ANTES DOS PROMPTS)
+# ============================================
+
+LIMPEZA_DESCRICOES_ATIVA = os.environ.get('LIMPEZA_DESCRICOES', '1') != '0'
+# Tamanho máximo da descrição limpa enviada ao modelo (corta na última palavra inteira)
+LIMITE_DESCRICAO = int(os.environ.get('DESCRICAO_MAX_CHARS', 1500))
+# Uma linha repetida em tantos vídeos do mesmo canal é rodapé/assinatura do canal
+MIN_REPETICOES_RODAPE = 3
+
+PADRAO_EMAIL = re.compile(r'\b[\w.+-]+@[\w-]+\.[\w.]+\b')
+PADRAO_PERFIL = re.compile(r'(?<![\w.])@[\w.]{2,}')
+PADRAO_EMOJI = re.compile('[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D\u20E3]+')
+# Linhas inteiras de chamada para ação, convite para comunidade, patrocínio e doações.
+# Só frases de CTA: o nome da plataforma sozinho ("bot para Discord", "API do WhatsApp",
+# "descontos na planilha") é conteúdo técnico e fica
+PADRAO_LINHA_CTA = re.compile(
+    r'\b(?:inscreva[-\s]se|se\s+inscrev\w+|inscri[çc][ãa]o\s+no\s+canal|ativ[ae]\s+o\s+sininho|'
+    r'deix[ae]\s+(?:seu|o|um)\s+like|curt[ae]\s+o\s+v[íi]deo|compartilh[ae]\s+(?:com|este|esse|o\s+v[íi]deo)|'
+    r'coment[ae]\s+(?:a[íi]|abaixo|o\s+que\s+(?:achou|voc[êe]\s+achou))|me\s+sig[ae]|sig[ae][-\s]+(?:me|nos)\b|'
+    r'(?:nossas|minhas)\s+redes(?:\s+sociais)?|redes\s+sociais\s*:|'
+    r'entr[ae]\s+(?:no|para\s+o|em\s+nosso)\s+(?:nosso\s+)?(?:discord|grupo|servidor|telegram)|'
+    r'(?:link|grupo|servidor|comunidade)\s+(?:do|no)\s+(?:nosso\s+)?(?:discord|telegram|whatsapp)|'
+    r'seja\s+membro|membros\s+do\s+canal|apoie\s+o\s+canal|apoia\.se|chave\s+pix|pix\s*:|'
+    r'doa[çc][ãa]o\s+(?:para|ao)\s+canal|cupom(?:\s+de\s+desconto)?\s*:|use\s+o\s+cupom|contato\s+comercial|parcerias?\s*:|'
+    r'v[íi]deo\s+patrocinado|patroc[íi]nio\s*:|link\s+na\s+descri[çc][ãa]o|links?\s+(?:abaixo|[úu]teis))(?!\w)',
+    re.IGNORECASE,
+)
+# Linha que tinha link, e-mail ou @perfil e, sem eles, sobra só um rótulo ("Instagram:", "Link do repositório:")
+MAX_PALAVRAS_RESIDUO = 3
+# Mudou a lógica da limpeza (além dos parâmetros e padrões, que já entram na assinatura)? Suba a versão
+VERSAO_LIMPEZA = 'limpeza-v2'
+
+
+def _chave_linha(linhas):
+    """Forma comparável de cada linha (sem números, pontuação e caixa) para achar rodapés repetidos"""
+    return (linhas.str.lower()
+                  .str.replace(r'[\d\W_]+', ' ', regex=True)
+                  .str.strip())
+
+
+def limpar_descricoes(df, coluna='description', limite=None):
+    """Remove ruído da descrição antes de montar os prompts.
+
+    Links, e-mails, @perfis, hashtags e emojis saem por regex; linhas de CTA e
+    patrocínio saem inteiras, assim como linhas que eram só um rótulo para um link
+    ou @perfil (até MAX_PALAVRAS_RESIDUO palavras de sobra) e linhas repetidas em
+    MIN_REPETICOES_RODAPE ou mais vídeos do mesmo canal (rodapés). O resultado é
+    cortado em `limite` (padrão LIMITE_DESCRICAO) caracteres. Devolve o df com a descrição limpa, a original
+    em descricao_bruta e a coluna tokens_economizados (estimativa por linha).
+    """
+    limite = LIMITE_DESCRICAO if limite is None else limite
+    original = df[coluna].fillna('').astype(str)
+    canais = df['channel_id'] if 'channel_id' in df.columns else df['channel_name']
+
+    # Uma linha da descrição por registro, com o índice do vídeo repetido
+    linhas = original.str.split('\n').explode()
+    canal_linha = canais.reindex(linhas.index).astype(str)
+    chave = _chave_linha(linhas)
+
+    # Rodapé: mesma linha (normalizada) em vários vídeos distintos do mesmo canal
+    pares = pd.DataFrame({'canal': canal_linha.to_numpy(), 'chave': chave.to_numpy(), 'video': linhas.index})
+    contagem = pares.drop_duplicates().groupby(['canal', 'chave']).size().rename('repeticoes')
+    repeticoes = pares.join(contagem, on=['canal', 'chave'])['repeticoes'].to_numpy()
+    rodape = (repeticoes >= MIN_REPETICOES_RODAPE) & (chave.str.len().to_numpy() > 2)
+
+    limpas = (linhas.str.replace(PADRAO_URL, ' ', regex=True)
+                    .str.replace(PADRAO_EMAIL, ' ', regex=True)
+                    .str.replace(PADRAO_PERFIL, ' ', regex=True)
+                    .str.replace(PADRAO_HASHTAG, ' ', regex=True)
+                    .str.replace(PADRAO_EMOJI, ' ', regex=True)
+                    .str.replace(r'[ \t\r]+', ' ', regex=True)
+                    .str.strip())
+    tinha_link = (linhas.str.contains(PADRAO_URL) | linhas.str.contains(PADRAO_EMAIL)
+                  | linhas.str.contains(PADRAO_PERFIL)).to_numpy()
+    residuo = tinha_link & (limpas.str.split().str.len().to_numpy() <= MAX_PALAVRAS_RESIDUO)
+    manter = (~rodape & ~residuo & ~linhas.str.contains(PADRAO_LINHA_CTA).to_numpy()
+              & limpas.str.contains(r'\w', regex=True).to_numpy())
+
+    limpa = limpas[manter].groupby(level=0).agg('\n'.join).reindex(df.index, fill_value='')
+    cortadas = limpa.str.len() > limite
+    limpa[cortadas] = limpa[cortadas].str.slice(0, limite).str.replace(r'\s+\S*$', '', regex=True) + ' …'
+
+    # Mesma conta de estimar_tokens (~3 caracteres por token)
+    economizados = (original.str.len() - limpa.str.len()).clip(lower=0) // 3
+
+    print(f"\nLimpeza das descrições: {len(df)} vídeos | {int(rodape.sum())} linhas de rodapé de canal | "
+          f"{int(cortadas.sum())} cortadas em {limite} caracteres")
+    if len(df):
+        print(f"  → Tokens economizados: {int(economizados.sum())} no total | "
+              f"média {economizados.mean():.0f} | p90 {economizados.quantile(0.9):.0f} por vídeo")
+    return df.assign(**{coluna: limpa, 'descricao_bruta': original, 'tokens_economizados': economizados})
+
+
+def descricoes_para_cache(df):
+    """Descrição que entra na chave do cache LLM: a original, quando houve limpeza.
+
+    Os rodapés dependem dos outros vídeos do lote, então a descrição limpa de um
+    vídeo muda de um lote para outro; a original não. A chave leva também
+    `assinatura_limpeza(df)`, para que outra configuração da limpeza não
+    reaproveite respostas dadas a outro texto.
+    """
+    return df['descricao_bruta' if 'descricao_bruta' in df.columns else 'description'].tolist()
+
+
+def assinatura_limpeza(df):
+    """Versão, parâmetros e padrões da limpeza aplicada ao df (None se a descrição está crua)"""
+    if 'descricao_bruta' not in df.columns:
+        return None
+    padroes = [PADRAO_URL, PADRAO_EMAIL, PADRAO_PERFIL, PADRAO_HASHTAG, PADRAO_EMOJI, PADRAO_LINHA_CTA]
+    impressao = hashlib.sha256('\n'.join(p.pattern for p in padroes).encode('utf-8')).hexdigest()[:12]
+    return f"{VERSAO_LIMPEZA}:{LIMITE_DESCRICAO}:{MIN_REPETICOES_RODAPE}:{MAX_PALAVRAS_RESIDUO}:{impressao}"
+
+
+
+# ============================================
+# ARMAZENAMENTO (PARQUET)
+# ============================================
+
+COMPRESSAO_PARQUET = os.environ.get('PARQUET_COMPRESSAO', 'zstd')
+LINHAS_POR_GRUPO = int(os.environ.get('PARQUET_LINHAS_POR_GRUPO', 2000))
+# Formatos enviados ao bucket; 'csv' mantém compatibilidade com quem ainda lê o formato antigo
+FORMATOS_SAIDA = [f.strip() for f in os.environ.get('FORMATOS_SAIDA', 'parquet,csv').split(',') if f.strip()]
+
+# Colunas do dataset de vídeos (ver extrair_metadados) usadas pelas etapas de classificação
+COLUNAS_VIDEOS = [
+    'video_id', 'url', 'title', 'description', 'channel_id', 'channel_name', 'published_at',
+    'thumbnail', 'viewCount', 'likeCount', 'commentCount', 'defaultAudioLanguage', 'duration', 'tags',
+]
+
+
+def salvar_parquet(df, caminho):
+    """Grava o DataFrame em Parquet comprimido, em row groups para leitura por intervalo"""
+    if os.path.dirname(caminho):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(tabela, caminho, compression=COMPRESSAO_PARQUET, row_group_size=LINHAS_POR_GRUPO)
+
+
+def ler_intervalo_parquet(caminho, start=0, end=None, colunas=None):
+    """Lê só as linhas [start, end) e as colunas pedidas, tocando apenas os row groups necessários"""
+    arquivo = pq.ParquetFile(caminho)
+    total = arquivo.metadata.num_rows
+    end = total if end is None else min(end, total)
+    if colunas is not None:
+        existentes = set(arquivo.schema_arrow.names)
+        colunas = [c for c in colunas if c in existentes]
+
+    grupos, inicio_primeiro, offset = [], None, 0
+    for i in range(arquivo.num_row_groups):
+        linhas = arquivo.metadata.row_group(i).num_rows
+        if offset < end and offset + linhas > start:
+            grupos.append(i)
+            if inicio_primeiro is None:
+                inicio_primeiro = offset
+        offset += linhas
+
+    if not grupos:
+        return arquivo.schema_arrow.empty_table().select(colunas or arquivo.schema_arrow.names).to_pandas()
+
+    tabela = arquivo.read_row_groups(grupos, columns=colunas)
+    tabela = tabela.slice(start - inicio_primeiro, end - start)
+    df = tabela.to_pandas()
+    # Mantém o índice posicional do dataset completo, como o iloc fazia
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def caminho_parquet(caminho):
+    return os.path.splitext(caminho)[0] + '.parquet'
+
+
+def carregar_videos(caminho, start=0, end=None, colunas=COLUNAS_VIDEOS):
+    """Carrega o intervalo do dataset de vídeos, preferindo a versão Parquet quando existir"""
+    if not caminho.endswith('.parquet') and os.path.exists(caminho_parquet(caminho)):
+        caminho = caminho_parquet(caminho)
+
+    if caminho.endswith('.parquet'):
+        df = ler_intervalo_parquet(caminho, start, end, colunas)
+    else:
+        df = pd.read_csv(caminho, sep=';', encoding='utf-8')
+        df = df[[c for c in colunas if c in df.columns]] if colunas is not None else df
+        df = df.iloc[start:end]
+
+    print(f"Vídeos carregados de {caminho}: {len(df)} (linhas {start}–{start + len(df)})")
+    return df
+
+
+def exportar_csv(df, caminho):
+    """Exportação no formato antigo (';', utf-8)"""
+    df.to_csv(caminho, index=False, sep=';', encoding='utf-8')
+
+
+def converter_csv_para_parquet(caminho_csv, caminho_saida=None):
+    """Converte um dataset CSV existente (';') para Parquet ao lado do original"""
+    caminho_saida = caminho_saida or caminho_parquet(caminho_csv)
+    df = pd.read_csv(caminho_csv, sep=';', encoding='utf-8')
+    salvar_parquet(df, caminho_saida)
+    antes, depois = os.path.getsize(caminho_csv), os.path.getsize(caminho_saida)
+    print(f"✓ {caminho_csv} → {caminho_saida}: {len(df)} linhas, "
+          f"{antes / 1e6:.1f} MB → {depois / 1e6:.1f} MB")
+    return caminho_saida
+
+
+# ============================================
+# ENVIO AO GCS (STREAMING)
+# ============================================
+
+# Diretório local que imita o bucket (bucket/arquivo) — para testes sem credenciais
+GCS_DIRETORIO_LOCAL = os.environ.get('GCS_DIRETORIO_LOCAL')
+# Tamanho de cada pedaço da sessão de upload resumível (múltiplo de 256 KiB)
+TAMANHO_CHUNK_UPLOAD = int(os.environ.get('GCS_CHUNK_MB', 8)) * 1024 * 1024
+# Envia também o resultado intermediário de cada etapa (retomada de onde parou, inspeção)
+ENVIAR_ETAPAS = os.environ.get('ENVIAR_ETAPAS', '0') == '1'
+
+TIPOS_CONTEUDO = {
+    'parquet': 'application/vnd.apache.parquet',
+    'csv': 'text/csv',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def obter_cliente_storage():
+    """Um único cliente do Storage por processo (credenciais lidas uma vez)"""
+    creds_dict = json.loads(os.environ['STORAGE_KEY'])
+    credentials = service_account.Credentials.from_service_account_info(creds_dict)
+    return storage.Client(credentials=credentials, project=credentials.project_id)
+
+
+def abrir_destino(bucket_name, filename):
+    """Arquivo binário de escrita: sessão resumível no GCS ou arquivo no diretório local"""
+    formato = filename.rsplit('.', 1)[-1]
+    if GCS_DIRETORIO_LOCAL:
+        caminho = os.path.join(GCS_DIRETORIO_LOCAL, bucket_name, filename)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        return open(caminho, 'wb')
+
+    blob = obter_cliente_storage().bucket(bucket_name).blob(filename)
+    return blob.open(
+        'wb',
+        chunk_size=TAMANHO_CHUNK_UPLOAD,
+        content_type=TIPOS_CONTEUDO.get(formato, 'application/octet-stream'),
+        ignore_flush=True,
+    )
+
+
+def escrever_parquet_streaming(df, destino):
+    """Codifica e comprime um row group por vez direto no destino"""
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(destino, schema, compression=COMPRESSAO_PARQUET) as writer:
+        for inicio in range(0, len(df), LINHAS_POR_GRUPO):
+            parte = df.iloc[inicio:inicio + LINHAS_POR_GRUPO]
+            writer.write_table(pa.Table.from_pandas(parte, schema=schema, preserve_index=False))
+
+
+def escrever_csv_streaming(df, destino):
+    """CSV (';') em blocos: só um bloco codificado fica em memória"""
+    for inicio in range(0, len(df), LINHAS_POR_GRUPO):
+        parte = df.iloc[inicio:inicio + LINHAS_POR_GRUPO]
+        destino.write(parte.to_csv(index=False, sep=';', header=(inicio == 0)).encode('utf-8'))
+    if df.empty:
+        destino.write(df.to_csv(index=False, sep=';').encode('utf-8'))
+
+
+def upload_df_to_gcs_raw(df, bucket_name, filename):
+    """Envia o DataFrame ao bucket em streaming (Parquet ou CSV, pela extensão)"""
+    with abrir_destino(bucket_name, filename) as destino:
+        if filename.endswith('.parquet'):
+            escrever_parquet_streaming(df, destino)
+        else:
+            escrever_csv_streaming(df, destino)
+
+    print(f"Arquivo '{filename}' enviado com sucesso para o bucket '{bucket_name}'.")
+
+
+def enviar_etapa(df, etapa, start, end, bucket_name='video_bruto'):
+    """Upload incremental do resultado de uma etapa, quando ENVIAR_ETAPAS=1"""
+    if ENVIAR_ETAPAS:
+        upload_df_to_gcs_raw(df, bucket_name, f"etapas/{start}_{end}/{etapa}.parquet")
+
+
+# ============================================
+# FILA DE TRABALHO (LEASES)
+# ============================================
+
+# 'gs://bucket/objeto.json' ou caminho de um arquivo SQLite local; vazio = intervalo fixo START/END
+FILA_TRABALHO = os.environ.get('FILA_TRABALHO', '')
+TAMANHO_LOTE_FILA = int(os.environ.get('FILA_TAMANHO_LOTE', 50))
+TTL_LEASE = int(os.environ.get('FILA_TTL_LEASE', 600))
+# Um lote que falhou (ou derrubou o trabalhador) tantas vezes deixa de ser distribuído
+MAX_TENTATIVAS_LOTE = 3
+# Falhas seguidas (em lotes diferentes) que indicam problema no próprio trabalhador, não no lote
+MAX_FALHAS_SEGUIDAS_TRABALHADOR = 3
+# Gravações da fila no GCS perdidas para outro trabalhador (precondição de generation) antes de desistir
+MAX_CONFLITOS_FILA = 12
+# Onde os exports de rendimento compartilhados entre trabalhadores são baixados
+DIRETORIO_ESTADO_COMPARTILHADO = '.cache/estado'
+ID_TRABALHADOR = os.environ.get('ID_TRABALHADOR') or f"{os.uname().nodename}-{os.getpid()}"
+CAMINHO_VIDEOS = 'datasets/videos_coletados_0_15000.csv'
+
+
+class FilaLotes(abc.ABC):
+    """Fila de lotes [inicio, fim) do dataset de vídeos, distribuídos por lease.
+
+    Todo o estado é um documento JSON; cada backend só precisa aplicar uma
+    função ao documento de forma atômica (_alterar). A função devolve
+    (novo_estado, resultado) — novo_estado None significa nada a gravar.
+    """
+
+    @abc.abstractmethod
+    def _alterar(self, funcao):
+        """Aplica `funcao` ao documento atual de forma atômica e devolve o resultado dela"""
+
+    def criar(self, start, end, tamanho_lote=TAMANHO_LOTE_FILA):
+        """Cria os lotes na primeira chamada; as seguintes reaproveitam a fila existente"""
+        def funcao(estado):
+            if estado is not None:
+                return None, False
+            lotes = [
+                {'id': i, 'inicio': inicio, 'fim': min(inicio + tamanho_lote, end),
+                 'estado': 'pendente', 'dono': None, 'expira_em': 0, 'tentativas': 0}
+                for i, inicio in enumerate(range(start, end, tamanho_lote))
+            ]
+            return {'lotes': lotes}, True
+        return self._alterar(funcao)
+
+    def reivindicar(self, dono, ttl=TTL_LEASE, evitar=()):
+        """Próximo lote pendente (ou com lease vencido) para este trabalhador.
+
+        Lotes em `evitar` (que já falharam com ele) só voltam quando não houver outro.
+        """
+        def funcao(estado):
+            agora = time.time()
+            alterado = False
+            for lote in sorted(estado['lotes'], key=lambda lote: lote['id'] in evitar):
+                vencido = lote['estado'] == 'em_uso' and lote['expira_em'] < agora
+                if vencido and lote['tentativas'] >= MAX_TENTATIVAS_LOTE:
+                    lote['estado'] = 'falhou'
+                    alterado = True
+                elif lote['estado'] == 'pendente' or vencido:
+                    lote.update(estado='em_uso', dono=dono, expira_em=agora + ttl, tentativas=lote['tentativas'] + 1)
+                    return estado, dict(lote)
+            return (estado if alterado else None), None
+        return self._alterar(funcao)
+
+    def renovar(self, lote_id, dono, ttl=TTL_LEASE):
+        """Estende o lease; False se o lote já não pertence a este trabalhador"""
+        def funcao(estado):
+            lote = estado['lotes'][lote_id]
+            if lote['estado'] != 'em_uso' or lote['dono'] != dono:
+                return None, False
+            lote['expira_em'] = time.time() + ttl
+            return estado, True
+        return self._alterar(funcao)
+
+    def concluir(self, lote_id, dono):
+        # Vale mesmo com o lease vencido: o resultado já foi enviado
+        def funcao(estado):
+            estado['lotes'][lote_id].update(estado='concluido', dono=dono, expira_em=0)
+            return estado, True
+        return self._alterar(funcao)
+
+    def liberar(self, lote_id, dono):
+        """Devolve o lote à fila (erro no trabalhador), ou o descarta após MAX_TENTATIVAS_LOTE"""
+        def funcao(estado):
+            lote = estado['lotes'][lote_id]
+            if lote['estado'] != 'em_uso' or lote['dono'] != dono:
+                return None, False
+            esgotado = lote['tentativas'] >= MAX_TENTATIVAS_LOTE
+            lote.update(estado='falhou' if esgotado else 'pendente', dono=None, expira_em=0)
+            return estado, True
+        return self._alterar(funcao)
+
+    def baixar_checkpoints(self, lote, diretorio):
+        """Traz os journals do lote gravados por outro trabalhador (no backend local o diretório já é compartilhado)"""
+
+    def enviar_checkpoints(self, lote, diretorio):
+        """Publica os journals do lote para quem herdar o lease"""
+
+    def baixar_estado(self, diretorio):
+        """Caminhos dos exports de rendimento publicados pelos trabalhadores (nenhum no backend local,
+        em que o SQLite já é compartilhado)"""
+        return []
+
+    def enviar_estado(self, caminho):
+        """Publica um export de rendimento deste trabalhador para os próximos"""
+
+    def resumo(self):
+        def funcao(estado):
+            contagem = {}
+            for lote in (estado or {'lotes': []})['lotes']:
+                contagem[lote['estado']] = contagem.get(lote['estado'], 0) + 1
+            return None, contagem
+        return self._alterar(funcao)
+
+
+class FilaSQLite(FilaLotes):
+    """Backend local: o documento fica em um arquivo SQLite (BEGIN IMMEDIATE serializa os processos)"""
+
+    def __init__(self, caminho):
+        if os.path.dirname(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS fila (id INTEGER PRIMARY KEY CHECK (id = 1), dados TEXT NOT NULL)")
+
+    def _alterar(self, funcao):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                linha = self.conn.execute("SELECT dados FROM fila WHERE id = 1").fetchone()
+                novo, resultado = funcao(json.loads(linha[0]) if linha else None)
+                if novo is not None:
+                    self.conn.execute("INSERT OR REPLACE INTO fila (id, dados) VALUES (1, ?)", (json.dumps(novo),))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return resultado
+
+
+class FilaGCS(FilaLotes):
+    """Backend remoto: objeto JSON no GCS, gravado com precondição de generation (compare-and-swap)"""
+
+    def __init__(self, bucket_name, nome):
+        self.bucket = obter_cliente_storage().bucket(bucket_name)
+        self.nome = nome
+
+    def _alterar(self, funcao):
+        for tentativa in range(MAX_CONFLITOS_FILA):
+            blob = self.bucket.get_blob(self.nome)
+            geracao = blob.generation if blob else 0
+            try:
+                estado = json.loads(blob.download_as_bytes(if_generation_match=geracao)) if blob else None
+                novo, resultado = funcao(estado)
+                if novo is not None:
+                    # generation 0 = o objeto ainda não pode existir
+                    self.bucket.blob(self.nome).upload_from_string(
+                        json.dumps(novo), content_type='application/json', if_generation_match=geracao,
+                    )
+                return resultado
+            except gexc.PreconditionFailed:
+                # Outro trabalhador alterou a fila entre a leitura e a escrita
+                time.sleep(random.uniform(0.2, 1.0) * (tentativa + 1))
+        raise RuntimeError(f"Fila {self.nome}: concorrência excessiva, desistindo")
+
+    def _prefixo_checkpoints(self, lote):
+        return f"{self.nome}.checkpoints/{lote['inicio']}_{lote['fim']}/"
+
+    def baixar_checkpoints(self, lote, diretorio):
+        # Os journals ficam junto da fila: o lote vai para outro trabalhador sem perder o progresso
+        os.makedirs(diretorio, exist_ok=True)
+        for blob in self.bucket.list_blobs(prefix=self._prefixo_checkpoints(lote)):
+            caminho = os.path.join(diretorio, os.path.basename(blob.name))
+            if not os.path.exists(caminho) or os.path.getsize(caminho) < blob.size:
+                blob.download_to_filename(caminho)
+                print(f"  ↓ Checkpoint herdado: {os.path.basename(blob.name)}")
+
+    def enviar_checkpoints(self, lote, diretorio):
+        for caminho in glob.glob(os.path.join(diretorio, '*.jsonl')):
+            self.bucket.blob(self._prefixo_checkpoints(lote) + os.path.basename(caminho)).upload_from_filename(caminho)
+
+    def _prefixo_estado(self):
+        # Ao lado das filas, e não de uma fila: o rendimento vale para todos os intervalos
+        return posixpath.join(posixpath.dirname(self.nome), 'estado') + '/'
+
+    def baixar_estado(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        caminhos = []
+        for blob in self.bucket.list_blobs(prefix=self._prefixo_estado()):
+            caminho = os.path.join(diretorio, os.path.basename(blob.name))
+            if not os.path.exists(caminho) or os.path.getsize(caminho) != blob.size:
+                blob.download_to_filename(caminho)
+            caminhos.append(caminho)
+        return caminhos
+
+    def enviar_estado(self, caminho):
+        self.bucket.blob(self._prefixo_estado() + os.path.basename(caminho)).upload_from_filename(caminho)
+
+
+def abrir_fila(destino):
+    """gs://bucket/objeto → FilaGCS (ou SQLite sob GCS_DIRETORIO_LOCAL); caminho → FilaSQLite"""
+    if destino.startswith('gs://'):
+        bucket_name, nome = destino[len('gs://'):].split('/', 1)
+        if GCS_DIRETORIO_LOCAL:
+            return FilaSQLite(os.path.join(GCS_DIRETORIO_LOCAL, bucket_name, nome + '.sqlite'))
+        return FilaGCS(bucket_name, nome)
+    return FilaSQLite(destino)
+
+
+class RenovadorLease:
+    """Renova o lease do lote em segundo plano enquanto ele é processado (e publica os journals)"""
+
+    def __init__(self, fila, lote, dono, ttl=TTL_LEASE, diretorio_checkpoint=None):
+        self.fila = fila
+        self.lote = lote
+        self.dono = dono
+        self.ttl = ttl
+        self.diretorio_checkpoint = diretorio_checkpoint
+        self.parar = threading.Event()
+        self.thread = threading.Thread(target=self._renovar, daemon=True)
+
+    def _renovar(self):
+        while not self.parar.wait(self.ttl / 3):
+            try:
+                if not self.fila.renovar(self.lote['id'], self.dono, self.ttl):
+                    print(f"  ⚠ Lease do lote {self.lote['id']} perdido (outro trabalhador pode reprocessá-lo)")
+                    return
+                if self.diretorio_checkpoint:
+                    self.fila.enviar_checkpoints(self.lote, self.diretorio_checkpoint)
+            except Exception as e:
+                print(f"  ⚠ Falha ao renovar lease do lote {self.lote['id']}: {e}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.parar.set()
+        self.thread.join()
+
+
+def processar_fila(fila, caminho_videos, gemini_api_key, dono=ID_TRABALHADOR):
+    """Reivindica e classifica lotes até a fila esvaziar; devolve os DataFrames acumulados"""
+    filtrados, classificados, finais = [], [], []
+    falhas_seguidas = 0
+    falhados = set()
+    while True:
+        lote = fila.reivindicar(dono, evitar=falhados)
+        if lote is None:
+            break
+        inicio, fim = lote['inicio'], lote['fim']
+        print(f"\n↻ {dono}: lote {lote['id']} (linhas {inicio}–{fim}, tentativa {lote['tentativas']})")
+        checkpoint = diretorio_checkpoint_intervalo(inicio, fim)
+        try:
+            fila.baixar_checkpoints(lote, checkpoint)
+            with RenovadorLease(fila, lote, dono, diretorio_checkpoint=checkpoint):
+                df_filtrado = carregar_videos(caminho_videos, inicio, fim)
+                df_classificado, df_final = classificar_intervalo(df_filtrado, gemini_api_key, inicio, fim)
+        except Exception as e:
+            try:
+                fila.enviar_checkpoints(lote, checkpoint)
+            except Exception as erro_envio:
+                print(f"  ⚠ Falha ao publicar os checkpoints do lote {lote['id']}: {erro_envio}")
+            # O lote volta para a fila (ou é descartado após MAX_TENTATIVAS_LOTE) e o trabalhador segue
+            fila.liberar(lote['id'], dono)
+            falhados.add(lote['id'])
+            falhas_seguidas += 1
+            print(f"  ❌ Lote {lote['id']} falhou ({falhas_seguidas}/{MAX_FALHAS_SEGUIDAS_TRABALHADOR} seguidas): {e}")
+            if falhas_seguidas >= MAX_FALHAS_SEGUIDAS_TRABALHADOR:
+                raise
+            continue
+        falhas_seguidas = 0
+        fila.concluir(lote['id'], dono)
+        filtrados.append(df_filtrado)
+        classificados.append(df_classificado)
+        finais.append(df_final)
+
+    print(f"\nFila: {fila.resumo()}")
+    juntar = lambda partes: pd.concat(partes) if partes else pd.DataFrame()
+    return juntar(filtrados), juntar(classificados), juntar(finais)
+
+
+# ============================================
+# PIPELINE PRINCIPAL
+# ============================================
+
+# Colunas lidas pelas etapas de LLM
+COLUNAS_ETAPAS = ['video_id', 'title', 'description', 'channel_name']
+
+
+def classificar_intervalo(df_filtrado, gemini_api_key, start, end):
+    """Etapas de LLM sobre um intervalo do dataset, com upload do resultado"""
+
+    # 6. Classificar 100 vídeos
+    print(f"\n{'=' * 70}")
+    print("CLASSIFICAÇÃO COM GEMINI")
+    print("=" * 70)
+
+    checkpoint = diretorio_checkpoint_intervalo(start, end)
+    metricas = iniciar_metricas(f"{start}_{end}")
+    metricas.registrar_funil('entrada', len(df_filtrado))
+
+    # Repetidos e quase duplicados: só o representante de cada cluster passa pelo LLM
+    df_filtrado, clusters = deduplicar_videos(df_filtrado)
+    representantes = clusters == df_filtrado['video_id'].astype(str)
+    metricas.registrar_funil('representantes', representantes.sum())
+
+    # As etapas de LLM só carregam estas colunas; as demais voltam pelo índice no fim
+    df_etapas = df_filtrado.loc[representantes, COLUNAS_ETAPAS]
+
+    # Descrições sem links, CTAs e rodapés do canal: menos tokens em todos os prompts
+    if LIMPEZA_DESCRICOES_ATIVA:
+        df_etapas = limpar_descricoes(df_etapas)
+        metricas.registrar_funil('tokens_descricao_economizados', df_etapas['tokens_economizados'].sum())
+
+    # Canais de rendimento histórico baixo ficam de fora ou amostrados; os melhores vão primeiro
+    if RENDIMENTO_CANAIS_ATIVO:
+        df_etapas = agendar_por_rendimento(df_etapas, df_filtrado.loc[df_etapas.index, 'channel_id'])
+    alcance = pd.Series(0, index=df_etapas.index)
+    # Falhas transitórias da API não dizem nada do canal: ficam fora do rendimento
+    com_erro = pd.Series(False, index=df_etapas.index)
+
+    # Vídeos obviamente inválidos não chegam ao LLM (seriam "invalido" de qualquer forma)
+    df_para_contextualizar = df_etapas
+    if PREFILTRO_ATIVO:
+        rotas = prefiltrar_videos(df_filtrado.loc[df_etapas.index])
+        df_para_contextualizar = df_etapas[rotas != 'pular']
+    metricas.registrar_funil('apos_prefiltro', len(df_para_contextualizar))
+    alcance.loc[df_para_contextualizar.index] = 1
+
+    fundido = MODO_CLASSIFICACAO == 'fundido'
+    if fundido:
+        # Sinopse e classificação na mesma resposta: uma chamada por vídeo em vez de duas
+        df_contextualizado = contextualizar_e_classificar(df_para_contextualizar, gemini_api_key, diretorio_checkpoint=checkpoint)
+    else:
+        df_contextualizado = contextualizar_videos_groq(df_para_contextualizar, gemini_api_key, limite=100, diretorio_checkpoint=checkpoint)
+
+    enviar_etapa(df_contextualizado, 'contexto', start, end)
+
+    df_contextualizado['contexto'] = df_contextualizado['contexto'].astype(str).str.strip().str.lower()
+    metricas.registrar_funil('contexto_invalido', (df_contextualizado['contexto'] == 'invalido').sum())
+    metricas.registrar_funil('contexto_erro', (df_contextualizado['contexto'] == 'erro').sum())
+    com_erro.loc[df_contextualizado.index[df_contextualizado['contexto'] == 'erro']] = True
+
+    df_contextualizado = df_contextualizado[~df_contextualizado['contexto'].isin(['invalido','erro'])]
+    metricas.registrar_funil('contextualizados', len(df_contextualizado))
+    alcance.loc[df_contextualizado.index] = 2
+    
+    if fundido:
+        df_classificado = df_contextualizado
+    else:
+        df_classificado = classificar_videos_groq(df_contextualizado, gemini_api_key, limite=100, diretorio_checkpoint=checkpoint)
+
+    df_classificado = expandir_classificacao(df_classificado)
+    metricas.registrar_funil('classificacao_ok', (df_classificado['status_parse'] == 'ok').sum())
+    alcance.loc[df_classificado.index[df_classificado['status_parse'] == 'ok']] = 3
+    com_erro.loc[df_classificado.index[df_classificado['status_parse'] == 'erro']] = True
+
+    enviar_etapa(df_classificado, 'classificacao', start, end)
+
+    df_classificado_trilha = classificar_trilhas_groq(df_classificado,gemini_api_key,diretorio_checkpoint=checkpoint,combinar_segundo_topico=TRILHA_COMBINADA)
+
+    enviar_etapa(df_classificado_trilha, 'trilha', start, end)
+
+    df_classificado_trilha['topico_trilha'] = df_classificado_trilha['topico_trilha'].astype(str).str.strip().str.lower()
+    for descarte in ('invalido', 'sem_trilha', 'erro'):
+        metricas.registrar_funil(f'topico_{descarte}', (df_classificado_trilha['topico_trilha'] == descarte).sum())
+    com_erro.loc[df_classificado_trilha.index[df_classificado_trilha['topico_trilha'] == 'erro']] = True
+
+    df_classificado_trilha = df_classificado_trilha[~df_classificado_trilha['topico_trilha'].isin(['invalido','sem_trilha','erro'])]
+    
+    df_classificado_trilha = classificar_segundo_topico(df_classificado_trilha,gemini_api_key,diretorio_checkpoint=checkpoint)
+    alcance.loc[df_classificado_trilha.index] = 4
+    if RENDIMENTO_CANAIS_ATIVO:
+        registrar_rendimento(df_filtrado, clusters, alcance[~com_erro])
+
+    # Até aqui o funil conta só representantes; os membros propagados vêm em passos à parte
+    metricas.registrar_funil('com_topico', len(df_classificado_trilha))
+    metricas.registrar_funil('segundo_topico', (df_classificado_trilha['topico_duplicado'] != 'sem_trilha').sum())
+
+    # Os membros de cada cluster herdam os rótulos do representante (cluster_id para auditoria)
+    df_classificado_trilha = propagar_rotulos(
+        df_filtrado, clusters, df_classificado_trilha.drop(columns=COLUNAS_ETAPAS + ['descricao_bruta'], errors='ignore'))
+    metricas.registrar_funil('rotulos_propagados', (df_classificado_trilha['cluster_id'] != df_classificado_trilha['video_id'].astype(str)).sum())
+    metricas.registrar_funil('saida_com_propagados', len(df_classificado_trilha))
+    
+    # 7. Salvar resultado final
+    for formato in FORMATOS_SAIDA:
+        output_filename = f"classificados_{start}_{end}.{formato}"
+        upload_df_to_gcs_raw(df_classificado_trilha, 'video_bruto', output_filename)
+    print(f"\n✅ Resultado final salvo: classificados_{start}_{end}")
+    emitir_metricas()
+
+    return df_classificado, df_classificado_trilha
+
+
+def executar_teste(csv_path, youtube_api_key, gemini_api_key, start, end):
+    """Executa teste completo"""
+    
+    # print("=" * 70)
+    # print("INICIANDO TESTE")
+    # print("=" * 70)
+    
+    # 1. Carregar 60 canais
+    # df_canais = carregar_canais(csv_path, start=start, end=end)
+    
+    # 2-3. Planejar a coleta dentro da cota das chaves e buscar os vídeos (em paralelo) em um DataFrame
+    # youtube_api_keys = [k.strip() for k in youtube_api_key.split(',') if k.strip()]
+    # plano, adiados = planejar_coleta(df_canais, youtube_api_keys, data_minima='2021-01-01', incremental=True)
+    # df_videos = coletar_com_plano(plano, data_minima='2021-01-01', incremental=True)
+    # print(f"\n{'=' * 70}")
+    # print(f"Total de vídeos coletados: {len(df_videos)}")
+    
+    # 4. Filtrar por data (junho/2024+)
+    # df_filtrado = filtrar_por_data(df_videos, data_minima='2021-01-01')
+    
+    # 5. Salvar intermediário
+    # salvar_parquet(df_filtrado, 'datasets/videos_coletados_1000.parquet')
+    # print(f"✅ Vídeos salvos: videos_coletados_terca.csv")
+    # obter_marcas_canais().confirmar()
+    
+    if FILA_TRABALHO:
+        # Lotes pequenos reivindicados sob demanda em vez de um intervalo fixo por job
+        fila = abrir_fila(FILA_TRABALHO)
+        if fila.criar(start, end):
+            print(f"Fila criada: linhas {start}–{end} em lotes de {TAMANHO_LOTE_FILA}")
+        # O rendimento dos canais é compartilhado pelo GCS (só o cache do LLM é local a cada trabalhador)
+        inicio_execucao = time.time()
+        if RENDIMENTO_CANAIS_ATIVO:
+            for caminho in fila.baixar_estado(DIRETORIO_ESTADO_COMPARTILHADO):
+                obter_rendimento_canais().importar(caminho)
+        df_filtrado, df_classificado, df_classificado_trilha = processar_fila(fila, CAMINHO_VIDEOS, gemini_api_key)
+        obter_cache().exportar(f".cache/llm_cache_{ID_TRABALHADOR}.jsonl")
+        if RENDIMENTO_CANAIS_ATIVO:
+            # Só o que esta execução registrou: os exports no GCS não repetem o histórico importado
+            caminho = f".cache/rendimento_canais_{ID_TRABALHADOR}.jsonl"
+            obter_rendimento_canais().exportar(caminho, desde=inicio_execucao)
+            fila.enviar_estado(caminho)
+    else:
+        # Lê só o intervalo deste shard (e só as colunas usadas) quando houver a versão Parquet
+        df_filtrado = carregar_videos(CAMINHO_VIDEOS, start, end)
+        df_classificado, df_classificado_trilha = classificar_intervalo(df_filtrado, gemini_api_key, start, end)
+        obter_cache().exportar(f".cache/llm_cache_{start}_{end}.jsonl")
+        if RENDIMENTO_CANAIS_ATIVO:
+            obter_rendimento_canais().exportar(f".cache/rendimento_canais_{start}_{end}.jsonl")
+    
+    # 8. Resumo
+    print(f"\n{'=' * 70}")
+    print("RESUMO")
+    print("=" * 70)
+    print(f"Canais processados: 60")
+    # print(f"Vídeos totais: {len(df_videos)}")
+    print(f"Vídeos desde jun/2024: {len(df_filtrado)}")
+    print(f"Vídeos classificados: {len(df_classificado)}")
+    
+    return df_classificado_trilha # mudar depois para df_classificado
+
+# ============================================
+# EXECUTAR
+# ============================================
+
+if __name__ == "__main__":
+
+    # python gemini_classification.py converter <arquivo.csv> [...]
+    if len(sys.argv) > 2 and sys.argv[1] == 'converter':
+        for caminho in sys.argv[2:]:
+            converter_csv_para_parquet(caminho)
+        sys.exit(0)
+    
+    # Configurações
+    CSV_PATH = 'datasets/canais_tech_BR.csv'
+    # Várias chaves separadas por vírgula em YOUTUBE_API_KEYS dividem a cota da coleta
+    YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEYS') or os.environ['API_KEY']
+    # Várias chaves separadas por vírgula em GEMINI_API_KEYS formam um pool compartilhado
+    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEYS') or os.environ['GEMINI_API_KEY']
+
+    START = int(os.environ['START_INDEX'])
+    END   = int(os.environ['END_INDEX'])
+    
+    # GROQ_API_KEY = os.environ['GROQ_API_KEY']
+    # Executar teste
+    df_resultado = executar_teste(CSV_PATH, YOUTUBE_API_KEY, GEMINI_API_KEY, START, END)
+    
+    # Ver alguns resultados
+    print("\n" + "=" * 70)
+    print("AMOSTRA DOS RESULTADOS")
+    print("=" * 70)
+
+    if not df_resultado.empty:
+        print(df_resultado[['title', 'channel_name', 'published_at', 'viewCount']].head(10))
+
+
+
+
+
+
+
@@ -0,0 +1,39 @@
+import itertools
+
+import gemini_classification as g
+
+
+def test_despejo_remove_as_menos_usadas(tmp_path, monkeypatch):
+    relogio = itertools.count()
+    monkeypatch.setattr(g.time, 'time', lambda: float(next(relogio)))
+    cache = g.CacheLLM(str(tmp_path / 'cache.sqlite'), max_mb=300 / (1024 * 1024))
+    for chave in 'abc':
+        cache.gravar(chave, chave * 100)
+    # 'a' é a mais antiga gravada, mas a mais recente lida
+    assert cache.obter('a') == 'a' * 100
+    cache.gravar('d', 'd' * 100)
+
+    cache._despejar()
+
+    # 400 bytes para um limite de 300: sai o necessário para ficar abaixo de 90% (270), das menos usadas
+    assert [cache.obter(chave) is not None for chave in 'abcd'] == [True, False, False, True]
+
+
+def test_despejo_a_cada_100_gravacoes(tmp_path):
+    cache = g.CacheLLM(str(tmp_path / 'cache.sqlite'), max_mb=1000 / (1024 * 1024))
+    for i in range(99):
+        cache.gravar(f'k{i}', 'x' * 100)
+    assert cache.conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0] == 99
+
+    cache.gravar('k99', 'x' * 100)
+    assert cache.conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0] <= 900
+
+
+def test_exportar_e_importar_preserva_as_respostas(tmp_path):
+    origem = g.CacheLLM(str(tmp_path / 'a.sqlite'))
+    origem.gravar('k', 'resposta com acentuação')
+    origem.exportar(str(tmp_path / 'cache.jsonl'))
+
+    destino = g.CacheLLM(str(tmp_path / 'b.sqlite'))
+    destino.importar(str(tmp_path / 'cache.jsonl'))
+    assert destino.obter('k') == 'resposta com acentuação'
@@ -0,0 +1,54 @@
+import json
+
+import gemini_classification as g
+
+
+def item(video_id, **campos):
+    base = {'video_id': video_id, 'ferramenta_principal': 'REACT', 'tecnologia_base': 'JAVASCRIPT',
+            'classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes': False,
+            'cargo': 'front-end', 'tipo_video': 'aula'}
+    base.update(campos)
+    return base
+
+
+def test_resposta_do_lote_validada_item_a_item():
+    incompleto = item('v2')
+    del incompleto['cargo']
+    texto = '```json\n' + json.dumps([item('v1'), incompleto, item('intruso'), 'lixo']) + '\n```'
+
+    itens = g.separar_resposta_lote(texto, ['v1', 'v2'])
+
+    assert list(itens) == ['v1']
+    assert json.loads(itens['v1'])['ferramenta_principal'] == 'REACT'
+    assert 'video_id' not in json.loads(itens['v1'])
+
+
+def test_resposta_ilegivel_descarta_o_lote():
+    assert g.separar_resposta_lote('não consegui classificar', ['v1']) == {}
+    assert g.separar_resposta_lote(json.dumps(item('v1')), ['v1']) == {}
+
+
+class ExecutorFalso:
+    """Responde o lote só com o primeiro vídeo; os envios individuais viram uma classificação simples"""
+
+    def __init__(self):
+        self.etapas = []
+
+    def executar(self, modelo, prompts, video_ids, rotulo=None, chaves_cache=None, journal=None, etapa=None):
+        self.etapas.append((etapa, list(video_ids)))
+        if etapa == 'classificacao_lote':
+            return [json.dumps([item('v1')]) for _ in prompts]
+        return [json.dumps(item(v, ferramenta_principal='VUE')) for v in video_ids]
+
+
+def test_itens_rejeitados_no_lote_vao_individualmente(monkeypatch):
+    executor = ExecutorFalso()
+    monkeypatch.setattr(g, 'obter_executor', lambda chave: executor)
+    monkeypatch.setattr(g, 'suporta_cache_contexto', lambda modelo: False)
+    df = g.pd.DataFrame({'video_id': ['v1', 'v2'], 'contexto': ['sinopse 1', 'sinopse 2'], 'title': ['t1', 't2']})
+
+    resultado = g.classificar_videos_groq(df, 'chave', tamanho_lote=10)
+
+    assert executor.etapas == [('classificacao_lote', ['lote 1']), ('classificacao', ['v2'])]
+    ferramentas = [json.loads(c)['ferramenta_principal'] for c in resultado['classificacao_gemini']]
+    assert ferramentas == ['REACT', 'VUE']
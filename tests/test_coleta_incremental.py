@@ -0,0 +1,90 @@
+import gemini_classification as g
+
+
+class Transporte:
+    def __init__(self, falhas=0):
+        self.falhas = falhas
+
+    def request(self, *args, **kwargs):
+        self.falhas -= 1
+        return 503 if self.falhas >= 0 else 200
+
+
+class Requisicao:
+    """Imita HttpRequest: uma tentativa por `http.request`, retentando enquanto o transporte falha"""
+
+    def __init__(self, resposta, falhas=0):
+        self.resposta = resposta
+        self.headers = {}
+        self.http = Transporte(falhas)
+
+    def execute(self, http=None, num_retries=0):
+        for _ in range(num_retries + 1):
+            if (http or self.http).request() == 200:
+                break
+        else:
+            raise RuntimeError('503')
+        if isinstance(self.resposta, Exception):
+            raise self.resposta
+        return self.resposta
+
+
+class YouTubeFalso:
+    """Uma página de uploads; videos().list falha quando `falhar_metadados`"""
+
+    def __init__(self, falhar_metadados):
+        self.falhar_metadados = falhar_metadados
+
+    def playlistItems(self):
+        return self
+
+    def videos(self):
+        return self
+
+    def list(self, part, **kwargs):
+        if part == 'contentDetails':
+            itens = [{'contentDetails': {'videoId': v, 'videoPublishedAt': f'2024-0{i}-01T00:00:00Z'}}
+                     for v, i in (('v2', 2), ('v1', 1))]
+            return Requisicao({'items': itens, 'etag': 'e1'})
+        if self.falhar_metadados:
+            return Requisicao(g.CotaYouTubeEsgotada('cota esgotada'))
+        return Requisicao({'items': []})
+
+
+def coletor(tmp_path, falhar_metadados):
+    c = g.ColetorYouTube('chave-teste')
+    c.cota = g.RegistroCotaYouTube(str(tmp_path / 'cota.sqlite'))
+    c.local.youtube = YouTubeFalso(falhar_metadados)
+    return c
+
+
+def test_marca_nao_avanca_quando_metadados_falham(tmp_path):
+    marcas = g.MarcasCanais(str(tmp_path / 'marcas.sqlite'))
+    assert coletor(tmp_path, falhar_metadados=True).coletar_canal('UCx', marcas=marcas) == []
+    marcas.confirmar()
+    assert marcas.obter('UCx') is None
+
+
+def test_marca_avanca_com_metadados(tmp_path):
+    marcas = g.MarcasCanais(str(tmp_path / 'marcas.sqlite'))
+    coletor(tmp_path, falhar_metadados=False).coletar_canal('UCx', marcas=marcas)
+    marcas.confirmar()
+    assert marcas.obter('UCx')['video_id'] == 'v2'
+
+
+def test_cada_tentativa_http_gasta_cota(tmp_path):
+    c = coletor(tmp_path, falhar_metadados=False)
+    c.executar_requisicao(Requisicao({'items': []}, falhas=2), 'videos.list')
+    assert c.cota.resumo('chave-teste')['videos.list'] == {'chamadas': 3, 'unidades': 3}
+
+
+def test_ritmo_recente_limita_canal_parado(tmp_path):
+    marcas = g.MarcasCanais(str(tmp_path / 'marcas.sqlite'))
+    antigo = (g.pd.Timestamp.now(tz='UTC') - g.pd.Timedelta(days=200)).isoformat()
+    marcas.registrar('UCparado', 'v1', antigo, 'e1')
+    marcas.confirmar()
+    canais = g.pd.DataFrame({'channel_id': ['UCparado', 'UCnovo']})
+    ritmo = g.ritmo_recente(canais, g.pd.Series([2.0, 0.5]), marcas)
+    # Sem upload há 200 dias: no máximo 1/200 por dia; sem marca, fica a média da vida toda
+    assert ritmo[0] <= 1 / 200
+    assert ritmo[1] == 0.5
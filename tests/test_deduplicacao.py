@@ -0,0 +1,30 @@
+import pandas as pd
+
+import gemini_classification as g
+
+
+def quadro(video_ids, titulos, descricoes):
+    return pd.DataFrame({'video_id': video_ids, 'title': titulos, 'description': descricoes})
+
+
+def test_quadro_vazio_nao_tem_clusters():
+    df = quadro([], [], [])
+    assert g.agrupar_quase_duplicados(df).tolist() == []
+    df_dedup, clusters = g.deduplicar_videos(df)
+    assert df_dedup.empty and clusters.empty
+
+
+def test_videos_sem_shingles_ficam_sozinhos():
+    df = quadro(['a', 'b', 'c'], ['Oi', 'Olá', 'Oi'], ['', '', ''])
+    assert g.agrupar_quase_duplicados(df).tolist() == ['a', 'b', 'c']
+
+
+def test_um_unico_video_com_shingles():
+    df = quadro(['a', 'b'], ['Curso completo de Python do zero', 'Oi'], ['aula de python para iniciantes', ''])
+    assert g.agrupar_quase_duplicados(df).tolist() == ['a', 'b']
+
+
+def test_quase_duplicados_continuam_agrupados():
+    descricao = 'nesta aula vamos ver listas tuplas e dicionarios em python com exemplos praticos'
+    df = quadro(['a', 'b'], ['Python aula 1 listas', 'Python aula 2 listas'], [descricao, descricao])
+    assert g.agrupar_quase_duplicados(df).tolist() == ['a', 'a']
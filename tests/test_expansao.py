@@ -0,0 +1,30 @@
+import json
+
+import gemini_classification as g
+
+
+def test_classificacao_expandida_em_colunas_tipadas():
+    valida = json.dumps({'ferramenta_principal': ' REACT ', 'tecnologia_base': 'JAVASCRIPT',
+                         'classificacao_com_empate_tecnico_entre_duas_ferramentas_ecossistemas_diferentes': 'true',
+                         'cargo': 'front-end', 'tipo_video': 'aula'})
+    sem_campos = json.dumps({'ferramenta_principal': 'VUE'})
+    df = g.pd.DataFrame({
+        'video_id': ['a', 'b', 'c', 'd', 'e', 'f'],
+        'classificacao_gemini': ['```json\n' + valida + '\n```', sem_campos, 'erro', '', None, '["lista"]'],
+    }, index=[10, 11, 12, 13, 14, 15])
+
+    df = g.expandir_classificacao(df)
+
+    assert df['status_parse'].tolist() == ['ok', 'ok', 'erro', 'vazio', 'vazio', 'json_invalido']
+    assert df['ferramenta_principal'].tolist() == ['REACT', 'VUE', '', '', '', '']
+    assert df.loc[10, 'cargo'] == 'front-end'
+    assert df.loc[11, 'tecnologia_base'] == ''
+    assert df['empate'].dtype == bool
+    assert df['empate'].tolist() == [True, False, False, False, False, False]
+    # O índice original é preservado para as etapas seguintes
+    assert df.index.tolist() == [10, 11, 12, 13, 14, 15]
+
+
+def test_empate_aceita_booleano_e_texto():
+    assert g._para_bool(True) and g._para_bool('Sim') and g._para_bool('1')
+    assert not g._para_bool('false') and not g._para_bool(None) and not g._para_bool(float('nan'))
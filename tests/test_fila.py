@@ -0,0 +1,141 @@
+import os
+
+import gemini_classification as g
+
+
+class BlobFalso:
+    def __init__(self, bucket, nome):
+        self.bucket = bucket
+        self.name = nome
+
+    @property
+    def size(self):
+        return len(self.bucket.objetos[self.name])
+
+    def upload_from_filename(self, caminho):
+        with open(caminho, 'rb') as f:
+            self.bucket.objetos[self.name] = f.read()
+
+    def download_to_filename(self, caminho):
+        with open(caminho, 'wb') as f:
+            f.write(self.bucket.objetos[self.name])
+
+
+class BucketFalso:
+    def __init__(self):
+        self.objetos = {}
+
+    def blob(self, nome):
+        return BlobFalso(self, nome)
+
+    def list_blobs(self, prefix):
+        return [BlobFalso(self, nome) for nome in sorted(self.objetos) if nome.startswith(prefix)]
+
+
+def fila_gcs(bucket):
+    fila = g.FilaGCS.__new__(g.FilaGCS)
+    fila.bucket = bucket
+    fila.nome = 'filas/0_100.json'
+    return fila
+
+
+def test_journal_segue_o_lote_para_outro_trabalhador(tmp_path):
+    bucket = BucketFalso()
+    lote = {'id': 0, 'inicio': 0, 'fim': 50}
+
+    primeiro = str(tmp_path / 'a' / '0_50')
+    journal = g.JournalEtapa(primeiro, 'contexto')
+    journal.registrar('v1', 'sinopse')
+    fila_gcs(bucket).enviar_checkpoints(lote, primeiro)
+    assert 'filas/0_100.json.checkpoints/0_50/contexto.jsonl' in bucket.objetos
+
+    segundo = str(tmp_path / 'b' / '0_50')
+    fila_gcs(bucket).baixar_checkpoints(lote, segundo)
+    assert g.JournalEtapa(segundo, 'contexto').obter('v1') == 'sinopse'
+
+
+def test_journal_local_mais_completo_nao_e_sobrescrito(tmp_path):
+    bucket = BucketFalso()
+    lote = {'id': 0, 'inicio': 0, 'fim': 50}
+    diretorio = str(tmp_path / '0_50')
+    journal = g.JournalEtapa(diretorio, 'contexto')
+    journal.registrar('v1', 'sinopse')
+    fila_gcs(bucket).enviar_checkpoints(lote, diretorio)
+    journal.registrar('v2', 'outra sinopse')
+
+    fila_gcs(bucket).baixar_checkpoints(lote, diretorio)
+    assert g.JournalEtapa(diretorio, 'contexto').obter('v2') == 'outra sinopse'
+    assert os.path.getsize(os.path.join(diretorio, 'contexto.jsonl')) > bucket.list_blobs('')[0].size
+
+
+def test_lote_com_erro_nao_interrompe_o_trabalhador(tmp_path, monkeypatch):
+    fila = g.FilaSQLite(str(tmp_path / 'fila.sqlite'))
+    fila.criar(0, 30, tamanho_lote=10)
+    monkeypatch.setattr(g, 'DIRETORIO_CHECKPOINTS', str(tmp_path / 'checkpoints'))
+    monkeypatch.setattr(g, 'carregar_videos', lambda caminho, inicio, fim: g.pd.DataFrame({'inicio': [inicio]}))
+
+    def classificar(df, chave, inicio, fim):
+        if inicio == 10:
+            raise RuntimeError('lote ruim')
+        return df, df
+
+    monkeypatch.setattr(g, 'classificar_intervalo', classificar)
+    _, _, finais = g.processar_fila(fila, 'videos.csv', 'chave', dono='w1')
+    assert sorted(finais['inicio']) == [0, 20]
+    assert fila.resumo() == {'concluido': 2, 'falhou': 1}
+
+
+def test_trabalhador_para_apos_falhas_seguidas(tmp_path, monkeypatch):
+    fila = g.FilaSQLite(str(tmp_path / 'fila.sqlite'))
+    fila.criar(0, 100, tamanho_lote=10)
+    monkeypatch.setattr(g, 'DIRETORIO_CHECKPOINTS', str(tmp_path / 'checkpoints'))
+    monkeypatch.setattr(g, 'carregar_videos', lambda caminho, inicio, fim: g.pd.DataFrame())
+
+    def classificar(df, chave, inicio, fim):
+        raise RuntimeError('trabalhador quebrado')
+
+    monkeypatch.setattr(g, 'classificar_intervalo', classificar)
+    try:
+        g.processar_fila(fila, 'videos.csv', 'chave', dono='w1')
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('o trabalhador deveria desistir')
+    assert fila.resumo().get('concluido', 0) == 0
+
+
+def test_fila_sem_backend_nao_instancia():
+    try:
+        g.FilaLotes()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('FilaLotes sem _alterar não deveria ser instanciável')
+
+
+def test_rendimento_compartilhado_ao_lado_das_filas(tmp_path):
+    bucket = BucketFalso()
+    primeiro = g.RendimentoCanais(str(tmp_path / 'a.sqlite'))
+    primeiro.registrar(['antigo'], ['UCa'], [4])
+    inicio = g.time.time()
+    primeiro.registrar(['novo'], ['UCa'], [1])
+    caminho = str(tmp_path / 'rendimento_canais_w1.jsonl')
+    primeiro.exportar(caminho, desde=inicio)
+    fila_gcs(bucket).enviar_estado(caminho)
+    assert list(bucket.objetos) == ['filas/estado/rendimento_canais_w1.jsonl']
+
+    segundo = g.RendimentoCanais(str(tmp_path / 'b.sqlite'))
+    for baixado in fila_gcs(bucket).baixar_estado(str(tmp_path / 'estado')):
+        segundo.importar(baixado)
+    # O export traz só o que a execução registrou, não o histórico inteiro
+    assert segundo.estatisticas().loc['UCa', 'videos'] == 1
+
+
+def test_journal_fechado_no_fim_da_etapa(tmp_path):
+    with g.abrir_journal(str(tmp_path), 'contexto') as journal:
+        journal.registrar('v1', 'sinopse')
+    assert journal.arquivo.closed
+    assert g.JournalEtapa(str(tmp_path), 'contexto').obter('v1') == 'sinopse'
+
+    with g.abrir_journal(None, 'contexto') as desligado:
+        assert desligado is None
@@ -0,0 +1,62 @@
+import gemini_classification as g
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_nenhuma_janela_de_60s_passa_do_rpm(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(g.time, 'monotonic', relogio)
+    limitador = g.LimitadorTaxa(rpm=30, tpm=10 ** 9)
+
+    liberadas = []
+    while relogio.agora < 300:
+        espera = limitador.tentar(1)
+        if espera <= 0:
+            liberadas.append(relogio.agora)
+        else:
+            relogio.agora += espera + 1e-9
+
+    for inicio in liberadas:
+        assert sum(inicio <= t < inicio + 60 for t in liberadas) <= 30
+
+
+def test_pedido_maior_que_a_rajada_cabe_sem_estourar_a_janela(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(g.time, 'monotonic', relogio)
+    # TPM 15000: a rajada inicial (1500) é menor que um único prompt de 1700 tokens
+    limitador = g.LimitadorTaxa(rpm=10 ** 6, tpm=15000)
+
+    liberadas = []
+    while relogio.agora < 600:
+        espera = limitador.tentar(1700)
+        if espera <= 0:
+            liberadas.append(relogio.agora)
+        else:
+            relogio.agora += espera + 1e-9
+
+    assert limitador.tpm.capacidade >= 1700
+    assert limitador.tpm.disponivel >= 0
+    for inicio in liberadas:
+        assert 1700 * sum(inicio <= t < inicio + 60 for t in liberadas) <= 15000
+    # No regime a reposição (15000 - 1700 por minuto) libera ~7,8 pedidos por minuto
+    assert len(liberadas) >= 7 * 10
+
+
+def test_crescer_a_rajada_desconta_da_reposicao(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(g.time, 'monotonic', relogio)
+    balde = g.TokenBucket(15000)
+
+    balde.garantir_capacidade(2000)
+    assert balde.capacidade == 2000
+    assert balde.capacidade + balde.taxa * 60 == 15000
+    # Reduzir a taxa (AIMD) mantém a rajada e só encolhe a reposição
+    balde.ajustar_taxa(7500)
+    assert balde.capacidade == 2000
+    assert balde.taxa * 60 == (15000 - 2000) / 2
@@ -0,0 +1,83 @@
+import pandas as pd
+
+import gemini_classification as g
+
+RODAPE = 'Curso completo na plataforma Academia Dev'
+
+
+def lote(video_ids):
+    return pd.DataFrame({
+        'video_id': video_ids,
+        'channel_id': ['UCcanal'] * len(video_ids),
+        'channel_name': ['Canal'] * len(video_ids),
+        'description': [f'Aula {v} sobre listas em Python\n{RODAPE}' for v in video_ids],
+    })
+
+
+def test_rodape_depende_do_lote_mas_a_chave_do_cache_nao():
+    sozinho = g.limpar_descricoes(lote(['v1']))
+    com_outros = g.limpar_descricoes(lote(['v1', 'v2', 'v3']))
+
+    assert RODAPE in sozinho['description'].iloc[0]
+    assert RODAPE not in com_outros['description'].iloc[0]
+    assert g.descricoes_para_cache(sozinho)[0] == g.descricoes_para_cache(com_outros)[0]
+
+
+def test_sem_limpeza_a_chave_usa_a_descricao():
+    df = lote(['v1'])
+    assert g.descricoes_para_cache(df) == df['description'].tolist()
+
+
+def limpar(*descricoes):
+    df = pd.DataFrame({
+        'video_id': [f'v{i}' for i in range(len(descricoes))],
+        'channel_id': [f'UC{i}' for i in range(len(descricoes))],
+        'channel_name': ['Canal'] * len(descricoes),
+        'description': list(descricoes),
+    })
+    return g.limpar_descricoes(df)['description'].tolist()
+
+
+def test_linhas_tecnicas_com_nome_de_plataforma_ficam():
+    linhas = [
+        'Neste vídeo vamos criar um bot para Discord usando Python e a biblioteca discord.py',
+        'Aprenda a integrar a API do WhatsApp com Node.js',
+        'Como aplicar descontos progressivos numa planilha do Excel usando PROCV',
+        'Login com Facebook e LinkedIn via OAuth2 no Django',
+        'Recebendo pagamentos via Pix com a API do Banco Central',
+        'Publicando mensagens num canal do Telegram e transmitindo na Twitch',
+        'Comente cada função com docstrings seguindo a PEP 257',
+        'Compartilhe estado entre componentes React com Context API',
+    ]
+    assert limpar(*linhas) == linhas
+
+
+def test_linhas_de_cta_saem():
+    descricao = '\n'.join([
+        'CRUD completo com FastAPI e PostgreSQL',
+        'Se inscreva no canal e ative o sininho!',
+        'Entre no nosso Discord: https://discord.gg/abc',
+        'Me siga no Instagram',
+        'Instagram: @fulano.dev',
+        'Link do repositório: https://github.com/fulano/crud',
+        'Use o cupom DEV10 no curso',
+        'Compartilhe com seus amigos',
+    ])
+    assert limpar(descricao) == ['CRUD completo com FastAPI e PostgreSQL']
+
+
+def test_link_no_meio_de_uma_frase_tecnica_nao_derruba_a_linha():
+    assert limpar('A documentação do discord.py em https://discordpy.readthedocs.io explica os intents') == [
+        'A documentação do discord.py em explica os intents']
+
+
+def test_assinatura_muda_com_a_configuracao_da_limpeza(monkeypatch):
+    assert g.assinatura_limpeza(lote(['v1'])) is None
+
+    limpo = g.limpar_descricoes(lote(['v1']))
+    padrao = g.assinatura_limpeza(limpo)
+    monkeypatch.setattr(g, 'LIMITE_DESCRICAO', 500)
+    assert g.assinatura_limpeza(limpo) != padrao
+    monkeypatch.undo()
+    monkeypatch.setattr(g, 'PADRAO_LINHA_CTA', g.re.compile(r'\binscreva'))
+    assert g.assinatura_limpeza(limpo) != padrao
@@ -0,0 +1,44 @@
+import gemini_classification as g
+
+
+def dataset(n=25):
+    return g.pd.DataFrame({'video_id': [f'v{i}' for i in range(n)], 'title': [f'Título {i}' for i in range(n)],
+                           'viewCount': range(n)})
+
+
+def test_intervalo_igual_ao_iloc(tmp_path, monkeypatch):
+    monkeypatch.setattr(g, 'LINHAS_POR_GRUPO', 10)
+    df = dataset()
+    caminho = str(tmp_path / 'videos.parquet')
+    g.salvar_parquet(df, caminho)
+    assert g.pq.ParquetFile(caminho).num_row_groups == 3
+
+    for start, end in ((0, 10), (5, 15), (9, 21), (20, 25), (3, None), (12, 100)):
+        lido = g.ler_intervalo_parquet(caminho, start, end)
+        esperado = df.iloc[start:end]
+        assert lido['video_id'].tolist() == esperado['video_id'].tolist()
+        assert lido.index.tolist() == esperado.index.tolist()
+
+
+def test_colunas_ausentes_ignoradas_e_intervalo_vazio(tmp_path):
+    caminho = str(tmp_path / 'videos.parquet')
+    g.salvar_parquet(dataset(), caminho)
+
+    lido = g.ler_intervalo_parquet(caminho, 2, 4, colunas=['title', 'nao_existe'])
+    assert list(lido.columns) == ['title']
+
+    vazio = g.ler_intervalo_parquet(caminho, 30, 40, colunas=['video_id'])
+    assert len(vazio) == 0 and list(vazio.columns) == ['video_id']
+
+
+def test_carregar_videos_prefere_o_parquet(tmp_path):
+    csv = str(tmp_path / 'videos.csv')
+    g.exportar_csv(dataset(), csv)
+    g.converter_csv_para_parquet(csv)
+    # CSV desatualizado depois da conversão: quem manda é o Parquet ao lado
+    g.exportar_csv(dataset(3), csv)
+
+    df = g.carregar_videos(csv, 5, 8, colunas=['video_id', 'viewCount'])
+    assert df['video_id'].tolist() == ['v5', 'v6', 'v7']
+    assert df.index.tolist() == [5, 6, 7]
+    assert list(df.columns) == ['video_id', 'viewCount']
@@ -0,0 +1,46 @@
+import pandas as pd
+
+import gemini_classification as g
+
+
+def rotear(title, description='', duration='PT12M30S', tags=None):
+    df = pd.DataFrame({'title': [title], 'description': [description], 'duration': [duration], 'tags': [tags or []]})
+    return g.prefiltrar_videos(df).iloc[0]
+
+
+def test_tutorial_com_ferramenta_segue():
+    assert rotear('Django do zero: models e migrations') == 'enviar'
+
+
+def test_short_por_duracao_e_por_hashtag():
+    assert rotear('Dica de Python com list comprehension', duration='PT2M50S') == 'pular'
+    assert rotear('Dica de Python com list comprehension #shorts') == 'pular'
+    assert rotear('Dica de Python com list comprehension', duration='PT3M10S') == 'enviar'
+
+
+def test_duracao_do_short_configuravel(monkeypatch):
+    monkeypatch.setattr(g, 'DURACAO_MAXIMA_SHORT', 60)
+    assert rotear('Dica de Python com list comprehension', duration='PT2M50S') == 'enviar'
+
+
+def test_live_sem_ferramenta_no_titulo():
+    assert rotear('Live de sexta com a comunidade', description='Falamos de Python e carreira') == 'pular'
+    assert rotear('Live: criando uma API com FastAPI') == 'enviar'
+
+
+def test_live_pela_duracao_zero():
+    assert rotear('Papo com a comunidade', description='Python', duration='P0D') == 'pular'
+
+
+def test_anuncio_sem_ferramenta_no_titulo():
+    assert rotear('Black Friday: últimas vagas do curso', description='Curso de React') == 'pular'
+    assert rotear('Cupom para o curso de React: hooks na prática') == 'enviar'
+
+
+def test_sem_ferramenta_em_nenhum_lugar():
+    assert rotear('Minha rotina de estudos', description='Como organizo a semana #python') == 'pular'
+
+
+def test_ferramenta_so_nas_tags_basta():
+    assert rotear('Minha rotina de estudos', tags=['produtividade', 'Python']) == 'enviar'
+    assert rotear('Minha rotina de estudos', tags="['produtividade', 'Python']") == 'enviar'
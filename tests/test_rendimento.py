@@ -0,0 +1,69 @@
+import pandas as pd
+
+import gemini_classification as g
+
+
+def estatisticas(canais):
+    """canais: {channel_id: (videos, com_topico, atualizado_em)}"""
+    linhas = {c: {'videos': n, 'apos_prefiltro': n, 'contextualizados': n, 'classificados': n,
+                  'com_topico': ok, 'atualizado_em': t} for c, (n, ok, t) in canais.items()}
+    return pd.DataFrame.from_dict(linhas, orient='index').rename_axis('channel_id')
+
+
+def decisoes(canais, consultados=None):
+    return g.decidir_canais(consultados or list(canais), estatisticas(canais))['decisao'].to_dict()
+
+
+def test_canal_na_media_nao_e_amostrado_mesmo_com_media_baixa():
+    # Rendimento global de 10%: um canal típico com bastante histórico segue inteiro
+    canais = {f'UC{i}': (40, 4, i) for i in range(10)}
+    assert set(decisoes(canais).values()) == {'enviar'}
+
+
+def test_decisoes_enviar_amostrar_pular(monkeypatch):
+    monkeypatch.setattr(g, 'ORCAMENTO_EXPLORACAO', 0)
+    canais = {
+        'bom': (200, 120, 1),
+        'media': (200, 60, 2),
+        'fraco': (100, 4, 3),
+        'ruim': (100, 0, 4),
+        'pouco_historico': (10, 0, 5),
+    }
+    resultado = decisoes(canais, list(canais) + ['novo'])
+    assert resultado == {'bom': 'enviar', 'media': 'enviar', 'fraco': 'amostrar', 'ruim': 'pular',
+                         'pouco_historico': 'enviar', 'novo': 'enviar'}
+
+
+def test_exploracao_reamostra_os_pulados_mais_antigos(monkeypatch):
+    monkeypatch.setattr(g, 'ORCAMENTO_EXPLORACAO', 0.1)
+    canais = {f'UCruim{i:02d}': (100, 0, 100 - i) for i in range(20)}
+    canais['UCbom'] = (500, 250, 0)
+    resultado = decisoes(canais)
+    assert sorted(c for c, d in resultado.items() if d == 'explorar') == ['UCruim18', 'UCruim19']
+    assert sum(d == 'pular' for d in resultado.values()) == 18
+
+
+def test_agendamento_ordena_e_filtra_por_rendimento(tmp_path, monkeypatch):
+    monkeypatch.setattr(g, '_rendimento_canais', g.RendimentoCanais(str(tmp_path / 'r.sqlite')))
+    monkeypatch.setattr(g, 'ORCAMENTO_EXPLORACAO', 0)
+    registro = g.obter_rendimento_canais()
+    for canal, n, ok in [('bom', 50, 40), ('medio', 50, 20), ('ruim', 60, 0)]:
+        registro.registrar([f'{canal}-{i}' for i in range(n)], [canal] * n, [4 if i < ok else 1 for i in range(n)])
+
+    df = pd.DataFrame({'video_id': ['r1', 'm1', 'b1', 'n1']})
+    canais = pd.Series(['ruim', 'medio', 'bom', 'novo'])
+    agendados = g.agendar_por_rendimento(df, canais)
+    # Canal novo entra com o rendimento global (60/160), logo abaixo do médio (40%)
+    assert agendados['video_id'].tolist() == ['b1', 'm1', 'n1']
+
+
+def test_exportar_e_importar_nao_duplicam(tmp_path):
+    origem = g.RendimentoCanais(str(tmp_path / 'a.sqlite'))
+    origem.registrar(['v1', 'v2'], ['UC1', 'UC1'], [4, 0])
+    origem.exportar(str(tmp_path / 'a.jsonl'))
+
+    destino = g.RendimentoCanais(str(tmp_path / 'b.sqlite'))
+    destino.importar(str(tmp_path / 'a.jsonl'))
+    destino.importar(str(tmp_path / 'a.jsonl'))
+    linha = destino.estatisticas().loc['UC1']
+    assert (linha['videos'], linha['com_topico']) == (2, 1)
@@ -0,0 +1,56 @@
+import gemini_classification as g
+
+
+def indice():
+    trilhas = [{'ferramenta': nome, 'topicos': [f'Tópico de {nome}']}
+               for nome in ('NODE.JS', 'VUE', 'C#', 'SPRING BOOT', 'GO', 'Model Context Protocol (MCP)')]
+    return g.TrilhasIndex(trilhas)
+
+
+def test_grafias_alternativas_encontram_a_trilha():
+    trilhas = indice()
+    assert trilhas.topicos('Node.js') == ['Tópico de NODE.JS']
+    assert trilhas.topicos('node') == ['Tópico de NODE.JS']
+    assert trilhas.topicos('VueJS') == ['Tópico de VUE']
+    assert trilhas.topicos('CSharp') == ['Tópico de C#']
+    assert trilhas.topicos('golang').ferramenta == 'GO'
+    assert trilhas.topicos('MCP').ferramenta == 'Model Context Protocol (MCP)'
+
+
+def test_ferramentas_vizinhas_nao_herdam_a_trilha():
+    trilhas = indice()
+    assert trilhas.topicos('Nuxt.js') == []
+    assert trilhas.topicos('.NET') == []
+    assert trilhas.topicos('Spring') == []
+    assert trilhas.topicos('Angular') == []
+
+
+def trilha_react():
+    topicos = ['Visão Geral', 'Hooks e gerenciamento de estado', 'Roteamento com React Router',
+               'Testes com Jest e Testing Library', 'Formulários e validação', 'Consumo de APIs REST']
+    return g.TopicosTrilha('REACT', topicos, {'Hooks e gerenciamento de estado': ['useState', 'useEffect', 'redux']})
+
+
+def test_topico_dominante_atribuido_sem_llm():
+    automatico, _ = g.selecionar_topicos(trilha_react(), 'Hooks na prática: useState, useEffect e gerenciamento de estado')
+    assert automatico == 'Hooks e gerenciamento de estado'
+
+
+def test_dois_topicos_fortes_vao_para_o_llm():
+    texto = 'Roteamento com React Router e testes com Jest e Testing Library: useState'
+    automatico, candidatos = g.selecionar_topicos(trilha_react(), texto, top_k=3)
+    assert automatico is None
+    assert list(candidatos) == ['Visão Geral', 'Hooks e gerenciamento de estado', 'Roteamento com React Router',
+                                'Testes com Jest e Testing Library']
+
+
+def test_evidencia_fraca_nao_atribui():
+    automatico, candidatos = g.selecionar_topicos(trilha_react(), 'Formulários')
+    assert automatico is None
+    assert len(candidatos) == len(trilha_react())
+
+
+def test_atribuicao_automatica_desligada(monkeypatch):
+    monkeypatch.setattr(g, 'TOPICO_AUTOMATICO', False)
+    automatico, _ = g.selecionar_topicos(trilha_react(), 'Hooks na prática: useState, useEffect e gerenciamento de estado')
+    assert automatico is None